@@ -1,26 +1,135 @@
-import math, collections
+import math, array, bisect, marshal
+
+from Vocabulary import Vocabulary
+from modelCache import openForWrite, commitFile
+
+# Weight applied to the unigram estimate when stupid backoff falls back
+# from an unseen bigram
+BACKOFF = 0.4
+
+MAGIC = 'MTLM0001'
 
 class ArticleTester:
+    """Bigram language model over a Holbrook corpus. Words are interned as
+       integer IDs, unigram counts are an array indexed by ID, and bigram
+       counts are stored compressed by first word: the bigrams starting with
+       word a are bigramNext[bigramStart[a]:bigramStart[a + 1]] (sorted
+       second-word IDs) with their counts in bigramCounts. Scoring only
+       reads the tables, so they never grow after training."""
 
-    def __init__(self, corpus):
-        self.unigramCounts = collections.defaultdict(lambda: 0.0)
-        self.bigramCounts = collections.defaultdict(lambda: 0.0)
-        self.train(corpus)
+    def __init__(self, corpus=None):
+        self.vocabulary = Vocabulary()
+        self.unigramCounts = array.array('l')
+        self.bigramStart = array.array('l', [0])
+        self.bigramNext = array.array('l')
+        self.bigramCounts = array.array('l')
+        self.total = 0
+        if corpus is not None:
+            self.train(corpus)
 
     def train(self, corpus):
+        vocabulary = self.vocabulary
+        unigramCounts = {}
+        bigramCounts = {}
         for sentence in corpus.corpus:
             previousWord = None
-            for datum in sentence.data:
-                token = datum.word
-                self.unigramCounts[token] += 1.0
+            for word in sentence.getCorrectSentence():
+                token = vocabulary.intern(word)
+                unigramCounts[token] = unigramCounts.get(token, 0) + 1
                 if previousWord != None:
-                    self.bigramCounts[(previousWord, token)] += 1.0
+                    key = (previousWord, token)
+                    bigramCounts[key] = bigramCounts.get(key, 0) + 1
+                previousWord = token
+        self.freeze(unigramCounts, bigramCounts)
+
+    # Packs counts gathered in dicts into the read-only arrays
+    def freeze(self, unigramCounts, bigramCounts):
+        size = len(self.vocabulary)
+        self.unigramCounts = array.array('l', [unigramCounts.get(i, 0) for i in xrange(size)])
+        self.total = sum(self.unigramCounts)
+
+        self.bigramStart = array.array('l', [0] * (size + 1))
+        self.bigramNext = array.array('l')
+        self.bigramCounts = array.array('l')
+        for (first, second) in sorted(bigramCounts):
+            self.bigramNext.append(second)
+            self.bigramCounts.append(bigramCounts[(first, second)])
+            self.bigramStart[first + 1] += 1
+        for i in xrange(size):
+            self.bigramStart[i + 1] += self.bigramStart[i]
+
+    def unigramCount(self, word):
+        i = self.vocabulary.id(word)
+        return self.unigramCounts[i] if i >= 0 else 0
+
+    def bigramCount(self, previousWord, word):
+        first = self.vocabulary.id(previousWord)
+        second = self.vocabulary.id(word)
+        if first < 0 or second < 0:
+            return 0
+        lo = self.bigramStart[first]
+        hi = self.bigramStart[first + 1]
+        i = bisect.bisect_left(self.bigramNext, second, lo, hi)
+        if i < hi and self.bigramNext[i] == second:
+            return self.bigramCounts[i]
+        return 0
+
+    def bigramScore(self, previousWord, word):
+        """Stupid backoff score of word following previousWord: the bigram
+           relative frequency when the bigram was seen, otherwise BACKOFF
+           times the add-one smoothed unigram probability of word."""
+        count = self.bigramCount(previousWord, word)
+        if count > 0:
+            return float(count) / self.unigramCount(previousWord)
+        return BACKOFF * (self.unigramCount(word) + 1.0) / (self.total + len(self.vocabulary) + 1.0)
 
+    def logScore(self, words):
+        """Sum of the log bigram scores of each word given the one before."""
+        score = 0.0
+        for i in xrange(1, len(words)):
+            score += math.log(self.bigramScore(words[i - 1], words[i]))
+        return score
+
+    def tokenScore(self, lastWord, token):
+        """Returns the log score of emitting token after lastWord, and the
+           word the token ends with. Dictionary entries such as 'to the' put
+           several words in one token."""
+        score = 0.0
+        for word in token.lower().split():
+            score += math.log(self.bigramScore(lastWord, word))
+            lastWord = word
+        return (score, lastWord)
+
+    # Scores how likely 'the' is to precede pair[1]
     def score(self, pair):
         score = 0.0
         if pair[0] != 'the' or len(pair) != 2: return score
         else:
-            count = self.bigramCounts[(pair[0], pair[1])]
-            score = (count + 1.0) / (self.unigramCounts[pair[1]] + 1.0)
+            count = self.bigramCount(pair[0], pair[1])
+            score = (count + 1.0) / (self.unigramCount(pair[1]) + 1.0)
         return score
-        
+
+    def save(self, path):
+        f = openForWrite(path)
+        f.write(MAGIC)
+        marshal.dump((self.vocabulary.words, self.total, len(self.bigramNext)), f)
+        for table in (self.unigramCounts, self.bigramStart, self.bigramNext, self.bigramCounts):
+            table.tofile(f)
+        commitFile(f, path)
+
+    @classmethod
+    def load(cls, path):
+        model = cls()
+        f = open(path, 'rb')
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a saved language model' % path)
+        words, model.total, bigrams = marshal.load(f)
+        model.vocabulary = Vocabulary(words)
+        size = len(words)
+        model.unigramCounts.fromfile(f, size)
+        model.bigramStart = array.array('l')
+        model.bigramStart.fromfile(f, size + 1)
+        model.bigramNext.fromfile(f, bigrams)
+        model.bigramCounts.fromfile(f, bigrams)
+        f.close()
+        return model
@@ -0,0 +1,228 @@
+import math, collections
+
+# numpy is optional, and only imported by the first batch large enough
+# to be worth it: below NUMPY_MIN_BATCH hypotheses, importing numpy takes
+# longer than scoring them one at a time.
+NUMPY_MIN_BATCH = 1000
+numpy = None
+
+# Returns the numpy module, or False if it is not installed
+def loadNumpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        numpy = module
+    return numpy
+
+# Returns a Counter of the n-grams (as tuples of tokens) of length n
+def ngramCounts(tokens, n):
+    return collections.Counter(tuple(tokens[i:i + n]) for i in xrange(len(tokens) + 1 - n))
+
+# Dictionary entries such as 'to the' translate to a single token holding
+# several words, so split those back into words before counting.
+def splitTokens(tokens):
+    words = []
+    for token in tokens:
+        if ' ' in token:
+            words.extend(token.split())
+        else:
+            words.append(token)
+    return words
+
+class BLEUScorer:
+    """Scores translations against a fixed set of references using clipped
+       n-gram counts. Each reference may be a list of tokens or a list of
+       alternative references (each a list of tokens)."""
+
+    def __init__(self, references, n=2):
+        self.n = n
+        self.referenceLengths = []
+        # For each sentence, a list of Counters (one per n-gram order) holding
+        # the maximum count of each n-gram over that sentence's references
+        self.referenceCounts = []
+        self.referenceAlternatives = []
+        for reference in references:
+            if reference and not isinstance(reference[0], basestring):
+                alternatives = reference
+            else:
+                alternatives = [reference]
+            alternatives = [splitTokens(r) for r in alternatives]
+
+            counts = []
+            for j in range(1, n + 1):
+                merged = collections.Counter()
+                for alternative in alternatives:
+                    merged |= ngramCounts(alternative, j)
+                counts.append(merged)
+            self.referenceLengths.append([len(r) for r in alternatives])
+            self.referenceCounts.append(counts)
+            self.referenceAlternatives.append(alternatives)
+        # Word IDs and reference arrays for batchStats, built on first use
+        self.wordIds = {}
+        self.referenceArrays = None
+
+    def stats(self, hypothesis, i):
+        """Returns (matches, totals, hypothesisLength, referenceLength) for the
+           hypothesis scored against reference i. matches and totals hold one
+           entry per n-gram order."""
+        hypothesis = splitTokens(hypothesis)
+        matches = []
+        totals = []
+        for j in range(1, self.n + 1):
+            counts = ngramCounts(hypothesis, j)
+            matches.append(sum((counts & self.referenceCounts[i][j - 1]).itervalues()))
+            totals.append(max(0, len(hypothesis) + 1 - j))
+
+        # Use the reference closest in length, preferring the shorter one
+        length = len(hypothesis)
+        referenceLength = min(self.referenceLengths[i], key=lambda r: (abs(r - length), r))
+        return (matches, totals, length, referenceLength)
+
+    def sentenceScore(self, hypothesis, i):
+        """Returns the BLEU score of a single hypothesis against reference i:
+           the length ratio (capped at 1) times the clipped precision of each
+           n-gram order."""
+        matches, totals, length, referenceLength = self.stats(hypothesis, i)
+        score = min(1.0, float(length) / referenceLength) if referenceLength else 0.0
+        for match, total in zip(matches, totals):
+            score *= float(match) / total if total else 0.0
+        return score
+
+    def sentenceScores(self, hypotheses):
+        """Returns a list of sentence scores, hypotheses[i] being scored against
+           reference i. Large batches are counted and scored with numpy
+           array operations when it is available (see batchStats)."""
+        if len(hypotheses) < NUMPY_MIN_BATCH or not loadNumpy():
+            return [self.sentenceScore(h, i) for i, h in enumerate(hypotheses)]
+
+        matches, totals, lengths, referenceLengths = self.batchStats(hypotheses)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            precisions = numpy.where(totals > 0, matches / totals, 0.0)
+            ratios = numpy.where(referenceLengths > 0, numpy.minimum(1.0, lengths / referenceLengths), 0.0)
+        # Multiplied in the same order as sentenceScore, for the same result
+        scores = ratios
+        for j in range(self.n):
+            scores = scores * precisions[:, j]
+        return scores.tolist()
+
+    # Returns flat arrays of the word IDs of segments (lists of words),
+    # the segment of each word and the position of each word in its
+    # segment, interning new words in self.wordIds
+    def segmentArrays(self, segments):
+        wordIds = self.wordIds
+        words = numpy.array([wordIds.setdefault(word, len(wordIds)) for segment in segments for word in segment],
+            dtype=numpy.int64)
+        lengths = numpy.array([len(segment) for segment in segments], dtype=numpy.int64)
+        segment = numpy.repeat(numpy.arange(len(segments)), lengths)
+        position = numpy.arange(len(words)) - (numpy.cumsum(lengths) - lengths)[segment]
+        return (words, segment, position, lengths)
+
+    def batchStats(self, hypotheses):
+        """Returns the stats of every hypothesis as numpy arrays: matches and
+           totals (one row per hypothesis, one column per n-gram order),
+           hypothesis lengths and reference lengths. N-grams are given IDs
+           an order at a time, each (n-1)-gram ID extended by the next word,
+           and the clipped matches are numpy.minimum of the hypothesis and
+           reference counts of each (sentence, n-gram)."""
+        if self.referenceArrays is None:
+            alternatives = [r for rs in self.referenceAlternatives for r in rs]
+            sentence = numpy.repeat(numpy.arange(len(self.referenceAlternatives)),
+                [len(rs) for rs in self.referenceAlternatives])
+            self.referenceArrays = self.segmentArrays(alternatives) + (sentence,)
+        refWords, refSegment, refPosition, refLengths, refSentence = self.referenceArrays
+        # Leave out the references of sentences past the last hypothesis
+        scored = refSentence < len(hypotheses)
+        kept = scored[refSegment]
+        refWords, refSegment, refPosition = refWords[kept], refSegment[kept], refPosition[kept]
+        hypotheses = [splitTokens(h) for h in hypotheses]
+        hypWords, hypSegment, hypPosition, hypLengths = self.segmentArrays(hypotheses)
+
+        # References and hypotheses share n-gram IDs, so number them together
+        words = numpy.concatenate([refWords, hypWords])
+        lengths = numpy.concatenate([refLengths, hypLengths])
+        segment = numpy.concatenate([refSegment, hypSegment + len(refLengths)])
+        position = numpy.concatenate([refPosition, hypPosition])
+        # Sentence each segment is scored in
+        segmentSentence = numpy.concatenate([refSentence, numpy.arange(len(hypotheses))])
+        isHypothesis = numpy.arange(len(lengths)) >= len(refLengths)
+
+        matches = numpy.zeros((len(hypotheses), self.n))
+        totals = numpy.zeros((len(hypotheses), self.n))
+        grams = words
+        for j in range(1, self.n + 1):
+            if j > 1:
+                # The j-gram at each position is its (j-1)-gram plus the word
+                # j - 1 further on; positions too close to the end get -1
+                following = numpy.append(words[j - 1:], numpy.full(j - 1, -1, dtype=numpy.int64))
+                valid = (grams >= 0) & (position + j <= lengths[segment])
+                combined = numpy.where(valid, grams * (len(self.wordIds) + 1) + following, -1)
+                grams = numpy.full(len(words), -1, dtype=numpy.int64)
+                grams[valid] = numpy.unique(combined[valid], return_inverse=True)[1]
+            valid = grams >= 0
+            gramCount = grams.max() + 1 if valid.any() else 1
+
+            # Count each n-gram per segment, then key the counts by sentence
+            keys, counts = numpy.unique(segment[valid] * gramCount + grams[valid], return_counts=True)
+            keySegment = keys // gramCount
+            sentenceKeys = segmentSentence[keySegment] * gramCount + keys % gramCount
+            fromHypothesis = isHypothesis[keySegment]
+
+            # Clip counts are the most times each sentence's references
+            # have an n-gram, taking the maximum over alternatives
+            refKeys = sentenceKeys[~fromHypothesis]
+            refCounts = counts[~fromHypothesis]
+            order = numpy.lexsort((-refCounts, refKeys))
+            first = numpy.ones(len(order), dtype=bool)
+            first[1:] = refKeys[order][1:] != refKeys[order][:-1]
+            clipKeys = refKeys[order][first]
+            clipCounts = refCounts[order][first]
+
+            hypKeys = sentenceKeys[fromHypothesis]
+            found = numpy.minimum(numpy.searchsorted(clipKeys, hypKeys), max(len(clipKeys) - 1, 0))
+            clips = numpy.where(clipKeys[found] == hypKeys, clipCounts[found], 0) if len(clipKeys) else 0
+            clipped = numpy.minimum(counts[fromHypothesis], clips)
+            matches[:, j - 1] = numpy.bincount(hypKeys // gramCount, clipped, len(hypotheses))
+            totals[:, j - 1] = numpy.maximum(0, hypLengths + 1 - j)
+
+        # Use the reference closest in length, preferring the shorter one
+        refLengths, refSentence = refLengths[scored], refSentence[scored]
+        distance = numpy.abs(refLengths - hypLengths[refSentence])
+        order = numpy.lexsort((refLengths, distance, refSentence))
+        first = numpy.ones(len(order), dtype=bool)
+        first[1:] = refSentence[order][1:] != refSentence[order][:-1]
+        referenceLengths = numpy.zeros(len(hypotheses))
+        referenceLengths[refSentence[order][first]] = refLengths[order][first]
+        return (matches, totals, hypLengths.astype(float), referenceLengths)
+
+    def corpusScore(self, hypotheses):
+        """Returns the corpus-level BLEU score: the geometric mean of the
+           n-gram precisions summed over all hypotheses, times the brevity
+           penalty."""
+        if len(hypotheses) >= NUMPY_MIN_BATCH and loadNumpy():
+            batch = self.batchStats(hypotheses)
+            matches, totals = [[int(x) for x in column] for column in (batch[0].sum(axis=0), batch[1].sum(axis=0))]
+            return self.combine(matches, totals, int(batch[2].sum()), int(batch[3].sum()))
+
+        matches = [0] * self.n
+        totals = [0] * self.n
+        length = 0
+        referenceLength = 0
+        for i, hypothesis in enumerate(hypotheses):
+            m, t, l, r = self.stats(hypothesis, i)
+            for j in range(self.n):
+                matches[j] += m[j]
+                totals[j] += t[j]
+            length += l
+            referenceLength += r
+        return self.combine(matches, totals, length, referenceLength)
+
+    # Returns the corpus score of the summed stats
+    def combine(self, matches, totals, length, referenceLength):
+        if length == 0 or 0 in matches:
+            return 0.0
+        logPrecision = sum(math.log(float(m) / t) for m, t in zip(matches, totals)) / self.n
+        brevityPenalty = 1.0 if length > referenceLength else math.exp(1.0 - float(referenceLength) / length)
+        return brevityPenalty * math.exp(logPrecision)
@@ -0,0 +1,148 @@
+import math
+
+
+class SingleSenseDictionary:
+    """Gives a plain mapping, such as the dict from parseDict, the senses
+       lookup of a CompiledDictionary: one sense per word, found the way
+       translator.translate finds it."""
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+
+    def senses(self, word):
+        if word in self.dictionary:
+            return [self.dictionary[word]]
+        if word.lower() in self.dictionary:
+            return [self.dictionary[word.lower()]]
+        return []
+
+
+class Hypothesis:
+    """A partial translation. pos is the first source word not yet
+       translated; when swapped is set, the word after it already was.
+       words is the English output so far as a linked list of
+       (word, parent) pairs."""
+
+    def __init__(self, pos, swapped, lastWord, score, words):
+        self.pos = pos
+        self.swapped = swapped
+        self.lastWord = lastWord
+        self.score = score
+        self.words = words
+
+    # Hypotheses with the same key have the same future, so only the best
+    # scoring one needs to be kept
+    def key(self):
+        return (self.pos, self.swapped, self.lastWord)
+
+    def covered(self):
+        return self.pos + 1 if self.swapped else self.pos
+
+    def output(self):
+        words = []
+        node = self.words
+        while node is not None:
+            words.append(node[0])
+            node = node[1]
+        words.reverse()
+        return words
+
+
+class BeamDecoder:
+    """Translates tagged Spanish sentences by beam search over every sense
+       of each word in the dictionary, scored by the English language model.
+       Besides translating in order, the decoder may translate two adjacent
+       words in swapped order, at a cost of distortionPenalty. Hypotheses
+       are grouped by the number of source words covered, recombined when
+       they share a state, and pruned to the beamWidth best per group, so
+       decoding time is linear in the sentence length. rules, when given,
+       takes a tagged sentence and a position and returns the fixed
+       translation of that word as a list of words (empty to leave it out),
+       or None to look it up; words with a fixed translation get only that
+       option and are never swapped."""
+
+    def __init__(self, dictionary, englishModel, beamWidth=8, maxSenses=5,
+            senseWeight=1.0, distortionPenalty=2.0, rules=None):
+        if not hasattr(dictionary, 'senses'):
+            dictionary = SingleSenseDictionary(dictionary)
+        self.dictionary = dictionary
+        self.rules = rules
+        self.englishModel = englishModel
+        self.beamWidth = beamWidth
+        self.maxSenses = maxSenses
+        self.senseWeight = senseWeight
+        self.distortionPenalty = distortionPenalty
+
+    # Returns (english, length, cost) translation options for the source
+    # words starting at i, english being None for a word left out.
+    # Phrases are only offered when translating in order, so length is 1
+    # when single is true. fixed holds the rule translation of each word.
+    def options(self, words, fixed, i, single=False):
+        if fixed[i] is not None:
+            return [(' '.join(fixed[i]) or None, 1, 0.0)]
+        options = []
+        if not single and hasattr(self.dictionary, 'longestMatch'):
+            length, senses = self.dictionary.longestMatch(words, i)
+            if length > 1:
+                for rank, sense in enumerate(senses[:self.maxSenses]):
+                    options.append((sense, length, self.senseWeight * math.log(rank + 1)))
+        # Words missing from the dictionary translate to themselves
+        senses = self.dictionary.senses(words[i]) or [words[i]]
+        for rank, sense in enumerate(senses[:self.maxSenses]):
+            options.append((sense, 1, self.senseWeight * math.log(rank + 1)))
+        return options
+
+    def extend(self, hypothesis, english, pos, swapped, cost):
+        if english is None:
+            return Hypothesis(pos, swapped, hypothesis.lastWord, hypothesis.score - cost, hypothesis.words)
+        score, lastWord = self.englishModel.tokenScore(hypothesis.lastWord, english)
+        return Hypothesis(pos, swapped, lastWord, hypothesis.score + score - cost,
+            (english, hypothesis.words))
+
+    def expand(self, hypothesis, words, fixed):
+        pos = hypothesis.pos
+        if hypothesis.swapped:
+            # Come back for the word that was skipped
+            for english, length, cost in self.options(words, fixed, pos, True):
+                yield self.extend(hypothesis, english, pos + 2, False, cost)
+            return
+
+        for english, length, cost in self.options(words, fixed, pos):
+            yield self.extend(hypothesis, english, pos + length, False, cost)
+        if pos + 1 < len(words) and fixed[pos] is None and fixed[pos + 1] is None:
+            for english, length, cost in self.options(words, fixed, pos + 1, True):
+                yield self.extend(hypothesis, english, pos, True, cost + self.distortionPenalty)
+
+    def decodeSentence(self, sentence):
+        """Takes a tagged Spanish sentence and returns its best English
+           translation as a list of words."""
+        words = [word for word, tag in sentence]
+        if not words:
+            return []
+        fixed = [self.rules(sentence, i) if self.rules else None for i in xrange(len(words))]
+
+        stacks = [{} for i in xrange(len(words) + 1)]
+        stacks[0][(0, False, '<s>')] = Hypothesis(0, False, '<s>', 0.0, None)
+        for covered in xrange(len(words)):
+            # Prune to the best beamWidth hypotheses before expanding
+            beam = sorted(stacks[covered].itervalues(), key=lambda h: -h.score)[:self.beamWidth]
+            for hypothesis in beam:
+                for extended in self.expand(hypothesis, words, fixed):
+                    stack = stacks[extended.covered()]
+                    key = extended.key()
+                    if key not in stack or extended.score > stack[key].score:
+                        stack[key] = extended
+
+        best = None
+        bestScore = None
+        for hypothesis in stacks[len(words)].itervalues():
+            score = hypothesis.score + math.log(self.englishModel.bigramScore(hypothesis.lastWord, '</s>'))
+            if best is None or score > bestScore:
+                best, bestScore = hypothesis, score
+        return best.output()
+
+    def decode(self, taggedSpanishSentences):
+        translations = []
+        for sentence in taggedSpanishSentences:
+            translations.append(self.decodeSentence(sentence))
+        return translations
@@ -0,0 +1,207 @@
+import sys
+import os
+import mmap
+import struct
+
+# Binary layout (all integers little-endian uint32):
+#
+#   header        MAGIC, keyCount, senseCount, maxPhraseLength,
+#                 keyPoolSize, sensePoolSize
+#   keyOffsets    keyCount + 1 offsets into the key pool
+#   senseStarts   keyCount + 1 indexes into senseOffsets, so the senses of
+#                 key i are senseStarts[i] .. senseStarts[i + 1] - 1
+#   senseOffsets  senseCount + 1 offsets into the sense pool
+#   keyPool       case-folded Spanish keys, sorted bytewise
+#   sensePool     English senses, in the order they appear in the source
+#
+# Keys are sorted so lookups are a binary search directly over the mapped
+# file, and phrase lookups can check whether any longer key starts with
+# the words matched so far.
+
+MAGIC = 'MTDICT01'
+HEADER = struct.Struct('<8sIIIII')
+UINT = struct.Struct('<I')
+
+# Lowercases a UTF-8 encoded word, including accented capitals.
+def foldCase(word):
+    try:
+        return word.decode('utf-8').lower().encode('utf-8')
+    except UnicodeError:
+        return word.lower()
+
+# Parses a dictionary source file in the 'SpanishWord:EnglishWord' format.
+# Spanish entries may be phrases ('al alcance de:within reach of'), and a
+# Spanish entry listed several times has several senses, in file order.
+# Returns a dict of 'spanish key' : [senses].
+def readSource(filename):
+    entries = {}
+    f = open(filename)
+    for line in f:
+        line = line.strip('\n')
+        if not line:
+            continue
+        spanish, english = line.split(':', 1)
+        senses = entries.setdefault(' '.join(foldCase(spanish).split()), [])
+        if english not in senses:
+            senses.append(english)
+    f.close()
+    return entries
+
+# Writes entries (a dict of 'spanish key' : [senses]) to path in the
+# compiled format.
+def compileDictionary(entries, path):
+    keys = sorted(entries)
+    keyOffsets = [0]
+    senseStarts = [0]
+    senseOffsets = [0]
+    keyPool = []
+    sensePool = []
+    for key in keys:
+        keyPool.append(key)
+        keyOffsets.append(keyOffsets[-1] + len(key))
+        for sense in entries[key]:
+            sensePool.append(sense)
+            senseOffsets.append(senseOffsets[-1] + len(sense))
+        senseStarts.append(len(senseOffsets) - 1)
+    maxPhraseLength = max([len(key.split(' ')) for key in keys] or [0])
+
+    f = open(path, 'wb')
+    f.write(HEADER.pack(MAGIC, len(keys), len(senseOffsets) - 1, maxPhraseLength,
+        keyOffsets[-1], senseOffsets[-1]))
+    for offsets in (keyOffsets, senseStarts, senseOffsets):
+        f.write(struct.pack('<%dI' % len(offsets), *offsets))
+    f.write(''.join(keyPool))
+    f.write(''.join(sensePool))
+    f.close()
+
+# Returns true if the file at path is a compiled dictionary
+def isCompiled(path):
+    f = open(path, 'rb')
+    magic = f.read(len(MAGIC))
+    f.close()
+    return magic == MAGIC
+
+
+class CompiledDictionary:
+    """Read-only, memory-mapped view of a compiled dictionary. Supports the
+       same 'in' and [] lookups as the dict returned by parseDict, with
+       case-insensitive keys, plus every sense of an entry and longest-match
+       lookup of multiword phrases. offset is where the dictionary starts
+       in the file, for dictionaries embedded in a larger file."""
+
+    def __init__(self, path, offset=0):
+        f = open(path, 'rb')
+        self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        magic, self.keyCount, self.senseCount, self.maxPhraseLength, keyPoolSize, sensePoolSize = \
+            HEADER.unpack_from(self.mm, offset)
+        if magic != MAGIC:
+            raise ValueError('%s is not a compiled dictionary' % path)
+        self.keyOffsetsStart = offset + HEADER.size
+        self.senseStartsStart = self.keyOffsetsStart + 4 * (self.keyCount + 1)
+        self.senseOffsetsStart = self.senseStartsStart + 4 * (self.keyCount + 1)
+        self.keyPoolStart = self.senseOffsetsStart + 4 * (self.senseCount + 1)
+        self.sensePoolStart = self.keyPoolStart + keyPoolSize
+
+    def uint(self, start, i):
+        return UINT.unpack_from(self.mm, start + 4 * i)[0]
+
+    def key(self, i):
+        start = self.keyPoolStart + self.uint(self.keyOffsetsStart, i)
+        end = self.keyPoolStart + self.uint(self.keyOffsetsStart, i + 1)
+        return self.mm[start:end]
+
+    def sensesAt(self, i):
+        senses = []
+        for j in xrange(self.uint(self.senseStartsStart, i), self.uint(self.senseStartsStart, i + 1)):
+            start = self.sensePoolStart + self.uint(self.senseOffsetsStart, j)
+            end = self.sensePoolStart + self.uint(self.senseOffsetsStart, j + 1)
+            senses.append(self.mm[start:end])
+        return senses
+
+    # Returns the first index whose key is >= key
+    def lowerBound(self, key):
+        lo, hi = 0, self.keyCount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # Returns the index of the (already case-folded) key, or -1
+    def find(self, key):
+        i = self.lowerBound(key)
+        if i < self.keyCount and self.key(i) == key:
+            return i
+        return -1
+
+    def hasPrefix(self, prefix):
+        i = self.lowerBound(prefix)
+        return i < self.keyCount and self.key(i).startswith(prefix)
+
+    def senses(self, word):
+        """Returns every English sense of the Spanish word or phrase, most
+           preferred first, or an empty list if it is not in the dictionary."""
+        i = self.find(' '.join(foldCase(word).split()))
+        if i < 0:
+            return []
+        return self.sensesAt(i)
+
+    def longestMatch(self, words, start):
+        """Finds the longest dictionary phrase beginning at words[start].
+           Returns (length, senses), or (0, []) if no entry matches."""
+        phrase = foldCase(words[start])
+        i = self.find(phrase)
+        best = (1, i) if i >= 0 else (0, -1)
+        length = 1
+        while length < self.maxPhraseLength and start + length < len(words):
+            prefix = phrase + ' '
+            if not self.hasPrefix(prefix):
+                break
+            phrase = prefix + foldCase(words[start + length])
+            length += 1
+            i = self.find(phrase)
+            if i >= 0:
+                best = (length, i)
+        if best[0] == 0:
+            return (0, [])
+        return (best[0], self.sensesAt(best[1]))
+
+    def __contains__(self, word):
+        return self.find(foldCase(word)) >= 0
+
+    def __getitem__(self, word):
+        i = self.find(foldCase(word))
+        if i < 0:
+            raise KeyError(word)
+        return self.sensesAt(i)[0]
+
+    def get(self, word, default=None):
+        i = self.find(foldCase(word))
+        if i < 0:
+            return default
+        return self.sensesAt(i)[0]
+
+    def keys(self):
+        return [self.key(i) for i in xrange(self.keyCount)]
+
+    def __len__(self):
+        return self.keyCount
+
+    def close(self):
+        self.mm.close()
+
+
+def main():
+    if len(sys.argv) != 3:
+        print "Usage: python CompiledDictionary.py [dictFile] [compiledFile]"
+        sys.exit(1)
+    entries = readSource(sys.argv[1])
+    compileDictionary(entries, sys.argv[2])
+    print "Compiled", len(entries), "entries to", sys.argv[2]
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,8 @@
 import re
 
-class Datum:
-  word = '' # the correct word
-  error = '' # the error word (if any)
-
-  def __init__(self):
-    self.word = ''
-    self.error = ''
+class Datum(object):
+  __slots__ = ('word', # the correct word
+               'error') # the error word (if any)
 
   def __init__(self, word, error=''):
     self.word = word
@@ -25,7 +21,7 @@ class Datum:
     """Returns true if the error is within edit distance one and contains no numerics/punctuation."""
     if not self.hasError():
       return False
-    distance = dameraulevenshtein(self.word, self.error) 
+    distance = boundedDameraulevenshtein(self.word, self.error, 1)
     if(distance > 1):
       return False
     regex = '.*[^a-zA-Z].*'
@@ -86,3 +82,117 @@ def dameraulevenshtein(seq1, seq2):
                 and seq1[x-1] == seq2[y] and seq1[x] != seq2[y]):
                 thisrow[y] = min(thisrow[y], twoago[y - 2] + 1)
     return thisrow[len(seq2) - 1]
+
+def withinOneEdit(seq1, seq2):
+  """Returns true if the Damerau-Levenshtein distance between the sequences
+  is at most one, in a single linear scan.
+
+  >>> withinOneEdit('siter', 'sister')
+  True
+  >>> withinOneEdit('ba', 'ab')
+  True
+  >>> withinOneEdit('fee', 'deed')
+  False
+  """
+  len1, len2 = len(seq1), len(seq2)
+  if abs(len1 - len2) > 1:
+    return False
+  # Skip the common prefix
+  i = 0
+  while i < len1 and i < len2 and seq1[i] == seq2[i]:
+    i += 1
+  if len1 == len2:
+    # Identical, or one substitution at i
+    if seq1[i + 1:] == seq2[i + 1:]:
+      return True
+    # One transposition of i and i + 1
+    return (i + 1 < len1 and seq1[i] == seq2[i + 1] and seq1[i + 1] == seq2[i]
+            and seq1[i + 2:] == seq2[i + 2:])
+  if len1 < len2:
+    return seq1[i:] == seq2[i + 1:]
+  return seq1[i + 1:] == seq2[i:]
+
+def boundedDameraulevenshtein(seq1, seq2, maxDistance):
+  """Calculate the Damerau-Levenshtein distance between sequences, giving up
+  early once it must exceed maxDistance.
+
+  Returns the distance when it is at most maxDistance, and maxDistance + 1
+  otherwise. Only the cells within maxDistance of the diagonal are
+  computed, so this is O(N*maxDistance) time rather than O(N*M).
+
+  >>> boundedDameraulevenshtein('ba', 'abc', 2)
+  2
+  >>> boundedDameraulevenshtein('fee', 'deed', 1)
+  2
+  """
+  len1, len2 = len(seq1), len(seq2)
+  over = maxDistance + 1
+  if abs(len1 - len2) > maxDistance:
+    return over
+  if maxDistance == 1:
+    if seq1 == seq2:
+      return 0
+    return 1 if withinOneEdit(seq1, seq2) else over
+
+  # Rows of the (len1 + 1) x (len2 + 1) matrix, cells outside the band
+  # hold 'over'
+  twoago = None
+  oneago = None
+  thisrow = [min(y, over) for y in xrange(len2 + 1)]
+  for x in xrange(1, len1 + 1):
+    twoago, oneago, thisrow = oneago, thisrow, [over] * (len2 + 1)
+    if x <= maxDistance:
+      thisrow[0] = x
+    lo = max(1, x - maxDistance)
+    hi = min(len2, x + maxDistance)
+    rowMin = thisrow[0]
+    for y in xrange(lo, hi + 1):
+      cost = min(oneago[y] + 1, thisrow[y - 1] + 1,
+                 oneago[y - 1] + (seq1[x - 1] != seq2[y - 1]))
+      # Transpositions of consecutive elements
+      if (x > 1 and y > 1 and seq1[x - 1] == seq2[y - 2]
+          and seq1[x - 2] == seq2[y - 1] and seq1[x - 1] != seq2[y - 1]):
+        cost = min(cost, twoago[y - 2] + 1)
+      thisrow[y] = min(cost, over)
+      rowMin = min(rowMin, thisrow[y])
+    if rowMin > maxDistance:
+      return over
+  return thisrow[len2]
+
+def batchDameraulevenshtein(word, candidates):
+  """Returns the Damerau-Levenshtein distance from word to each of the
+  candidates, computing the dynamic program for all candidates at once
+  with numpy arrays.
+
+  >>> batchDameraulevenshtein('fee', ['deed', 'fee', 'ba'])
+  [2, 0, 3]
+  """
+  import numpy
+
+  if not candidates:
+    return []
+  count = len(candidates)
+  width = max(len(c) for c in candidates)
+  # Candidate characters, padded with a value no character matches
+  chars = numpy.full((count, width), -1, dtype=numpy.int64)
+  for i, candidate in enumerate(candidates):
+    chars[i, :len(candidate)] = [ord(c) for c in candidate]
+  lengths = numpy.array([len(c) for c in candidates])
+  word = [ord(c) for c in word]
+
+  twoago = None
+  oneago = None
+  thisrow = numpy.tile(numpy.arange(width + 1), (count, 1))
+  for x in xrange(1, len(word) + 1):
+    twoago, oneago = oneago, thisrow
+    thisrow = numpy.empty_like(oneago)
+    thisrow[:, 0] = x
+    for y in xrange(1, width + 1):
+      different = chars[:, y - 1] != word[x - 1]
+      cost = numpy.minimum(numpy.minimum(oneago[:, y] + 1, thisrow[:, y - 1] + 1),
+                           oneago[:, y - 1] + different)
+      if x > 1 and y > 1:
+        transposed = (chars[:, y - 2] == word[x - 1]) & (chars[:, y - 1] == word[x - 2]) & different
+        cost = numpy.where(transposed, numpy.minimum(cost, twoago[:, y - 2] + 1), cost)
+      thisrow[:, y] = cost
+  return thisrow[numpy.arange(count), lengths].tolist()
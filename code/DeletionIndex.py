@@ -0,0 +1,45 @@
+from Datum import boundedDameraulevenshtein
+
+# Returns every string obtained by deleting up to maxDistance characters
+# from word, including word itself
+def deletions(word, maxDistance=1):
+    results = set([word])
+    frontier = [word]
+    for d in xrange(maxDistance):
+        nextFrontier = []
+        for w in frontier:
+            for i in xrange(len(w)):
+                deleted = w[:i] + w[i + 1:]
+                if deleted not in results:
+                    results.add(deleted)
+                    nextFrontier.append(deleted)
+        frontier = nextFrontier
+    return results
+
+class DeletionIndex:
+    """Finds the words of a vocabulary within a small Damerau-Levenshtein
+       distance of a query word (the SymSpell approach). Every word is
+       indexed under each string reachable from it by up to maxDistance
+       deletions; two words within that distance always share one of those
+       strings. A query therefore costs a few dictionary lookups, however
+       large the vocabulary, and each candidate found is then checked with
+       the bounded distance."""
+
+    def __init__(self, words, maxDistance=1):
+        self.maxDistance = maxDistance
+        self.index = {}
+        for word in words:
+            for deleted in deletions(word, maxDistance):
+                self.index.setdefault(deleted, []).append(word)
+
+    def candidates(self, word):
+        """Returns a dict of vocabulary word : distance for every word within
+           maxDistance of word."""
+        results = {}
+        for deleted in deletions(word, self.maxDistance):
+            for candidate in self.index.get(deleted, ()):
+                if candidate not in results:
+                    distance = boundedDameraulevenshtein(word, candidate, self.maxDistance)
+                    if distance <= self.maxDistance:
+                        results[candidate] = distance
+        return results
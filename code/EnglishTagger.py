@@ -0,0 +1,66 @@
+import time
+import collections
+
+from LRUCache import LRUCache
+
+class EnglishTagger:
+    """Tags English sentences in batches with a single preloaded NLTK tagger
+       (the one nltk.pos_tag uses), caching the tags of repeated sentences."""
+
+    def __init__(self, cacheSize=100000, batchSize=512):
+        self.tagger = None
+        self.cache = LRUCache(cacheSize)
+        self.batchSize = batchSize
+        self.batches = 0
+        self.sentences = 0
+        self.seconds = 0.0
+        # Seconds spent on each of the most recent batches
+        self.batchTimes = collections.deque(maxlen=1000)
+
+    # nltk.pos_tag loads a new tagger model on every call, so load it once
+    def load(self):
+        from nltk.tag.perceptron import PerceptronTagger
+        self.tagger = PerceptronTagger()
+        return self.tagger
+
+    def tagSentence(self, sentence):
+        return self.tagSents([sentence])[0]
+
+    def tagSents(self, sentences):
+        """Takes a list of sentences (lists of English words) and returns a
+           list of POS tagged sentences, as nltk.pos_tag_sents would."""
+        tagged = []
+        for start in xrange(0, len(sentences), self.batchSize):
+            tagged.extend(self.tagBatch(sentences[start:start + self.batchSize]))
+        return tagged
+
+    def tagBatch(self, sentences):
+        startTime = time.time()
+        tagger = self.tagger or self.load()
+
+        results = []
+        for sentence in sentences:
+            key = tuple(sentence)
+            tags = self.cache.get(key)
+            if tags is None:
+                tags = tuple(tagger.tag(sentence))
+                self.cache.put(key, tags)
+            # Callers rewrite tagged sentences in place, so hand out a copy
+            results.append(list(tags))
+
+        seconds = time.time() - startTime
+        self.batches += 1
+        self.sentences += len(sentences)
+        self.seconds += seconds
+        self.batchTimes.append(seconds)
+        return results
+
+    def report(self):
+        """Returns a dict summarizing time spent per batch and cache use."""
+        return {
+            'batches': self.batches,
+            'sentences': self.sentences,
+            'seconds': self.seconds,
+            'recentBatchSeconds': list(self.batchTimes),
+            'cache': self.cache.stats(),
+        }
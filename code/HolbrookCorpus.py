@@ -1,63 +1,125 @@
+import os
+import re
+import array
+import marshal
+
 from Datum import Datum
 from Sentence import Sentence
+from Vocabulary import Vocabulary
+from DeletionIndex import DeletionIndex
+from modelCache import hashFiles, cachePath, openForWrite, commitFile
+
+# Characters stripped from every line before tokenizing
+PUNCTUATION = '",.!\':;'
+
+# One pass over a line: either a whole <err targ=correct> error </err>
+# annotation, or a single whitespace separated token
+TOKEN_RE = re.compile(r'<err\s+targ=([^>]*)>(.*?)</err>|(\S+)')
+
+# Bump when the parse changes, to invalidate cached corpora
+CACHE_FORMAT = 'holbrook;format=1'
 
 class HolbrookCorpus:
   corpus = [] # list of sentences
 
-  def __init__(self, filename=None):
-    if filename:
+  def __init__(self, filename=None, useCache=False):
+    # Interns the words of every sentence of this corpus
+    self.words = Vocabulary([''])
+    if filename and useCache:
+      self.read_cached(filename)
+    elif filename:
       self.read_holbrook(filename)
     else:
       self.corpus = []
 
   def processLine(self, line):
-   line = line.strip()
-   line = line.lower() 
-   line = line.replace('"','') 
-   line = line.replace(',', '')
-   line = line.replace('.','') 
-   line = line.replace('!','') 
-   line = line.replace("'",'') 
-   line = line.replace(":",'') 
-   line = line.replace(";",'') 
+   line = line.strip().lower()
+   if isinstance(line, unicode):
+     line = line.translate(dict((ord(c), None) for c in PUNCTUATION))
+   else:
+     line = line.translate(None, PUNCTUATION)
    if line == '':
      return None
-   processed_tokens = Sentence() 
+   processed_tokens = Sentence(vocabulary=self.words)
    processed_tokens.append(Datum("<s>")) #start symbol
-   tokens = line.split()
-   i = 0
-   while i < len(tokens):
-     token = tokens[i]
-     if token == '<err':
-       targ = tokens[i+1]
-       targ_splits = targ.split('=')
-       correct_token = targ_splits[1][:-1] # chop off the trailing '>'
-       correct_token_splits = correct_token.split()
-       if len(correct_token_splits) > 2: # targ with multiple words
-         #print 'targ with multiple words: "%s"' % targ
-         for correct_word in correct_token_splits:
-           processed_tokens.append(Datum(correct_word))
-       elif tokens[i+3] != '</err>':
-         processed_tokens.append(Datum(correct_token))
-       else:
-         incorrect_token = tokens[i+2]
-         processed_tokens.append(Datum(correct_token, incorrect_token))    
-       i += tokens[i:].index('</err>') + 1 # update index
-     else: # regular word
+   for correct, error, token in TOKEN_RE.findall(line):
+     if token: # regular word
        processed_tokens.append(Datum(token))
-       i += 1
+       continue
+     correct_words = correct.split()
+     error_words = error.split()
+     if len(correct_words) > 1: # targ with multiple words
+       for correct_word in correct_words:
+         processed_tokens.append(Datum(correct_word))
+     elif len(error_words) != 1:
+       processed_tokens.append(Datum(correct))
+     else:
+       processed_tokens.append(Datum(correct, error_words[0]))
    processed_tokens.append(Datum("</s>"))
    return processed_tokens
-  
+
+  def iter_holbrook(self, filename):
+    """Yields the sentences of a holbrook file one at a time as they are parsed."""
+    f = open(filename)
+    for line in f:
+      sentence = self.processLine(line)
+      if sentence:
+        yield sentence
+    f.close()
+
   def read_holbrook(self, filename):
     """Read in holbrook data, returns a list (sentence) of list(words) of lists(alternatives).
        The first item in each word list is the correct word."""
-    f = open(filename)
+    self.corpus = list(self.iter_holbrook(filename))
+
+  def read_cached(self, filename):
+    """Like read_holbrook, but loads the parsed corpus from the on-disk cache
+       when the file has not changed since it was last parsed."""
+    path = cachePath('holbrook-%s.corpus' % hashFiles([filename], CACHE_FORMAT))
+    if os.path.exists(path):
+      self.load(path)
+    else:
+      self.read_holbrook(filename)
+      self.save(path)
+
+  def save(self, path):
+    """Writes the corpus as interned token IDs: a vocabulary, then the word
+       and error IDs of every token (error ID 0 being no error) and the index
+       at which each sentence ends."""
+    vocabulary = Vocabulary([''])
+    words = array.array('i')
+    errors = array.array('i')
+    ends = array.array('i')
+    for sentence in self.corpus:
+      for i in xrange(len(sentence)):
+        datum = sentence.get(i)
+        words.append(vocabulary.intern(datum.word))
+        errors.append(vocabulary.intern(datum.error))
+      ends.append(len(words))
+    f = openForWrite(path)
+    marshal.dump((vocabulary.words, len(words), len(ends)), f)
+    for table in (words, errors, ends):
+      table.tofile(f)
+    commitFile(f, path)
+
+  def load(self, path):
+    f = open(path, 'rb')
+    vocabulary, tokenCount, sentenceCount = marshal.load(f)
+    words = array.array('i')
+    words.fromfile(f, tokenCount)
+    errors = array.array('i')
+    errors.fromfile(f, tokenCount)
+    ends = array.array('i')
+    ends.fromfile(f, sentenceCount)
+    f.close()
+
+    # The cached IDs become the IDs of this corpus
+    self.words = Vocabulary(vocabulary)
     self.corpus = []
-    for line in f:
-      sentence = self.processLine(line)      
-      if sentence:
-        self.corpus.append(sentence)
+    start = 0
+    for end in ends:
+      self.corpus.append(Sentence.fromIds(words[start:end], errors[start:end], self.words))
+      start = end
   
   
   def generateTestCases(self):  
@@ -87,9 +149,14 @@ class HolbrookCorpus:
     """Returns a set of all the words in the corpus"""
     ret = set()
     for sentence in self.corpus:
-      ret |= set(d.word for d in sentence.data[1:-1])
+      ret.update(sentence.getCorrectSentence()[1:-1])
     return ret
 
+  def candidateIndex(self, maxDistance=1):
+    """Returns a DeletionIndex over the corpus vocabulary, for finding all words
+       within maxDistance edits of a given word."""
+    return DeletionIndex(self.vocabulary(), maxDistance)
+
   def __str__(self):
     str_list = []
     for sentence in self.corpus:
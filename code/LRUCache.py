@@ -0,0 +1,49 @@
+import collections
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry once it
+       holds maxSize entries. Counts hits and misses for reporting."""
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        # Re-insert to mark as most recently used
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.maxSize:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Returns a dict with the cache size, hits, misses and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxSize': self.maxSize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': float(self.hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,259 @@
+import mmap
+import zlib
+import struct
+
+from ArticleTester import ArticleTester
+from CompiledDictionary import CompiledDictionary
+from modelCache import openForWrite, commitFile
+
+# Binary layout (integers little-endian uint32 unless said otherwise):
+#
+#   header     MAGIC, sectionCount
+#   sections   sectionCount entries of (name, offset, size), name being
+#              a NUL padded string of up to 16 bytes
+#   data       the sections themselves
+#
+# A table section maps byte strings to byte strings:
+#
+#   header        entryCount, slotCount
+#   slots         slotCount entry numbers plus one (0 marks an empty slot),
+#                 placed by the CRC-32 of the key with linear probing
+#   keyOffsets    entryCount + 1 offsets into the key pool
+#   valueOffsets  entryCount + 1 offsets into the value pool
+#   keyPool       keys, in entry order
+#   valuePool     values, in entry order
+#
+# An array section is the struct typecode of its values ('I', 'i', 'Q' or
+# 'q', the narrowest that holds them all) padded to 4 bytes, a count, and
+# that many values.
+#
+# Values of the tagger table are tags, or NONE_VALUE for the words the
+# tagger tags None.
+#
+# Every process reading a store maps the same file, so the models in it
+# take up memory once however many processes use them, and opening a
+# store reads nothing but its header.
+
+MAGIC = 'MTSTORE1'
+HEADER = struct.Struct('<8sI')
+SECTION = struct.Struct('<16sII')
+TABLE_HEADER = struct.Struct('<II')
+UINT = struct.Struct('<I')
+ARRAY_HEADER = struct.Struct('<c3xI')
+
+# Typecodes an array may be stored with, narrowest first, with the range
+# of values each holds
+ARRAY_TYPES = [
+    ('I', 0, (1 << 32) - 1),
+    ('i', -(1 << 31), (1 << 31) - 1),
+    ('Q', 0, (1 << 64) - 1),
+    ('q', -(1 << 63), (1 << 63) - 1),
+]
+
+# Stands for a None tag, which no real tag can be
+NONE_VALUE = '\0'
+
+# Bump when the layout changes
+FORMAT = 'store;format=2'
+
+def keyHash(key):
+    return zlib.crc32(key) & 0xffffffff
+
+# Returns the bytes of a table section holding (key, value) items, with
+# entries numbered in the order given
+def tableBytes(items):
+    slotCount = 1
+    while slotCount < 2 * len(items):
+        slotCount *= 2
+    slots = [0] * slotCount
+    keyOffsets = [0]
+    valueOffsets = [0]
+    for i, (key, value) in enumerate(items):
+        slot = keyHash(key) & (slotCount - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slotCount - 1)
+        slots[slot] = i + 1
+        keyOffsets.append(keyOffsets[-1] + len(key))
+        valueOffsets.append(valueOffsets[-1] + len(value))
+    return ''.join([TABLE_HEADER.pack(len(items), slotCount)] +
+        [struct.pack('<%dI' % len(table), *table) for table in (slots, keyOffsets, valueOffsets)] +
+        [key for key, value in items] + [value for key, value in items])
+
+# Returns the bytes of an array section holding values, stored with the
+# narrowest typecode that holds them. Raises ValueError if none does.
+def arrayBytes(values):
+    low = min(values) if len(values) else 0
+    high = max(values) if len(values) else 0
+    for typecode, minimum, maximum in ARRAY_TYPES:
+        if minimum <= low and high <= maximum:
+            break
+    else:
+        raise ValueError('array values %d .. %d do not fit in 64 bits' % (low, high))
+    return ARRAY_HEADER.pack(typecode, len(values)) + struct.pack('<%d%s' % (len(values), typecode), *values)
+
+# Writes the models to path as a store. dictionary is the dict returned by
+# parseDict or a CompiledDictionary, taggerTable the word->tag table of
+# a SpanishTagger and englishModel an ArticleTester. version identifies
+# what the models were built from.
+def buildStore(path, version, dictionary, taggerTable, englishModel):
+    sections = [('version', version)]
+    if isinstance(dictionary, CompiledDictionary):
+        sections.append(('compiledDict', dictionary.mm[:]))
+    else:
+        sections.append(('dictionary', tableBytes(sorted(dictionary.iteritems()))))
+    sections.append(('tagger', tableBytes(sorted((word, NONE_VALUE if tag is None else tag)
+        for word, tag in taggerTable.iteritems()))))
+    sections.append(('vocabulary', tableBytes([(word, '') for word in englishModel.vocabulary.words])))
+    sections.append(('lmTotal', arrayBytes([englishModel.total])))
+    for name in ('unigramCounts', 'bigramStart', 'bigramNext', 'bigramCounts'):
+        sections.append((name, arrayBytes(getattr(englishModel, name))))
+
+    f = openForWrite(path)
+    f.write(HEADER.pack(MAGIC, len(sections)))
+    offset = HEADER.size + SECTION.size * len(sections)
+    for name, data in sections:
+        f.write(SECTION.pack(name, offset, len(data)))
+        offset += len(data)
+    for name, data in sections:
+        f.write(data)
+    commitFile(f, path)
+
+
+class MappedTable:
+    """Read-only view of a table section, with the lookups of a dict. Each
+       entry also has a number, its position in the items the table was
+       built from. Values equal to noneValue, if given, are read as None."""
+
+    def __init__(self, mm, offset, noneValue=None):
+        self.mm = mm
+        self.noneValue = noneValue
+        self.count, self.slotCount = TABLE_HEADER.unpack_from(mm, offset)
+        self.slotsStart = offset + TABLE_HEADER.size
+        self.keyOffsetsStart = self.slotsStart + 4 * self.slotCount
+        self.valueOffsetsStart = self.keyOffsetsStart + 4 * (self.count + 1)
+        self.keyPoolStart = self.valueOffsetsStart + 4 * (self.count + 1)
+        self.valuePoolStart = self.keyPoolStart + UINT.unpack_from(mm, self.keyOffsetsStart + 4 * self.count)[0]
+
+    def key(self, i):
+        start, end = struct.unpack_from('<II', self.mm, self.keyOffsetsStart + 4 * i)
+        return self.mm[self.keyPoolStart + start:self.keyPoolStart + end]
+
+    def value(self, i):
+        start, end = struct.unpack_from('<II', self.mm, self.valueOffsetsStart + 4 * i)
+        value = self.mm[self.valuePoolStart + start:self.valuePoolStart + end]
+        if value == self.noneValue:
+            return None
+        return value
+
+    def index(self, key):
+        """Returns the number of the entry with key, or -1."""
+        mask = self.slotCount - 1
+        slot = keyHash(key) & mask
+        while True:
+            entry = UINT.unpack_from(self.mm, self.slotsStart + 4 * slot)[0]
+            if entry == 0:
+                return -1
+            if self.key(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def get(self, key, default=None):
+        i = self.index(key)
+        if i < 0:
+            return default
+        return self.value(i)
+
+    def __getitem__(self, key):
+        i = self.index(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.value(i)
+
+    def __contains__(self, key):
+        return self.index(key) >= 0
+
+    def keys(self):
+        return [self.key(i) for i in xrange(self.count)]
+
+    def __len__(self):
+        return self.count
+
+
+class MappedArray:
+    """Read-only view of an array section, indexed like a list."""
+
+    def __init__(self, mm, offset):
+        self.mm = mm
+        typecode, self.count = ARRAY_HEADER.unpack_from(mm, offset)
+        self.item = struct.Struct('<' + typecode)
+        self.start = offset + ARRAY_HEADER.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.item.unpack_from(self.mm, self.start + self.item.size * i)[0]
+
+    def __len__(self):
+        return self.count
+
+
+class MappedVocabulary:
+    """Vocabulary backed by a table whose entry numbers are the word IDs."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def id(self, word, default=-1):
+        i = self.table.index(word)
+        return i if i >= 0 else default
+
+    def word(self, i):
+        return self.table.key(i)
+
+    def __contains__(self, word):
+        return word in self.table
+
+    def __len__(self):
+        return len(self.table)
+
+
+class ModelStore:
+    """Read-only, memory-mapped models written by buildStore."""
+
+    def __init__(self, path):
+        self.path = path
+        f = open(path, 'rb')
+        self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        magic, sectionCount = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a model store' % path)
+        self.sections = {}
+        for i in xrange(sectionCount):
+            name, offset, size = SECTION.unpack_from(self.mm, HEADER.size + SECTION.size * i)
+            self.sections[name.rstrip('\0')] = (offset, size)
+
+    def version(self):
+        offset, size = self.sections['version']
+        return self.mm[offset:offset + size]
+
+    def dictionary(self):
+        """Returns the dictionary, a CompiledDictionary if it was built from
+           one and otherwise a table with the lookups of parseDict's dict."""
+        if 'compiledDict' in self.sections:
+            return CompiledDictionary(self.path, self.sections['compiledDict'][0])
+        return MappedTable(self.mm, self.sections['dictionary'][0])
+
+    def taggerTable(self):
+        return MappedTable(self.mm, self.sections['tagger'][0], NONE_VALUE)
+
+    def englishModel(self):
+        model = ArticleTester()
+        model.vocabulary = MappedVocabulary(MappedTable(self.mm, self.sections['vocabulary'][0]))
+        model.total = MappedArray(self.mm, self.sections['lmTotal'][0])[0]
+        for name in ('unigramCounts', 'bigramStart', 'bigramNext', 'bigramCounts'):
+            setattr(model, name, MappedArray(self.mm, self.sections[name][0]))
+        return model
+
+    def close(self):
+        self.mm.close()
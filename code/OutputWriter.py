@@ -0,0 +1,181 @@
+import json
+
+# Every field a translation record can have, in the order the debug view
+# prints them: the tokenized Spanish sentence, its translation and the
+# reference translation (lists of words), the raw lines of the Spanish
+# sentence and the reference, the direct translation, the BLEU scores of
+# the direct and final translations, and the POS tagged translation.
+FIELDS = ['spanish', 'translation', 'reference', 'rawSpanish', 'rawReference',
+    'direct', 'directBleu', 'bleu', 'tagged']
+
+# Fields written by the jsonl and tsv formats unless others are asked for
+DEFAULT_FIELDS = ['spanish', 'translation', 'reference', 'bleu']
+
+# Fields holding lists of words, joined with spaces when written as text
+TOKEN_FIELDS = frozenset(['spanish', 'translation', 'reference', 'direct'])
+
+
+class OutputWriter:
+    """Writes translation records to a stream. Output is collected in a
+       buffer and written in large blocks, or after every record when
+       lineBuffered is set. Subclasses format the records; fields lists the
+       ones they write, so callers can skip computing the rest. n is the
+       n-gram order of the BLEU scores."""
+
+    def __init__(self, stream, fields=None, lineBuffered=False, n=2, bufferSize=1 << 16):
+        self.stream = stream
+        self.n = n
+        self.fields = list(fields if fields is not None else DEFAULT_FIELDS)
+        self.lineBuffered = lineBuffered
+        self.bufferSize = bufferSize
+        self.buffer = []
+        self.buffered = 0
+
+    def needs(self, field):
+        return field in self.fields
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        self.stream.write(''.join(self.buffer))
+        self.stream.flush()
+        self.buffer = []
+        self.buffered = 0
+
+    def begin(self):
+        pass
+
+    def record(self, i, values):
+        """Writes the record of the i-th (0 based) sentence. values maps
+           each field in self.fields to its value."""
+        raise NotImplementedError
+
+    def end(self):
+        self.flush()
+
+    def writeAll(self, columns, first=0):
+        """Writes every sentence, given a dict mapping each field to a list
+           with one value per sentence. Sentences are numbered from first."""
+        self.begin()
+        for i in xrange(len(columns['translation'])):
+            self.add(first + i, dict((field, columns[field][i]) for field in self.fields))
+        self.end()
+
+    # Writes one record, flushing it right away when line buffered
+    def add(self, i, values):
+        self.record(i, values)
+        if self.lineBuffered:
+            self.flush()
+
+    # Returns the value of field as a single line of text
+    def text(self, field, value):
+        if field in TOKEN_FIELDS:
+            return ' '.join(value)
+        if field in ('rawSpanish', 'rawReference'):
+            return value.rstrip('\n')
+        return str(value)
+
+
+class TextWriter(OutputWriter):
+    """Writes only the translations, one per line."""
+
+    def __init__(self, stream, fields=None, lineBuffered=False, n=2):
+        OutputWriter.__init__(self, stream, ['translation'], lineBuffered, n)
+
+    def record(self, i, values):
+        self.write(' '.join(values['translation']) + '\n')
+
+
+class JsonLinesWriter(OutputWriter):
+    """Writes one JSON object per sentence, with words joined by spaces."""
+
+    def record(self, i, values):
+        record = {'id': i + 1}
+        for field in self.fields:
+            value = values[field]
+            if field in TOKEN_FIELDS or field in ('rawSpanish', 'rawReference'):
+                value = self.text(field, value)
+            record[field] = value
+        self.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+class TsvWriter(OutputWriter):
+    """Writes a header line, then one tab separated line per sentence."""
+
+    def begin(self):
+        self.write('\t'.join(['id'] + self.fields) + '\n')
+
+    def record(self, i, values):
+        line = [str(i + 1)]
+        for field in self.fields:
+            line.append(self.text(field, values[field]).replace('\t', ' ').replace('\n', ' '))
+        self.write('\t'.join(line) + '\n')
+
+
+class DebugWriter(OutputWriter):
+    """The verbose view translator.py has always printed: a block per
+       sentence with every field, then a summary of the BLEU scores.
+       Records holding only some fields print just those lines. When line
+       buffered, the header and blank lines between blocks are left out,
+       as translator.py --stream has always printed them."""
+
+    # Label of each field, in the order they are printed
+    LABELS = [
+        ('spanish', 'Translation of: '),
+        ('translation', 'Translation: '),
+        ('reference', 'Correct Translation: '),
+        ('rawSpanish', 'Raw Spanish Sentence: '),
+        ('rawReference', 'Raw Correct Translation: '),
+        ('direct', 'Direct Translation: '),
+        ('directBleu', 'Direct Translation BLEU- %d  Score: '),
+        ('bleu', 'Final BLEU- %d  Score: '),
+        ('tagged', 'Tagged Translation: '),
+    ]
+
+    def __init__(self, stream, fields=None, lineBuffered=False, n=2):
+        OutputWriter.__init__(self, stream, fields if fields is not None else FIELDS, lineBuffered, n)
+        # (i, direct, final) BLEU scores of each sentence, for the summary
+        self.scores = []
+
+    def begin(self):
+        if not self.lineBuffered:
+            self.write('\n\n\n================ TRANSLATIONS ==================\n\n\n\n')
+
+    def record(self, i, values):
+        lines = ['============= New Translation: {0} ============='.format(i + 1)]
+        if not self.lineBuffered:
+            lines.insert(0, '')
+        for field, label in self.LABELS:
+            if field in values:
+                value = values[field]
+                if field in TOKEN_FIELDS:
+                    value = ' '.join(value)
+                if '%d' in label:
+                    label = label % self.n
+                lines.append('%s %s' % (label, value))
+        self.write('\n'.join(lines) + '\n')
+        if 'directBleu' in values and 'bleu' in values:
+            self.scores.append((i, values['directBleu'], values['bleu']))
+
+    def end(self):
+        if self.scores:
+            self.write('Summary: \n')
+            for i, directBleu, bleu in self.scores:
+                self.write('Sentence:  %d  Direct Translation Score:  %s  vs. Final Score:  %s\n'
+                    % (i + 1, directBleu, bleu))
+        self.flush()
+
+
+WRITERS = {
+    'debug': DebugWriter,
+    'text': TextWriter,
+    'jsonl': JsonLinesWriter,
+    'tsv': TsvWriter,
+}
+
+def makeWriter(format, stream, fields=None, lineBuffered=False, n=2):
+    return WRITERS[format](stream, fields, lineBuffered, n)
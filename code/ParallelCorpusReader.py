@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import mmap
+import array
+import itertools
+
+from modelCache import hashFiles, cachePath, openForWrite, commitFile
+
+# Splits a line into words and single punctuation marks, keeping decimal
+# numbers and words with inner apostrophes or hyphens together. Much
+# faster than the NLTK tokenizer, and the same on plain sentences.
+TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)+|[^\s.,;:!?()\[\]\"]+|\S")
+
+# Tokenizes a line with TOKEN_RE
+def regexTokenize(line):
+    return TOKEN_RE.findall(line)
+
+# Returns true if a line holds no words once Spanish opening punctuation
+# is stripped, i.e. if it would tokenize to an empty list
+def isBlank(line):
+    return not line.strip().strip('¡¿').strip()
+
+# Bump when the layout of saved pair indexes changes
+INDEX_FORMAT = 'pairIndex;format=1'
+
+# Which line of a sentence pair the reader expects next
+SPANISH = 0
+ENGLISH = 1
+
+
+class SentencePair(object):
+    """One Spanish sentence and its English reference. The raw lines are
+       kept as read, and each side is tokenized the first time its words
+       are asked for. offset is the byte offset of the Spanish line."""
+
+    __slots__ = ('index', 'offset', 'rawSpanish', 'rawEnglish', 'tokenize', 'spanishWords', 'englishWords')
+
+    def __init__(self, index, offset, rawSpanish, rawEnglish, tokenize):
+        self.index = index
+        self.offset = offset
+        self.rawSpanish = rawSpanish
+        self.rawEnglish = rawEnglish
+        self.tokenize = tokenize
+        self.spanishWords = None
+        self.englishWords = None
+
+    @property
+    def spanish(self):
+        if self.spanishWords is None:
+            self.spanishWords = self.tokenize(self.rawSpanish)
+        return self.spanishWords
+
+    @property
+    def english(self):
+        if self.englishWords is None:
+            self.englishWords = self.tokenize(self.rawEnglish)
+        return self.englishWords
+
+
+class ParallelCorpusReader:
+    """Reads a parallel corpus: '#' comment lines, and Spanish sentences
+       each followed by their English translation on the next non-blank
+       line. The file is memory-mapped, so it is never read into memory as a
+       whole, and pairs can be read from any byte offset or, once the pair
+       offsets are indexed, from any pair number. tokenize takes a raw line
+       and returns its words; it is only called for the words used. With
+       useCache, the index is saved in the model cache, keyed by the hash
+       of the file, and reused by later readers of the same file."""
+
+    def __init__(self, filename, tokenize=regexTokenize, useCache=False):
+        self.filename = filename
+        self.tokenize = tokenize
+        self.useCache = useCache
+        f = open(filename, 'rb')
+        try:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self.data = ''
+        f.close()
+        # Byte offset of the Spanish line of each pair, built on demand
+        self.offsets = None
+
+    # Yields (offset, line) for each line starting at byte offset
+    def lines(self, offset=0):
+        data = self.data
+        end = len(data)
+        while offset < end:
+            newline = data.find('\n', offset)
+            stop = end if newline < 0 else newline + 1
+            yield (offset, data[offset:stop])
+            offset = stop
+
+    def pairsFrom(self, offset=0, index=0):
+        """Yields SentencePairs starting with the Spanish line at byte
+           offset, numbering them from index."""
+        expecting = SPANISH
+        for lineOffset, line in self.lines(offset):
+            if line.startswith('#') or isBlank(line):
+                continue
+            if expecting == SPANISH:
+                spanishOffset = lineOffset
+                rawSpanish = line
+                expecting = ENGLISH
+            else:
+                yield SentencePair(index, spanishOffset, rawSpanish, line, self.tokenize)
+                index += 1
+                expecting = SPANISH
+
+    def buildIndex(self):
+        """Records the byte offset of every pair, for len() and pairs()."""
+        if self.offsets is None:
+            if self.useCache:
+                self.offsets = self.cachedIndex()
+            else:
+                self.offsets = self.scanIndex()
+        return self.offsets
+
+    def scanIndex(self):
+        return array.array('L', (pair.offset for pair in self.pairsFrom()))
+
+    # Loads the index of the file from the cache, building and saving it
+    # when the file has not been indexed before
+    def cachedIndex(self):
+        path = cachePath('pairs-%s.index' % hashFiles([self.filename], INDEX_FORMAT))
+        offsets = array.array('L')
+        if os.path.exists(path):
+            f = open(path, 'rb')
+            offsets.fromfile(f, os.path.getsize(path) // offsets.itemsize)
+            f.close()
+            return offsets
+        offsets = self.scanIndex()
+        f = openForWrite(path)
+        offsets.tofile(f)
+        commitFile(f, path)
+        return offsets
+
+    def pairs(self, start=0, stop=None):
+        """Yields pairs start .. stop - 1 (to the end when stop is None)."""
+        if start == 0:
+            pairs = self.pairsFrom()
+        else:
+            offsets = self.buildIndex()
+            if start >= len(offsets):
+                return iter([])
+            pairs = self.pairsFrom(offsets[start], start)
+        if stop is not None:
+            pairs = itertools.islice(pairs, max(0, stop - start))
+        return pairs
+
+    def __iter__(self):
+        return self.pairsFrom()
+
+    def __len__(self):
+        return len(self.buildIndex())
+
+    def __getitem__(self, i):
+        for pair in self.pairs(i, i + 1):
+            return pair
+        raise IndexError(i)
+
+    def close(self):
+        if self.data:
+            self.data.close()
@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import json
+import cProfile
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is then reported as None
+    resource = None
+
+# Returns the peak resident set size of this process (or, with children
+# true, of its finished child processes) in kilobytes
+def peakRssKB(children=False):
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on OS X and kilobytes elsewhere
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+# Returns the user plus system CPU time used by this process so far
+def cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+
+class StageStats:
+    """Time and work accumulated by one stage over all of its calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.wallSeconds = 0.0
+        self.cpuSeconds = 0.0
+        self.sentences = 0
+        self.tokens = 0
+        self.peakRssKB = None
+
+    # Records the sentences (lists of words or of (word, tag) pairs) the
+    # stage processed, for its throughput
+    def count(self, sentences):
+        self.sentences += len(sentences)
+        self.tokens += sum(len(sentence) for sentence in sentences)
+
+    def merge(self, stats):
+        self.calls += stats['calls']
+        self.wallSeconds += stats['wallSeconds']
+        self.cpuSeconds += stats['cpuSeconds']
+        self.sentences += stats['sentences']
+        self.tokens += stats['tokens']
+        if stats['peakRssKB'] is not None:
+            self.peakRssKB = max(self.peakRssKB, stats['peakRssKB'])
+
+    def report(self):
+        return {
+            'calls': self.calls,
+            'wallSeconds': self.wallSeconds,
+            'cpuSeconds': self.cpuSeconds,
+            'sentences': self.sentences,
+            'tokens': self.tokens,
+            'sentencesPerSecond': self.sentences / self.wallSeconds if self.wallSeconds else None,
+            'tokensPerSecond': self.tokens / self.wallSeconds if self.wallSeconds else None,
+            'peakRssKB': self.peakRssKB,
+        }
+
+
+class Profiler:
+    """Collects wall and CPU time, throughput and memory use per pipeline
+       stage. Stages are timed with
+
+           with profiler.measure('translate', sentences):
+               sentences = translate(sentences, dictionary)
+
+       and may be measured any number of times, e.g. once per sentence when
+       streaming. When profileDir is given, each stage is also run under its
+       own cProfile profiler, dumped to profileDir/<stage>.prof by dump()."""
+
+    def __init__(self, profileDir=None):
+        self.profileDir = profileDir
+        self.stages = {}
+        # Stage names in the order they were first measured
+        self.order = []
+        self.profiles = {}
+        self.startTime = time.time()
+        self.startCpu = cpuTime()
+
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageStats()
+            self.order.append(name)
+        return self.stages[name]
+
+    @contextlib.contextmanager
+    def measure(self, name, sentences=None):
+        """Times the body of the with statement as one call of the stage.
+           sentences, if given, are counted as its input; otherwise call
+           count() on the yielded StageStats."""
+        stats = self.stage(name)
+        if sentences is not None:
+            stats.count(sentences)
+
+        profile = None
+        if self.profileDir is not None:
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+        startTime = time.time()
+        startCpu = cpuTime()
+        try:
+            yield stats
+        finally:
+            stats.wallSeconds += time.time() - startTime
+            stats.cpuSeconds += cpuTime() - startCpu
+            if profile is not None:
+                profile.disable()
+            stats.calls += 1
+            stats.peakRssKB = peakRssKB()
+
+    def wrap(self, name, stage):
+        """Returns stage (a function taking a list of sentences) measured
+           on every call."""
+        def measured(sentences):
+            with self.measure(name, sentences):
+                return stage(sentences)
+        return measured
+
+    # Adds stage reports from another Profiler, e.g. one run by a worker
+    # process, to this one's
+    def merge(self, stageReports):
+        for name, stats in stageReports:
+            self.stage(name).merge(stats)
+
+    def stageReports(self):
+        return [(name, self.stages[name].report()) for name in self.order]
+
+    def report(self, caches=None, taggers=None):
+        """Returns the JSON serializable report. caches maps a cache name
+           to the stats dict of an LRUCache, and taggers a tagger name to
+           its report of the batches it tagged."""
+        return {
+            'stages': [dict(stats, name=name) for name, stats in self.stageReports()],
+            'wallSeconds': time.time() - self.startTime,
+            'cpuSeconds': cpuTime() - self.startCpu,
+            'peakRssKB': peakRssKB(),
+            'childrenPeakRssKB': peakRssKB(children=True),
+            'caches': caches or {},
+            'taggers': taggers or {},
+        }
+
+    def dump(self):
+        """Writes the cProfile output of each stage to profileDir."""
+        if self.profileDir is None:
+            return
+        if not os.path.isdir(self.profileDir):
+            os.makedirs(self.profileDir)
+        for name, profile in self.profiles.iteritems():
+            profile.dump_stats(os.path.join(self.profileDir, name + '.prof'))
+
+    def write(self, path, caches=None, taggers=None):
+        f = open(path, 'w')
+        json.dump(self.report(caches, taggers), f, indent=2, sort_keys=True)
+        f.write('\n')
+        f.close()
+        self.dump()
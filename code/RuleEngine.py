@@ -0,0 +1,95 @@
+class Token:
+    """Matches a single (word, tag) pair. Every condition given must hold:
+       word / words restrict the word itself, tagPrefix and tagContains the
+       tag (a tag of None never matches them), and test is an arbitrary
+       predicate on (word, tag)."""
+
+    def __init__(self, word=None, words=None, tagPrefix=None, tagContains=None, test=None):
+        if word is not None:
+            words = [word]
+        self.words = frozenset(words) if words is not None else None
+        self.tagPrefix = tagPrefix
+        self.tagContains = tagContains
+        self.test = test
+
+    def matches(self, pair):
+        word, tag = pair
+        if self.words is not None and word not in self.words:
+            return False
+        if self.tagPrefix is not None and not (tag and tag.startswith(self.tagPrefix)):
+            return False
+        if self.tagContains is not None and not (tag and any(t in tag for t in self.tagContains)):
+            return False
+        if self.test is not None and not self.test(word, tag):
+            return False
+        return True
+
+
+class Rule:
+    """Rewrites a window of consecutive (word, tag) pairs matching pattern
+       (a list of Tokens). rewrite takes the matched pairs and returns their
+       replacements, one for each. The rule does not fire when notAfter
+       matches the pair preceding the window. After a match, scanning resumes
+       consume pairs further on (by default, after the whole window)."""
+
+    def __init__(self, name, pattern, rewrite, notAfter=None, consume=None):
+        self.name = name
+        self.pattern = pattern
+        self.rewrite = rewrite
+        self.notAfter = notAfter
+        self.consume = consume if consume is not None else len(pattern)
+
+    def matches(self, window, previous):
+        """window holds one pair per token of the pattern, previous is the
+           pair before the window (None at the start of the sentence)."""
+        if previous is not None and self.notAfter is not None and self.notAfter.matches(previous):
+            return False
+        for token, pair in zip(self.pattern, window):
+            if not token.matches(pair):
+                return False
+        return True
+
+
+class RuleEngine:
+    """Applies a list of rules to tagged sentences in a single left-to-right
+       pass. Each rule runs as a small transducer that buffers only its own
+       window, and the transducers are chained so every word flows through
+       all of the rules as it is read. The result is the same as running
+       each rule in its own pass over the sentence, in the order given."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+
+    def transduce(self, rule, pairs):
+        width = len(rule.pattern)
+        window = []
+        previous = None
+        for pair in pairs:
+            window.append(pair)
+            if len(window) < width:
+                continue
+            if rule.matches(window, previous):
+                window = rule.rewrite(window)
+                for out in window[:rule.consume]:
+                    yield out
+                previous = window[rule.consume - 1]
+                window = window[rule.consume:]
+            else:
+                previous = window.pop(0)
+                yield previous
+        for out in window:
+            yield out
+
+    def applySentence(self, sentence):
+        """Rewrites the sentence (a list of (word, tag) pairs) in place."""
+        pairs = iter(sentence)
+        for rule in self.rules:
+            pairs = self.transduce(rule, pairs)
+        sentence[:] = list(pairs)
+        return sentence
+
+    def apply(self, taggedSentences):
+        updatedSentences = []
+        for sentence in taggedSentences:
+            updatedSentences.append(self.applySentence(sentence))
+        return updatedSentences
@@ -1,72 +1,142 @@
-class Sentence:
-  """Contains a list of Datums."""
+import array
 
-  def __init__(self, sentence=[]):
-    if(type(sentence) == type([])):
-      self.data = list(sentence) 
+from Datum import Datum
+from Vocabulary import Vocabulary
+
+class ReadOnlyDatum(Datum):
+  """A Datum copied out of a Sentence. Changing it would not change the
+     sentence, so it refuses to be changed at all."""
+  __slots__ = ()
+
+  def __init__(self, word, error=''):
+    Datum.__setattr__(self, 'word', word)
+    Datum.__setattr__(self, 'error', error)
+
+  def __setattr__(self, name, value):
+    raise AttributeError('Datums read from a Sentence are read-only, use Sentence.put to change one')
+
+class Sentence(object):
+  """Contains a list of Datums, stored as parallel arrays of word and error IDs
+     in vocabulary, which interns every word and error of the sentence (ID 0
+     being '', so an error ID of 0 means the word has no error). Sentences of
+     one corpus share its vocabulary; a sentence made without one gets its
+     own. Constructing a Sentence from another shares its arrays until either
+     is modified."""
+  __slots__ = ('words', 'errors', 'sharedWords', 'sharedErrors', 'vocabulary')
+
+  def __init__(self, sentence=[], vocabulary=None):
+    if isinstance(sentence, Sentence):
+      self.vocabulary = sentence.vocabulary
+      self.words = sentence.words
+      self.errors = sentence.errors
+      self.sharedWords = sentence.sharedWords = True
+      self.sharedErrors = sentence.sharedErrors = True
     else:
-      self.data = list(sentence.data)
+      self.vocabulary = vocabulary if vocabulary is not None else Vocabulary([''])
+      self.words = array.array('i')
+      self.errors = None # None when no datum has an error
+      self.sharedWords = False
+      self.sharedErrors = False
+      for datum in sentence:
+        self.append(datum)
+
+  @classmethod
+  def fromIds(cls, words, errors=None, vocabulary=None):
+    """Builds a sentence directly from arrays of IDs in vocabulary."""
+    sentence = cls(vocabulary=vocabulary)
+    sentence.words = words
+    sentence.sharedWords = True
+    if errors is not None and any(errors):
+      sentence.errors = errors
+      sentence.sharedErrors = True
+    return sentence
+
+  def setWord(self, i, word):
+    if self.words[i] == word:
+      return
+    if self.sharedWords:
+      self.words = array.array('i', self.words)
+      self.sharedWords = False
+    self.words[i] = word
+
+  def setError(self, i, error):
+    if self.errors is None:
+      if not error:
+        return
+      self.errors = array.array('i', [0]) * len(self.words)
+      self.sharedErrors = False
+    elif self.sharedErrors:
+      self.errors = array.array('i', self.errors)
+      self.sharedErrors = False
+    self.errors[i] = error
+
+  @property
+  def data(self):
+    """A tuple of read-only copies of the sentence's Datums. To change a
+       word of the sentence, use put."""
+    return tuple(self.get(i) for i in xrange(len(self.words)))
   
   def getErrorSentence(self):
     """Returns a list of strings with the sentence containing all errors."""
-    errorSentence = []
-    for datum in self.data:
-      if datum.hasError():
-        errorSentence.append(datum.error)
-      else:
-        errorSentence.append(datum.word)
-    return errorSentence
+    words = self.vocabulary.words
+    if self.errors is None:
+      return [words[w] for w in self.words]
+    return [words[e] if e else words[w] for w, e in zip(self.words, self.errors)]
 
   def getCorrectSentence(self):
     """Returns a list of strings with the sentence containing all corrections."""
-    correctSentence = []
-    for datum in self.data:
-      correctSentence.append(datum.word)
-    return correctSentence
+    words = self.vocabulary.words
+    return [words[w] for w in self.words]
 
   def isCorrection(self, candidate):
     """Checks if a list of strings is a correction of this sentence."""
-    if len(self.data) != len(candidate):
-      return False
-    for i in range(0,len(self.data)):
-      if not candidate[i] == self.data[i].word:
-        return False
-    return True
+    return self.getCorrectSentence() == list(candidate)
 
   def getErrorIndex(self):
-    for i in range(0, len(self.data)):
-      if self.data[i].hasError():
-        return i
+    if self.errors is not None:
+      for i in range(0, len(self.errors)):
+        if self.errors[i]:
+          return i
     return -1
 
   def len(self):
-    return len(self.data)
+    return len(self.words)
 
   def get(self, i):
-    return self.data[i]
+    words = self.vocabulary.words
+    error = self.errors[i] if self.errors is not None else 0
+    return ReadOnlyDatum(words[self.words[i]], words[error])
 
   def put(self, i, val):
-    self.data[i] = val
+    """Sets the i-th Datum of the sentence to a copy of val."""
+    self.setWord(i, self.vocabulary.intern(val.word))
+    self.setError(i, self.vocabulary.intern(val.error))
 
   def cleanSentence(self):
     """Returns a new sentence with all datum's having error removed."""
-    sentence = Sentence()
-    for datum in self.data:
-      clean = datum.fixError()
-      sentence.append(clean)
-    return sentence
+    self.sharedWords = True
+    return Sentence.fromIds(self.words, vocabulary=self.vocabulary)
 
   def isEmpty(self):
-    return len(self.data) == 0
+    return len(self.words) == 0
 
   def append(self, item):    
-    self.data.append(item)
+    if self.sharedWords:
+      self.words = array.array('i', self.words)
+      self.sharedWords = False
+    self.words.append(0)
+    if self.errors is not None:
+      if self.sharedErrors:
+        self.errors = array.array('i', self.errors)
+        self.sharedErrors = False
+      self.errors.append(0)
+    self.put(len(self.words) - 1, item)
 
   def __len__(self):
-    return len(self.data)
+    return len(self.words)
 
   def __str__(self):
     str_list = []
-    for datum in self.data:
-      str_list.append(str(datum))
+    for i in xrange(len(self.words)):
+      str_list.append(str(self.get(i)))
     return ' '.join(str_list)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import os
+import math
+import unicodedata
+
+from DeletionIndex import DeletionIndex
+from LRUCache import LRUCache
+from modelCache import EDIT_COUNTS_PATH
+
+# Single-edit spelling error counts, one 'typed|correct<TAB>count' per line
+editCountsPath = EDIT_COUNTS_PATH
+
+# Returns the single edit turning correct into typed, in the notation of
+# count_1edit.txt, typed side first: a substitution 'e|i', a transposition
+# 'ei|ie', and an insertion or deletion written with the character before
+# it for context ('te|t', 't|te'), '<' standing for the start of the word.
+# Assumes the two differ by exactly one edit.
+def editFor(correct, typed):
+    i = 0
+    while i < len(correct) and i < len(typed) and correct[i] == typed[i]:
+        i += 1
+    context = correct[i - 1] if i > 0 else '<'
+    if len(correct) > len(typed):
+        return context + '|' + context + correct[i]
+    if len(correct) < len(typed):
+        return context + typed[i] + '|' + context
+    if correct[i + 1:] == typed[i + 1:]:
+        return typed[i] + '|' + correct[i]
+    return typed[i:i + 2] + '|' + correct[i:i + 2]
+
+# Strips accents, so 'á' and 'a' compare equal
+def baseLetter(c):
+    return unicodedata.normalize('NFD', c)[0]
+
+# Capitalizes correction if typed was capitalized
+def matchCase(correction, typed):
+    if typed[:1].isupper():
+        correction = toUnicode(correction)
+        return (correction[:1].upper() + correction[1:]).encode('utf-8')
+    return correction
+
+def toUnicode(word):
+    if isinstance(word, unicode):
+        return word
+    return word.decode('utf-8', 'replace')
+
+
+class SpellCorrector:
+    """Noisy channel spelling correction of Spanish source words. A word the
+       dictionary does not know is replaced by the dictionary word w within
+       one edit that maximizes
+
+           log P(typed | w) + lmWeight * log P(english(w) | previous English word)
+
+       where the channel probability comes from the edit counts in
+       count_1edit.txt and the second term from the English language model.
+       Candidates come from a DeletionIndex over the dictionary, and each
+       word's candidates and channel scores are cached."""
+
+    def __init__(self, dictionary, englishModel, editCounts=None, lmWeight=1.0, minLength=3, cacheSize=100000):
+        self.dictionary = dictionary
+        self.englishModel = englishModel
+        self.lmWeight = lmWeight
+        self.minLength = minLength
+        self.cache = LRUCache(cacheSize)
+
+        self.editCounts = {}
+        f = open(editCounts or editCountsPath)
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) == 2:
+                self.editCounts[toUnicode(fields[0])] = int(fields[1])
+        f.close()
+        self.totalEdits = float(sum(self.editCounts.itervalues()) + len(self.editCounts))
+        # Dropping or swapping an accent is as common as the most common edit
+        self.accentCount = max(self.editCounts.values() or [1])
+
+        keys = [toUnicode(key) for key in dictionary.keys() if ' ' not in key]
+        self.index = DeletionIndex(keys, 1)
+
+    def channelScore(self, correct, typed):
+        """Log probability of typing typed when correct was meant."""
+        edit = editFor(correct, typed)
+        typedPart, correctPart = edit.split('|')
+        if len(typedPart) == len(correctPart) == 1 and baseLetter(typedPart) == baseLetter(correctPart):
+            count = self.accentCount
+        else:
+            count = self.editCounts.get(edit, 0)
+        return math.log((count + 1) / self.totalEdits)
+
+    # Returns (correct word, channel score) pairs for a word the dictionary
+    # does not contain
+    def candidates(self, word):
+        result = self.cache.get(word)
+        if result is None:
+            typed = toUnicode(word.lower())
+            result = []
+            for candidate, distance in self.index.candidates(typed).iteritems():
+                if distance == 1:
+                    result.append((candidate.encode('utf-8'), self.channelScore(candidate, typed)))
+            self.cache.put(word, result)
+        return result
+
+    def needsCorrection(self, word, i):
+        if word in self.dictionary or word.lower() in self.dictionary:
+            return False
+        # Leave short words, numbers, punctuation and proper nouns alone
+        if len(word) < self.minLength or not toUnicode(word).isalpha():
+            return False
+        return i == 0 or not word[0].isupper()
+
+    def correctSentence(self, sentence):
+        """Takes a tokenized Spanish sentence and returns it with misspelled
+           words replaced by their most likely dictionary word."""
+        corrected = []
+        previousEnglish = '<s>'
+        for i, word in enumerate(sentence):
+            if self.needsCorrection(word, i):
+                best = None
+                for candidate, channel in self.candidates(word):
+                    english = self.dictionary[candidate]
+                    lm, _ = self.englishModel.tokenScore(previousEnglish, english)
+                    score = channel + self.lmWeight * lm
+                    if best is None or score > best[0]:
+                        best = (score, candidate)
+                if best is not None:
+                    word = matchCase(best[1], word)
+
+            corrected.append(word)
+            english = self.dictionary.get(word) or self.dictionary.get(word.lower())
+            previousEnglish = english.split()[-1].lower() if english else word.lower()
+        return corrected
+
+    def correct(self, spanishSentences):
+        correctedSentences = []
+        for sentence in spanishSentences:
+            correctedSentences.append(self.correctSentence(sentence))
+        return correctedSentences
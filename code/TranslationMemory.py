@@ -0,0 +1,142 @@
+import os
+import marshal
+import unicodedata
+
+# Rows looked up or written per statement, below SQLite's limit on the
+# number of parameters
+CHUNK_SIZE = 500
+
+# Returns the translation memory key of a tokenized sentence: its words
+# in Unicode NFC form, separated by single spaces
+def normalizeSentence(sentence):
+    line = ' '.join(sentence)
+    try:
+        return unicodedata.normalize('NFC', line.decode('utf-8')).encode('utf-8')
+    except UnicodeError:
+        return line
+
+
+class TranslationMemory:
+    """Persistent store of finished translations in an SQLite database,
+       keyed by normalized Spanish sentence. Holds at most maxEntries
+       translations, evicting the least recently used. version identifies
+       the dictionary, models and settings the translations were made
+       with; opening the store with a different version empties it."""
+
+    def __init__(self, path, version, maxEntries=1000000):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Imported here so translating without a memory never loads sqlite3
+        import sqlite3
+        self.db = sqlite3.connect(path)
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries '
+            '(key BLOB PRIMARY KEY, value BLOB, lastUsed INTEGER)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entriesLastUsed ON entries (lastUsed)')
+        if self.meta('version') != version:
+            self.db.execute('DELETE FROM entries')
+            self.setMeta('version', version)
+            self.setMeta('clock', '0')
+        # Counts uses, so entries can be ordered by when they were last used
+        self.clock = int(self.meta('clock'))
+        self.db.commit()
+
+    def meta(self, name):
+        row = self.db.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def setMeta(self, name, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+    def get(self, keys):
+        """Returns a dict of key : (translation, taggedTranslation) for
+           the keys found in the store, marking them as recently used."""
+        found = {}
+        for start in xrange(0, len(keys), CHUNK_SIZE):
+            chunk = [buffer(key) for key in keys[start:start + CHUNK_SIZE]]
+            rows = self.db.execute('SELECT key, value FROM entries WHERE key IN (%s)'
+                % ','.join('?' * len(chunk)), chunk).fetchall()
+            for key, value in rows:
+                found[str(key)] = marshal.loads(str(value))
+            if rows:
+                self.clock += 1
+                self.db.execute('UPDATE entries SET lastUsed = ? WHERE key IN (%s)'
+                    % ','.join('?' * len(rows)), [self.clock] + [key for key, value in rows])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, items):
+        """Stores (key, (translation, taggedTranslation)) items, then
+           evicts the least recently used entries over maxEntries."""
+        self.clock += 1
+        self.db.executemany('INSERT OR REPLACE INTO entries (key, value, lastUsed) VALUES (?, ?, ?)',
+            ((buffer(key), buffer(marshal.dumps(value)), self.clock) for key, value in items))
+        self.evict()
+        self.setMeta('clock', str(self.clock))
+        self.db.commit()
+
+    def evict(self):
+        excess = len(self) - self.maxEntries
+        if excess > 0:
+            self.db.execute('DELETE FROM entries WHERE key IN '
+                '(SELECT key FROM entries ORDER BY lastUsed LIMIT ?)', (excess,))
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def stats(self):
+        """Returns a dict with the store size, hits, misses and hit rate,
+           in the same form as LRUCache.stats."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self),
+            'maxSize': self.maxEntries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+# Translates a list of tokenized Spanish sentences with translate, which
+# takes a list of sentences and returns (translations, taggedTranslations).
+# Each distinct sentence is translated once, and only if it is not in the
+# memory (when one is given); the results are fanned back out to every
+# occurrence. Returns (translations, taggedTranslations) like translate.
+def translateWithMemory(spanishSentences, translate, memory=None):
+    keys = [normalizeSentence(sentence) for sentence in spanishSentences]
+
+    # First occurrence of each distinct sentence
+    firstIndex = {}
+    for i, key in enumerate(keys):
+        if key not in firstIndex:
+            firstIndex[key] = i
+
+    results = memory.get(firstIndex.keys()) if memory is not None else {}
+    missing = [key for key in firstIndex if key not in results]
+    if missing:
+        missing.sort(key=firstIndex.get)
+        translations, tagged = translate([spanishSentences[firstIndex[key]] for key in missing])
+        translated = zip(missing, zip(translations, tagged))
+        results.update(translated)
+        if memory is not None:
+            memory.put(translated)
+
+    # Later stages may rewrite sentences in place, so each occurrence gets
+    # its own copy
+    englishTranslations = []
+    taggedEnglishTranslations = []
+    for key in keys:
+        translation, tagged = results[key]
+        englishTranslations.append(list(translation))
+        taggedEnglishTranslations.append(list(tagged) if tagged is not None else None)
+    return (englishTranslations, taggedEnglishTranslations)
@@ -0,0 +1,30 @@
+class Vocabulary:
+    """Interns words as consecutive integer IDs, starting at 0."""
+
+    def __init__(self, words=None):
+        self.words = []
+        self.ids = {}
+        for word in words or []:
+            self.intern(word)
+
+    def intern(self, word):
+        """Returns the ID of word, adding it if it is new."""
+        i = self.ids.get(word)
+        if i is None:
+            i = len(self.words)
+            self.ids[word] = i
+            self.words.append(word)
+        return i
+
+    def id(self, word, default=-1):
+        """Returns the ID of word, or default if it was never interned."""
+        return self.ids.get(word, default)
+
+    def word(self, i):
+        return self.words[i]
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def __len__(self):
+        return len(self.words)
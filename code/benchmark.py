@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import json
+import Queue
+import random
+import bisect
+import argparse
+import traceback
+import subprocess
+import itertools
+import collections
+import multiprocessing
+
+import translator
+from Profiler import Profiler, peakRssKB
+from BLEUScorer import BLEUScorer
+from CompiledDictionary import readSource
+
+# Used when the CESS corpus is not installed: transitions between coarse
+# Spanish tags (the first letter of a CESS tag) for simple declarative
+# sentences, as (tag, next tag, weight).
+FALLBACK_TRANSITIONS = [
+    ('<s>', 'd', 5), ('<s>', 'n', 2), ('<s>', 'p', 1), ('<s>', 'r', 1),
+    ('d', 'n', 8), ('d', 'a', 1),
+    ('n', 'a', 3), ('n', 'v', 4), ('n', 's', 3), ('n', 'c', 1), ('n', '</s>', 2),
+    ('a', 'v', 2), ('a', 's', 1), ('a', 'c', 1), ('a', '</s>', 2),
+    ('v', 'd', 4), ('v', 'n', 2), ('v', 's', 2), ('v', 'r', 1), ('v', 'a', 1), ('v', '</s>', 1),
+    ('s', 'd', 5), ('s', 'n', 3), ('s', 'v', 1),
+    ('r', 'v', 3), ('r', 'a', 1),
+    ('c', 'd', 3), ('c', 'n', 2), ('c', 'v', 2),
+    ('p', 'v', 4), ('p', 'n', 1),
+]
+
+# Coarse tags of common closed-class words, for tagging the dictionary
+# without the CESS corpus
+FALLBACK_TAGS = {
+    'el': 'd', 'la': 'd', 'los': 'd', 'las': 'd', 'un': 'd', 'una': 'd', 'unos': 'd', 'unas': 'd',
+    'a': 's', 'de': 's', 'en': 's', 'con': 's', 'por': 's', 'para': 's', 'sin': 's', 'sobre': 's',
+    'y': 'c', 'o': 'c', 'pero': 'c', 'que': 'c', 'porque': 'c',
+    'no': 'r', 'muy': 'r', 'más': 'r', 'también': 'r',
+    'lo': 'p', 'le': 'p', 'se': 'p', 'me': 'p', 'nos': 'p',
+}
+
+# Guesses the coarse tag of a Spanish word from its spelling
+def guessTag(word):
+    if word in FALLBACK_TAGS:
+        return FALLBACK_TAGS[word]
+    if word.endswith('mente'):
+        return 'r'
+    if word.endswith(('ar', 'er', 'ir', 'an', 'en', 'ó', 'ía')):
+        return 'v'
+    if word.endswith(('oso', 'osa', 'ble', 'ivo', 'iva', 'al')):
+        return 'a'
+    return 'n'
+
+
+class WeightedChoice:
+    """Picks keys at random with probability proportional to their weight."""
+
+    def __init__(self, weights):
+        self.keys = []
+        self.cumulative = []
+        total = 0
+        for key, weight in sorted(weights.iteritems()):
+            total += weight
+            self.keys.append(key)
+            self.cumulative.append(total)
+
+    def choose(self, rng):
+        return self.keys[bisect.bisect_right(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+# Returns (transitions, tagOf, lengths) estimated from the CESS corpus:
+# counts of coarse tag bigrams as a dict of tag : Counter of next tags,
+# a function giving the coarse tag of a word, and a Counter of sentence
+# lengths. Falls back to FALLBACK_TRANSITIONS and guessTag when the
+# corpus is not installed.
+def tagDistribution():
+    transitions = collections.defaultdict(collections.Counter)
+    lengths = collections.Counter()
+    try:
+        from nltk.corpus import cess_esp as cess
+        wordTags = collections.defaultdict(collections.Counter)
+        for sentence in cess.tagged_sents():
+            previous = '<s>'
+            length = 0
+            for word, tag in sentence:
+                # Skip punctuation (f) and empty elements (*0*)
+                if tag[0] in 'f-' or word == '*0*':
+                    continue
+                tag = tag[0]
+                wordTags[word.lower()][tag] += 1
+                transitions[previous][tag] += 1
+                previous = tag
+                length += 1
+            transitions[previous]['</s>'] += 1
+            lengths[length] += 1
+    except LookupError:
+        for tag, nextTag, weight in FALLBACK_TRANSITIONS:
+            transitions[tag][nextTag] += weight
+        return (transitions, guessTag, None)
+
+    def tagOf(word):
+        if word in wordTags:
+            return wordTags[word].most_common(1)[0][0]
+        return guessTag(word)
+    return (transitions, tagOf, lengths)
+
+
+class CorpusGenerator:
+    """Generates Spanish/English sentence pairs from the single-word
+       entries of a dictionary. Sentences follow a Markov chain over coarse
+       Spanish tags, restricted to the tags some dictionary word has, and
+       each English reference is the word by word dictionary translation.
+       The same seed always gives the same corpus."""
+
+    def __init__(self, dictFile, seed=0, maxLength=40):
+        entries = readSource(dictFile)
+        transitions, tagOf, lengths = tagDistribution()
+
+        self.wordsByTag = collections.defaultdict(list)
+        for spanish in sorted(entries):
+            if ' ' not in spanish:
+                self.wordsByTag[tagOf(spanish)].append((spanish, entries[spanish][0]))
+
+        self.transitions = {}
+        for tag, nextTags in transitions.iteritems():
+            weights = dict((t, c) for t, c in nextTags.iteritems() if t == '</s>' or t in self.wordsByTag)
+            if weights:
+                self.transitions[tag] = WeightedChoice(weights)
+        self.lengths = WeightedChoice(lengths) if lengths else None
+        self.maxLength = maxLength
+        self.rng = random.Random(seed)
+
+    # Returns the next (spanish words, english words) pair
+    def sentencePair(self):
+        maxLength = self.maxLength
+        if self.lengths is not None:
+            maxLength = min(maxLength, max(1, self.lengths.choose(self.rng)))
+
+        spanish = []
+        english = []
+        tag = '<s>'
+        while len(spanish) < maxLength and tag in self.transitions:
+            tag = self.transitions[tag].choose(self.rng)
+            if tag == '</s>':
+                break
+            word, translation = self.rng.choice(self.wordsByTag[tag])
+            spanish.append(word)
+            english.append(translation)
+        if not spanish:
+            return self.sentencePair()
+        return (spanish, english)
+
+    def write(self, path, sentences):
+        """Writes sentences pairs to path in the format parseTrainFile reads."""
+        f = open(path, 'w')
+        f.write('# Synthetic corpus generated by benchmark.py\n')
+        lines = []
+        for i in xrange(sentences):
+            spanish, english = self.sentencePair()
+            lines.append('\n%s .\n%s .\n' % (capitalize(' '.join(spanish)), capitalize(' '.join(english))))
+            if len(lines) == 10000:
+                f.write(''.join(lines))
+                lines = []
+        f.write(''.join(lines))
+        f.close()
+
+def capitalize(line):
+    line = line.decode('utf-8')
+    return (line[:1].upper() + line[1:]).encode('utf-8')
+
+
+# Returns the 50th, 90th, 95th and 99th percentile and maximum of a list
+# of durations in seconds, in milliseconds
+def percentiles(durations):
+    if not durations:
+        return None
+    durations = sorted(durations)
+    result = {}
+    for p in (50, 90, 95, 99):
+        result['p%d' % p] = 1000.0 * durations[min(len(durations) - 1, len(durations) * p // 100)]
+    result['max'] = 1000.0 * durations[-1]
+    return result
+
+# Wraps a stage so the duration of each call is appended to durations
+def timedStage(stage, durations):
+    def timed(sentences):
+        startTime = time.time()
+        result = stage(sentences)
+        durations.append(time.time() - startTime)
+        return result
+    return timed
+
+# Streams the whole corpus through the translator one sentence at a
+# time, as translator.py --stream does, recording the latency of each
+# sentence from reading it to its final translation.
+def benchmarkPipeline(dictFile, corpusFile):
+    dictionary, spanishTagger, englishModel = translator.loadModels(dictFile)
+    pairs = translator.iterTrainFile(corpusFile)
+    spanishSentences = itertools.imap(lambda pair: pair.spanish, pairs)
+    translations = translator.streamTranslations(spanishSentences, dictionary, spanishTagger, englishModel)
+
+    latencies = []
+    sentences = 0
+    tokens = 0
+    startTime = time.time()
+    while True:
+        sentenceStart = time.time()
+        try:
+            translation = next(translations)
+        except StopIteration:
+            break
+        latencies.append(time.time() - sentenceStart)
+        sentences += 1
+        tokens += len(translation)
+    seconds = time.time() - startTime
+
+    return {
+        'sentences': sentences,
+        'tokens': tokens,
+        'seconds': seconds,
+        'sentencesPerSecond': sentences / seconds if seconds else None,
+        'tokensPerSecond': tokens / seconds if seconds else None,
+        'latencyMs': percentiles(latencies),
+        'peakRssKB': peakRssKB(),
+    }
+
+# Reads the corpus in batches and runs each stage on a whole batch at a
+# time, measuring every stage on its own along with reading the file and
+# BLEU scoring. Latencies are per batch.
+def benchmarkStages(dictFile, corpusFile, batchSize):
+    profiler = Profiler()
+    with profiler.measure('loadModels'):
+        dictionary, spanishTagger, englishModel = translator.loadModels(dictFile)
+
+    durations = collections.defaultdict(list)
+    stages = [(name, timedStage(stage, durations[name]))
+        for name, stage in translator.profiledStages(dictionary, spanishTagger, englishModel, profiler)]
+
+    pairs = translator.iterTrainFile(corpusFile)
+    while True:
+        startTime = time.time()
+        with profiler.measure('parseTrainFile') as stats:
+            batch = list(itertools.islice(pairs, batchSize))
+            spanishSentences = [pair.spanish for pair in batch]
+            references = [pair.english for pair in batch]
+            stats.count(spanishSentences)
+        if not batch:
+            break
+        durations['parseTrainFile'].append(time.time() - startTime)
+
+        sentences = spanishSentences
+        for name, stage in stages:
+            sentences = stage(sentences)
+
+        startTime = time.time()
+        with profiler.measure('computeBLEU', sentences):
+            BLEUScorer(references, translator.nGramForBLEU).sentenceScores(sentences)
+        durations['computeBLEU'].append(time.time() - startTime)
+
+    stageReports = []
+    for name, stats in profiler.stageReports():
+        stats['name'] = name
+        stats['latencyMs'] = percentiles(durations.get(name))
+        stageReports.append(stats)
+    return {'batchSize': batchSize, 'stages': stageReports, 'peakRssKB': peakRssKB()}
+
+# Sends back ('result', value) or, if function raised, ('error', traceback)
+def runInChild(queue, function, args):
+    try:
+        queue.put(('result', function(*args)))
+    except BaseException:
+        queue.put(('error', traceback.format_exc()))
+
+# Runs function in a fresh process, so each benchmark starts with cold
+# caches and reports its own peak memory. Raises RuntimeError if the
+# function raised, or the process died without sending back a result.
+def runIsolated(function, *args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=runInChild, args=(queue, function, args))
+    process.start()
+    while True:
+        try:
+            kind, value = queue.get(timeout=1)
+            break
+        except Queue.Empty:
+            if not process.is_alive():
+                # It may have sent its result just before exiting
+                try:
+                    kind, value = queue.get(timeout=1)
+                    break
+                except Queue.Empty:
+                    raise RuntimeError('%s died with exit code %s before sending a result' %
+                        (function.__name__, process.exitcode))
+    process.join()
+    if kind == 'error':
+        raise RuntimeError('%s failed in its child process:\n%s' % (function.__name__, value))
+    return value
+
+
+# Imports translator in fresh interpreters, as a short CLI invocation
+# would. Returns the fastest of runs import times in seconds, and the
+# HEAVY_MODULES that importing it loaded.
+def measureStartup(runs):
+    script = ('import time; start = time.time(); import sys, translator; '
+        'print time.time() - start; '
+        'print " ".join(name for name in translator.HEAVY_MODULES if name in sys.modules)')
+    times = []
+    heavy = []
+    for i in xrange(runs):
+        output = subprocess.check_output([sys.executable, '-c', script],
+            cwd=os.path.dirname(os.path.abspath(__file__))).split('\n')
+        times.append(float(output[0]))
+        heavy = output[1].split()
+    return (min(times), heavy)
+
+
+# Returns a list of regressions of results against baseline, each a
+# string naming the measurement. Throughput may drop, and latency and
+# memory grow, by the fraction tolerance before counting as a regression.
+def compareToBaseline(results, baseline, tolerance):
+    regressions = []
+
+    def check(name, current, previous):
+        if not current or not previous:
+            return
+        for key in ('sentencesPerSecond', 'tokensPerSecond'):
+            if current.get(key) and previous.get(key) and current[key] < previous[key] * (1 - tolerance):
+                regressions.append('%s %s: %.1f -> %.1f' % (name, key, previous[key], current[key]))
+        if current.get('latencyMs') and previous.get('latencyMs'):
+            for key in ('p50', 'p95'):
+                if current['latencyMs'][key] > previous['latencyMs'][key] * (1 + tolerance):
+                    regressions.append('%s %s latency: %.3fms -> %.3fms' % (name, key,
+                        previous['latencyMs'][key], current['latencyMs'][key]))
+        if current.get('peakRssKB') and previous.get('peakRssKB') and \
+                current['peakRssKB'] > previous['peakRssKB'] * (1 + tolerance):
+            regressions.append('%s peakRssKB: %d -> %d' % (name, previous['peakRssKB'], current['peakRssKB']))
+
+    check('pipeline', results.get('pipeline'), baseline.get('pipeline'))
+    if results.get('stages') and baseline.get('stages'):
+        previousStages = dict((stage['name'], stage) for stage in baseline['stages']['stages'])
+        for stage in results['stages']['stages']:
+            check(stage['name'], stage, previousStages.get(stage['name']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates synthetic corpora and benchmarks the translator on them.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    generate = subparsers.add_parser('generate', help='write a synthetic parallel corpus')
+    generate.add_argument('dictFile')
+    generate.add_argument('corpusFile')
+    generate.add_argument('--sentences', type=int, default=1000)
+    generate.add_argument('--seed', type=int, default=0)
+
+    run = subparsers.add_parser('run', help='benchmark the translator on a corpus')
+    run.add_argument('dictFile')
+    run.add_argument('corpusFile')
+    run.add_argument('--mode', choices=['all', 'pipeline', 'stages'], default='all')
+    run.add_argument('--batch-size', type=int, default=1000, help='sentences per batch when timing stages')
+    run.add_argument('--output', help='write the results as JSON to this file')
+    run.add_argument('--baseline', help='compare against results saved by an earlier run')
+    run.add_argument('--tolerance', type=float, default=0.1,
+        help='fraction throughput, latency or memory may get worse before failing')
+
+    startup = subparsers.add_parser('startup', help='check that importing translator.py stays fast')
+    startup.add_argument('--budget-ms', type=float, default=100.0, help='longest the import may take')
+    startup.add_argument('--runs', type=int, default=5, help='imports to time, the fastest counts')
+    args = parser.parse_args()
+
+    if args.command == 'startup':
+        seconds, heavy = measureStartup(args.runs)
+        print "Importing translator took %.1fms (budget %.1fms)" % (seconds * 1000, args.budget_ms)
+        if heavy:
+            print >> sys.stderr, "Importing translator loaded", ', '.join(heavy)
+        if seconds * 1000 > args.budget_ms or heavy:
+            sys.exit(1)
+        return
+
+    if args.command == 'generate':
+        CorpusGenerator(args.dictFile, args.seed).write(args.corpusFile, args.sentences)
+        print "Wrote", args.sentences, "sentence pairs to", args.corpusFile
+        return
+
+    results = {'corpus': args.corpusFile, 'dictionary': args.dictFile}
+    try:
+        if args.mode in ('all', 'pipeline'):
+            results['pipeline'] = runIsolated(benchmarkPipeline, args.dictFile, args.corpusFile)
+        if args.mode in ('all', 'stages'):
+            results['stages'] = runIsolated(benchmarkStages, args.dictFile, args.corpusFile, args.batch_size)
+    except RuntimeError as e:
+        print >> sys.stderr, "Benchmark failed:", e
+        sys.exit(1)
+
+    report = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        f = open(args.output, 'w')
+        f.write(report + '\n')
+        f.close()
+    else:
+        print report
+
+    if args.baseline:
+        f = open(args.baseline)
+        baseline = json.load(f)
+        f.close()
+        regressions = compareToBaseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print >> sys.stderr, "Regression:", regression
+        if regressions:
+            sys.exit(1)
+        print >> sys.stderr, "No regressions against", args.baseline
+
+
+if __name__ == '__main__':
+    main()
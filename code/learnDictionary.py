@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+import mmap
+import time
+import array
+import argparse
+import multiprocessing
+
+import numpy
+
+import translator
+from Vocabulary import Vocabulary
+from ParallelCorpusReader import ParallelCorpusReader
+from CompiledDictionary import foldCase
+
+# Learns a Spanish to English dictionary from parallel corpora in the
+# format parseTrainFile reads, with EM training of IBM Model 1 and then,
+# optionally, IBM Model 2. Each Spanish word gets the English words it
+# most likely translates to, written in dict.txt format with the most
+# likely sense first, so parseDict picks it and CompiledDictionary keeps
+# the others in order.
+#
+# Every expectation step is a handful of NumPy array operations over all
+# the (English word, Spanish word) pairs of a chunk of sentences, and the
+# corpus is split into shards whose expectation steps run on separate
+# worker processes. Workers add the expected counts of each chunk into a
+# single shared buffer, under a lock, rather than sending them back.
+
+# Spanish word every English word may also be generated by
+NULL = ''
+
+
+class ParallelText:
+    """Tokenized sentence pairs as flat arrays of word IDs. Spanish
+       sentence k is spanish[spanishStarts[k]:spanishStarts[k + 1]] and
+       begins with the NULL word; English sentences are laid out the same
+       way, without NULL."""
+
+    def __init__(self):
+        self.spanishVocabulary = Vocabulary([NULL])
+        self.englishVocabulary = Vocabulary()
+        self.spanishIds = array.array('i')
+        self.englishIds = array.array('i')
+        self.spanishStartList = array.array('l', [0])
+        self.englishStartList = array.array('l', [0])
+
+    def add(self, spanishWords, englishWords):
+        self.spanishIds.append(0)
+        self.spanishIds.extend(self.spanishVocabulary.intern(word) for word in spanishWords)
+        self.englishIds.extend(self.englishVocabulary.intern(word) for word in englishWords)
+        self.spanishStartList.append(len(self.spanishIds))
+        self.englishStartList.append(len(self.englishIds))
+
+    # Moves the sentences into NumPy arrays once every pair is added
+    def freeze(self):
+        self.spanish = numpy.array(self.spanishIds, dtype=numpy.int64)
+        self.english = numpy.array(self.englishIds, dtype=numpy.int64)
+        self.spanishStarts = numpy.array(self.spanishStartList, dtype=numpy.int64)
+        self.englishStarts = numpy.array(self.englishStartList, dtype=numpy.int64)
+        self.spanishLengths = numpy.diff(self.spanishStarts)
+        self.englishLengths = numpy.diff(self.englishStarts)
+        del self.spanishIds, self.englishIds, self.spanishStartList, self.englishStartList
+
+    def __len__(self):
+        return len(self.englishStarts) - 1
+
+# Reads the sentence pairs of every file into a ParallelText, lowercasing
+# words and leaving out pairs with a side that is empty or longer than
+# maxLength words. Returns the text and the number of pairs left out.
+def readCorpora(filenames, maxLength):
+    text = ParallelText()
+    skipped = 0
+    for filename in filenames:
+        reader = ParallelCorpusReader(filename, translator.tokenizeLine)
+        for pair in reader:
+            spanishWords = pair.spanish
+            englishWords = pair.english
+            if not 0 < len(spanishWords) <= maxLength or not 0 < len(englishWords) <= maxLength:
+                skipped += 1
+                continue
+            text.add([foldCase(word) for word in spanishWords], [foldCase(word) for word in englishWords])
+        reader.close()
+    text.freeze()
+    return (text, skipped)
+
+
+# Training state, set before the worker pool of each step is created so
+# workers inherit it:
+#   text              the ParallelText being trained on
+#   maxLength         longest sentence trained on
+#   pairKeys          sorted keys spanish * englishSize + english of every
+#                     pair of words that occur in a sentence pair together
+#   translationProbs  t(english | spanish) of each pair in pairKeys
+#   alignmentProbs    a(i | j, englishLength, spanishLength) by
+#                     alignmentKey, or None while training Model 1
+#   alignmentStarts   where the block of alignmentProbs of each pair of
+#                     sentence lengths starts, -1 for lengths no sentence
+#                     pair has
+#   alignmentGroups   the (lengths, j) group of each entry of alignmentProbs,
+#                     whose probabilities sum to one
+#   countBuffers      shared arrays every shard adds its expected counts to
+#   countLock         held while adding to countBuffers
+text = None
+maxLength = 0
+pairKeys = None
+translationProbs = None
+alignmentProbs = None
+alignmentStarts = None
+alignmentGroups = None
+countBuffers = None
+countLock = None
+
+def englishSize():
+    return len(text.englishVocabulary)
+
+# Lays out alignmentProbs: a block for each pair of sentence lengths the
+# corpus has, holding englishLength rows of spanishLength probabilities.
+# Only lengths that occur get a block, so its size follows the corpus
+# rather than maxLength ** 4. Sets alignmentStarts and alignmentGroups.
+def layOutAlignments():
+    global alignmentStarts, alignmentGroups
+    lengths = numpy.unique(text.englishLengths * (maxLength + 2) + text.spanishLengths)
+    englishLengths = lengths // (maxLength + 2)
+    spanishLengths = lengths % (maxLength + 2)
+    sizes = englishLengths * spanishLengths
+    alignmentStarts = numpy.full((maxLength + 1, maxLength + 2), -1, dtype=numpy.int64)
+    alignmentStarts[englishLengths, spanishLengths] = numpy.cumsum(sizes) - sizes
+    groupSizes = numpy.repeat(spanishLengths, englishLengths)
+    alignmentGroups = numpy.repeat(numpy.arange(len(groupSizes)), groupSizes)
+
+# Index into alignmentProbs of aligning English word j to Spanish word i
+# (0 being NULL) in a pair with the given lengths (spanishLength counting
+# NULL). The probabilities for one j and pair of lengths are contiguous.
+def alignmentKey(englishLength, spanishLength, j, i):
+    return alignmentStarts[englishLength, spanishLength] + j * spanishLength + i
+
+# Returns the word pairs of sentences start .. stop - 1, as arrays with
+# one entry per pair: the position of the English word in the chunk, the
+# pair's key and, when training Model 2, its alignment key
+def chunkPairs(start, stop):
+    englishLengths = text.englishLengths[start:stop]
+    spanishLengths = text.spanishLengths[start:stop]
+    counts = englishLengths * spanishLengths
+    sentence = numpy.repeat(numpy.arange(stop - start), counts)
+    firstPair = numpy.cumsum(counts) - counts
+    within = numpy.arange(len(sentence)) - firstPair[sentence]
+    spanishLength = spanishLengths[sentence]
+    j = within // spanishLength
+    i = within % spanishLength
+
+    englishPosition = text.englishStarts[start:stop][sentence] + j
+    spanish = text.spanish[text.spanishStarts[start:stop][sentence] + i]
+    keys = spanish * englishSize() + text.english[englishPosition]
+    alignmentKeys = None
+    if alignmentProbs is not None:
+        alignmentKeys = alignmentKey(englishLengths[sentence], spanishLength, j, i)
+    return (englishPosition - text.englishStarts[start], keys, alignmentKeys)
+
+# Splits sentences start .. stop - 1 into chunks of about pairsPerChunk
+# word pairs. Returns the list of (start, stop) chunks.
+def chunks(start, stop, pairsPerChunk):
+    pairs = numpy.cumsum(text.englishLengths[start:stop] * text.spanishLengths[start:stop])
+    bounds = numpy.searchsorted(pairs, numpy.arange(pairsPerChunk, pairs[-1] if len(pairs) else 0, pairsPerChunk))
+    bounds = [start] + [start + int(bound) + 1 for bound in bounds] + [stop]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+# Returns the sorted distinct pair keys of a shard
+def shardPairKeys(shard):
+    number, start, stop, pairsPerChunk = shard
+    keys = [numpy.unique(chunkPairs(a, b)[1]) for a, b in chunks(start, stop, pairsPerChunk)]
+    return numpy.unique(numpy.concatenate(keys)) if keys else numpy.zeros(0, dtype=numpy.int64)
+
+# Adds weights into the shared counts at indexes. Small chunks are summed
+# over the indexes they touch rather than over all of counts.
+def accumulate(counts, indexes, weights):
+    if len(indexes) * 8 >= len(counts):
+        sums = numpy.bincount(indexes, weights, len(counts))
+        with countLock:
+            counts += sums
+    else:
+        touched, inverse = numpy.unique(indexes, return_inverse=True)
+        sums = numpy.bincount(inverse, weights)
+        with countLock:
+            counts[touched] += sums
+
+# Expectation step over one shard. Adds the expected pair counts, and
+# alignment counts when training Model 2, into the count buffers.
+# Returns the log likelihood of the shard's English sentences given their
+# Spanish ones.
+def expectationStep(shard):
+    number, start, stop, pairsPerChunk = shard
+    translationCounts, alignmentCounts = countBuffers
+    logLikelihood = 0.0
+    for a, b in chunks(start, stop, pairsPerChunk):
+        englishPosition, keys, alignmentKeys = chunkPairs(a, b)
+        indexes = numpy.searchsorted(pairKeys, keys)
+        probs = translationProbs[indexes]
+        if alignmentKeys is not None:
+            probs = probs * alignmentProbs[alignmentKeys]
+        totals = numpy.bincount(englishPosition, probs)
+        posteriors = probs / totals[englishPosition]
+        accumulate(translationCounts, indexes, posteriors)
+        if alignmentKeys is not None:
+            accumulate(alignmentCounts, alignmentKeys, posteriors)
+            logLikelihood += numpy.log(totals).sum()
+        else:
+            # Model 1 aligns each English word to every Spanish one alike
+            logLikelihood += numpy.log(totals).sum() - \
+                (text.englishLengths[a:b] * numpy.log(text.spanishLengths[a:b])).sum()
+    return logLikelihood
+
+# Returns a float array of size zeros that every process forked after
+# this call shares
+def sharedZeros(shape):
+    size = int(numpy.prod(shape))
+    buffer = mmap.mmap(-1, max(1, size) * 8)
+    return numpy.frombuffer(buffer, numpy.float64, size).reshape(shape)
+
+# Splits the corpus into a shard per worker
+def shards(workers, pairsPerChunk):
+    bounds = numpy.linspace(0, len(text), workers + 1).astype(int)
+    return [(number, int(bounds[number]), int(bounds[number + 1]), pairsPerChunk) for number in xrange(workers)]
+
+# Runs function on every shard, on a pool of worker processes forked
+# from the current state when there are several shards
+def mapShards(function, tasks):
+    if len(tasks) == 1:
+        return map(function, tasks)
+    pool = multiprocessing.Pool(len(tasks))
+    try:
+        return pool.map(function, tasks, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+# Runs one EM iteration. Returns the log likelihood per English word
+# before the update.
+def iterate(tasks):
+    global translationProbs, alignmentProbs
+    for counts in countBuffers:
+        if counts is not None:
+            counts[:] = 0
+    logLikelihood = sum(mapShards(expectationStep, tasks))
+
+    # Maximization step: normalize the counts over the English words of
+    # each Spanish word, and over the Spanish positions of each English one
+    translationCounts, alignmentCounts = countBuffers
+    spanish = pairKeys // englishSize()
+    totals = numpy.bincount(spanish, translationCounts, len(text.spanishVocabulary))
+    translationProbs = translationCounts / totals[spanish]
+    if alignmentProbs is not None:
+        totals = numpy.bincount(alignmentGroups, alignmentCounts)[alignmentGroups]
+        seen = totals > 0
+        alignmentProbs = alignmentProbs.copy()
+        alignmentProbs[seen] = alignmentCounts[seen] / totals[seen]
+    return logLikelihood / len(text.english)
+
+# Returns a(i | j, lengths) of Model 2 before training: uniform over the
+# Spanish positions, like Model 1
+def uniformAlignments():
+    return 1.0 / numpy.bincount(alignmentGroups)[alignmentGroups]
+
+# Trains Model 1 for model1Iterations, then Model 2 for model2Iterations,
+# printing the log likelihood of each iteration to stderr
+def train(model1Iterations, model2Iterations, workers, pairsPerChunk):
+    global pairKeys, translationProbs, alignmentProbs, countBuffers, countLock
+    tasks = shards(workers, pairsPerChunk)
+    pairKeys = numpy.unique(numpy.concatenate(mapShards(shardPairKeys, tasks)))
+    # Model 1 starts from t(english | spanish) uniform over the English
+    # words seen with each Spanish word
+    spanish = pairKeys // englishSize()
+    translationProbs = 1.0 / numpy.bincount(spanish)[spanish]
+    alignmentProbs = None
+    print >> sys.stderr, "Training on", len(text), "sentence pairs,", len(pairKeys), "word pairs"
+
+    countBuffers = [sharedZeros(len(pairKeys)), None]
+    countLock = multiprocessing.Lock()
+    for model, iterations in ((1, model1Iterations), (2, model2Iterations)):
+        if model == 2 and iterations:
+            layOutAlignments()
+            alignmentProbs = uniformAlignments()
+            countBuffers[1] = sharedZeros(len(alignmentProbs))
+        for iteration in xrange(iterations):
+            startTime = time.time()
+            logLikelihood = iterate(tasks)
+            print >> sys.stderr, "Model %d iteration %d: log likelihood per word %.4f (%.1fs)" % (
+                model, iteration + 1, logLikelihood, time.time() - startTime)
+
+
+# Returns true for words made only of letters, the only ones worth a
+# dictionary entry
+def isWord(word):
+    return word.decode('utf-8', 'replace').isalpha()
+
+# Returns the learned entries as (spanish, [senses]) pairs sorted by
+# Spanish word. Only words made of letters are kept on either side, and
+# only Spanish words seen at least minCount times. Each Spanish word's
+# translation probabilities are renormalized over the English words kept,
+# and it gets those it translates to with probability at least minProb,
+# at most maxSenses of them. A sense is also left out when the English
+# word is seldom explained by the Spanish word: when the posterior
+# probability of the Spanish word given the English word, over every
+# Spanish word (NULL included) weighted by its count, is below
+# minReverseProb. Frequent English words that EM spreads over many rare
+# Spanish words ('como:a') fail this. A sense spelled like the Spanish
+# word, such as a name, comes first, then the most likely.
+def rankedSenses(maxSenses, minProb, minCount, minReverseProb=0.0):
+    spanish = pairKeys // englishSize()
+    english = pairKeys % englishSize()
+    spanishCounts = numpy.bincount(text.spanish, minlength=len(text.spanishVocabulary))
+    mass = translationProbs * spanishCounts[spanish]
+    reverseProbs = mass / numpy.bincount(english, weights=mass, minlength=englishSize())[english]
+
+    spanishWords = numpy.array([isWord(word) for word in text.spanishVocabulary.words], dtype=bool)
+    englishWords = numpy.array([isWord(word) for word in text.englishVocabulary.words], dtype=bool)
+    keep = spanishWords[spanish] & englishWords[english] & (spanishCounts[spanish] >= minCount)
+    spanish, english, probs = spanish[keep], english[keep], translationProbs[keep]
+    reverseProbs = reverseProbs[keep]
+    totals = numpy.bincount(spanish, weights=probs, minlength=len(text.spanishVocabulary))
+    probs = probs / totals[spanish]
+
+    keep = (probs >= minProb) & (reverseProbs >= minReverseProb)
+    spanish, english, probs = spanish[keep], english[keep], probs[keep]
+    identical = numpy.array([text.spanishVocabulary.word(s) == text.englishVocabulary.word(e)
+        for s, e in zip(spanish, english)], dtype=bool)
+    order = numpy.lexsort((-probs, ~identical, spanish))
+
+    entries = {}
+    for k in order:
+        word = text.spanishVocabulary.word(spanish[k])
+        senses = entries.setdefault(word, [])
+        if len(senses) < maxSenses:
+            senses.append(text.englishVocabulary.word(english[k]))
+    return sorted(entries.iteritems())
+
+# Writes the entries in dict.txt format. The lines of the base dictionary
+# come first, so its senses stay the preferred ones; lines of it that are
+# not 'spanish:english' are left out, and reported on standard error.
+def writeDictionary(entries, path, base=None):
+    known = set()
+    lines = []
+    if base:
+        f = open(base)
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if ':' not in line:
+                print >> sys.stderr, "%s:%d: no ':' between the Spanish and English, left out" % (base, number)
+                continue
+            lines.append(line)
+            spanishWord, englishWord = line.split(':', 1)
+            known.add((foldCase(spanishWord), englishWord))
+        f.close()
+    for spanishWord, senses in entries:
+        lines.extend('%s:%s' % (spanishWord, sense) for sense in senses if (spanishWord, sense) not in known)
+    f = open(path, 'w') if path != '-' else sys.stdout
+    f.write(''.join(line + '\n' for line in lines))
+    if f is not sys.stdout:
+        f.close()
+
+
+def main():
+    global text, maxLength
+    parser = argparse.ArgumentParser(usage='python learnDictionary.py [corpusFile ...] [dictFile]',
+        description='Learns a Spanish to English dictionary from parallel corpora with IBM Models 1 and 2.')
+    parser.add_argument('corpusFiles', nargs='+', metavar='corpusFile',
+        help='parallel corpus, a Spanish line followed by its English translation')
+    parser.add_argument('dictFile', help="where to write the dictionary, or '-' for standard output")
+    parser.add_argument('--model1-iterations', type=int, default=5)
+    parser.add_argument('--model2-iterations', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1, help='number of processes to run expectation steps on')
+    parser.add_argument('--max-length', type=int, default=40, help='leave out sentence pairs with more words than this')
+    parser.add_argument('--chunk-pairs', type=int, default=1 << 22,
+        help='word pairs per chunk of an expectation step, bounding its memory use')
+    parser.add_argument('--max-senses', type=int, default=3, help='most senses written per Spanish word')
+    parser.add_argument('--min-prob', type=float, default=0.1,
+        help='least probability of a sense that is written, among the senses made of letters')
+    parser.add_argument('--min-reverse-prob', type=float, default=0.2,
+        help='least probability of the Spanish word given the English word for a sense that is written')
+    parser.add_argument('--min-count', type=int, default=2, help='least times a Spanish word is seen to get an entry')
+    parser.add_argument('--base', metavar='DICTFILE', help='dictionary whose entries go first and take precedence')
+    parser.add_argument('--tokenizer', choices=['nltk', 'regex'], default='regex', help='how lines are split into words')
+    args = parser.parse_args()
+
+    translator.tokenizerMethod = args.tokenizer
+    maxLength = args.max_length
+    startTime = time.time()
+    text, skipped = readCorpora(args.corpusFiles, maxLength)
+    print >> sys.stderr, "Read", len(text), "sentence pairs, left out", skipped, "(%.1fs)" % (time.time() - startTime)
+    if not len(text):
+        sys.exit("No sentence pairs to train on")
+
+    train(args.model1_iterations, args.model2_iterations, args.workers, args.chunk_pairs)
+    entries = rankedSenses(args.max_senses, args.min_prob, args.min_count, args.min_reverse_prob)
+    writeDictionary(entries, args.dictFile, args.base)
+    print >> sys.stderr, "Wrote", len(entries), "Spanish words in", "%.1fs" % (time.time() - startTime)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import hashlib
+
+# Directory holding the serialized model artifacts built from the training
+# corpora. Artifacts are versioned by name, so stale ones are simply ignored.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache')
+
+# Returns a short hash of the contents of the given files and a config
+# string, used to version the artifacts built from them.
+def hashFiles(paths, config=''):
+    h = hashlib.sha1(config)
+    for path in paths:
+        f = open(path, 'rb')
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            h.update(block)
+        f.close()
+    return h.hexdigest()[:16]
+
+# Like hashFiles, but hashes only the path, size and modification time of
+# each file rather than its contents. For large inputs that only change
+# by being replaced, such as installed corpora.
+def hashFileStats(paths, config=''):
+    h = hashlib.sha1(config)
+    for path in paths:
+        stat = os.stat(path)
+        h.update('%s\0%d\0%d\0' % (path, stat.st_size, int(stat.st_mtime)))
+    return h.hexdigest()[:16]
+
+def cachePath(name):
+    return os.path.join(CACHE_DIR, name)
+
+# Training data of the English model, and the spelling error counts of the
+# spelling corrector
+TRAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'holbrook-tagged-train.dat')
+EDIT_COUNTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'count_1edit.txt')
+
+# Returns a hash of every input the translation models are built from:
+# the dictionary, the English model's training data, the spelling error
+# counts and the Spanish tagger's corpus, plus a config string. Anything
+# cached from translations should be keyed on it, so changing any model
+# input invalidates it.
+def modelVersion(dictFile, config=''):
+    from spanishTagger import modelVersion as spanishModelVersion
+    return hashFiles([dictFile, TRAIN_PATH, EDIT_COUNTS_PATH], config + ';' + spanishModelVersion())
+
+# Opens a temporary file next to path for writing. Pass the file to
+# commitFile once it is written, so concurrent workers never see a
+# partially written artifact.
+def openForWrite(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    return open('%s.%d.tmp' % (path, os.getpid()), 'wb')
+
+def commitFile(f, path):
+    f.close()
+    os.rename(f.name, path)
+
+
+class LazyModel(object):
+    """Stands in for a read-only model that is loaded by calling loader
+       only once one of its attributes is first used, so runs that never
+       need the model never pay for loading it."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.model = None
+
+    def loaded(self):
+        return self.model is not None
+
+    def __getattr__(self, name):
+        if self.model is None:
+            self.model = self.loader()
+        value = getattr(self.model, name)
+        # Later lookups find the attribute directly, without this method
+        setattr(self, name, value)
+        return value
@@ -1,14 +1,123 @@
-from nltk.corpus import cess_esp as cess
-from nltk import UnigramTagger as ut
+import os
+import time
+import marshal
+
+from modelCache import hashFileStats, cachePath, openForWrite, commitFile
+
+# Tagger configuration. Any change here produces a new model version.
+TAGGER_CONFIG = 'unigram;cutoff=0;backoff=None;format=1'
+
+# Marks a token missing from the table, since None is a valid tag
+MISSING = object()
 
 class SpanishTagger:
 
-    # Initialize and train unigram tagger
-    def __init__(self):
-        cess_cents = cess.tagged_sents()
-        self.unigramTagger = ut(cess_cents)
+    # Tagger is loaded lazily on the first call to tagSentence. modelPath
+    # overrides the location of the serialized word->tag table. table,
+    # when given, is used instead of loading one, and may be any mapping
+    # with get, such as a table in a ModelStore.
+    def __init__(self, modelPath=None, table=None):
+        self.modelPath = modelPath
+        self.table = table
+        # Seconds load took, once the table is loaded
+        self.loadSeconds = None
+        # Words found in the table and words missing from it, for the
+        # profiler
+        self.hits = 0
+        self.misses = 0
 
     # Takes in sentence as a list of Spanish words, returns a tagged version
     # of the list
     def tagSentence(self, sentence):
-        return self.unigramTagger.tag(sentence)
+        return [(word, self.tagWord(word)) for word in sentence]
+
+    # A unigram tagger's output depends only on the token itself, so a tag
+    # is a single lookup in the word->tag table. Words missing from it get
+    # no tag, as NLTK's unigram tagger gives them.
+    def tagWord(self, word):
+        table = self.table
+        if table is None:
+            table = self.load()
+        tag = table.get(word, MISSING)
+        if tag is MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tag
+
+    # Tags a list of sentences, looking up each distinct token only once
+    # for the whole batch
+    def tagSents(self, sentences):
+        tags = {}
+        for sentence in sentences:
+            for word in sentence:
+                if word not in tags:
+                    tags[word] = self.tagWord(word)
+        return [[(word, tags[word]) for word in sentence] for sentence in sentences]
+
+    def cacheStats(self):
+        """Returns the table size, hits, misses and hit rate, in the same
+           form as LRUCache.stats."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.table) if self.table is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+    # Loads the word->tag table from the serialized artifact, building and
+    # saving it first if no artifact exists for the current version.
+    def load(self):
+        startTime = time.time()
+        path = self.modelPath or defaultModelPath()
+        if os.path.exists(path):
+            f = open(path, 'rb')
+            self.table = marshal.load(f)
+            f.close()
+        else:
+            self.table = trainTable()
+            saveTable(self.table, path)
+        self.loadSeconds = time.time() - startTime
+        return self.table
+
+
+# Version computed by modelVersion, once per process
+cachedModelVersion = None
+
+# Returns a hash identifying the training corpus and tagger configuration.
+# The corpus files are identified by path, size and modification time, so
+# finding the cached table never reads the corpus. nltk is imported here
+# rather than at the top, since importing it takes most of a second.
+def modelVersion():
+    global cachedModelVersion
+    if cachedModelVersion is None:
+        from nltk.corpus import cess_esp as cess
+        cachedModelVersion = hashFileStats(sorted(str(p) for p in cess.abspaths()), TAGGER_CONFIG)
+    return cachedModelVersion
+
+def defaultModelPath():
+    return cachePath('spanish-unigram-%s.marshal' % modelVersion())
+
+# Trains an NLTK unigram tagger on the CESS corpus and returns its compact
+# word->tag table.
+def trainTable():
+    from nltk.corpus import cess_esp as cess
+    from nltk import UnigramTagger as ut
+    tagger = ut(cess.tagged_sents())
+    return dict(tagger._context_to_tag)
+
+def saveTable(table, path):
+    f = openForWrite(path)
+    marshal.dump(table, f)
+    commitFile(f, path)
+
+
+def main():
+    path = defaultModelPath()
+    saveTable(trainTable(), path)
+    print "Wrote", path
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+import os
+import sys
+import glob
+import json
+import marshal
+import hashlib
+import argparse
+import multiprocessing
+
+import translator
+from RuleEngine import RuleEngine
+from BLEUScorer import BLEUScorer
+from OutputWriter import makeWriter, WRITERS
+from modelCache import hashFiles, cachePath, modelVersion, openForWrite, commitFile
+
+# Directory holding the cached output of every stage, one file per key
+STAGE_CACHE_DIR = cachePath('stages')
+
+# Bump when the cached stage format changes
+CACHE_FORMAT = 'stages;format=1'
+
+# Settings of the full pipeline, as translator.py runs it by default.
+# A variant overrides any of them:
+#   spellCorrection  correct Spanish spelling first
+#   spanishRules     names of the Spanish pre-processing rules to apply
+#   decoder          'greedy' or 'beam', with beamWidth
+#   englishRules     names of the English post-processing rules to apply
+#   articles         'threshold', 'viterbi', or 'none' or None to skip
+#                    article correction
+#   insertArticles   let viterbi article correction add articles
+#   capitalize       capitalize the first word of each translation
+DEFAULT_VARIANT = {
+    'spellCorrection': False,
+    'spanishRules': [rule.name for rule in translator.spanishRules],
+    'decoder': 'greedy',
+    'beamWidth': 8,
+    'englishRules': [rule.name for rule in translator.englishRules],
+    'articles': 'threshold',
+    'insertArticles': False,
+    'capitalize': True,
+}
+
+# Values each setting may take, beyond the rule lists
+DECODERS = ('greedy', 'beam')
+ARTICLE_METHODS = ('threshold', 'viterbi', 'none', None)
+FLAGS = ('spellCorrection', 'insertArticles', 'capitalize')
+
+# Raises ValueError naming the first setting of a variant that is unknown
+# or has a value the pipeline has no stage for
+def checkVariant(variant):
+    name = variant.get('name')
+    for key in variant:
+        if key != 'name' and key not in DEFAULT_VARIANT:
+            raise ValueError('Unknown setting %s in variant %s' % (key, name))
+    settings = dict(DEFAULT_VARIANT)
+    settings.update(variant)
+    for rule in settings['spanishRules'] + settings['englishRules']:
+        if rule not in RULES:
+            raise ValueError('Unknown rule %s in variant %s' % (rule, name))
+    if settings['decoder'] not in DECODERS:
+        raise ValueError('Unknown decoder %r in variant %s, expected one of %s' %
+            (settings['decoder'], name, ', '.join(DECODERS)))
+    if settings['articles'] not in ARTICLE_METHODS:
+        raise ValueError('Unknown articles %r in variant %s, expected threshold, viterbi, none or null' %
+            (settings['articles'], name))
+    if not isinstance(settings['beamWidth'], int) or isinstance(settings['beamWidth'], bool) or \
+            settings['beamWidth'] < 1:
+        raise ValueError('beamWidth must be a positive integer in variant %s' % name)
+    for flag in FLAGS:
+        if not isinstance(settings[flag], bool):
+            raise ValueError('%s must be true or false in variant %s' % (flag, name))
+
+# Returns the (stage name, config) pairs a variant runs, in order. config
+# is a string holding every setting that changes the stage's output.
+def variantStages(variant):
+    checkVariant(variant)
+    settings = dict(DEFAULT_VARIANT)
+    settings.update(variant)
+
+    stages = []
+    if settings['spellCorrection']:
+        stages.append(('spellCorrection', ''))
+    stages.append(('spanishPosTag', ''))
+    if settings['spanishRules']:
+        stages.append(('spanishRules', ','.join(settings['spanishRules'])))
+    if settings['decoder'] == 'beam':
+        stages.append(('translate', 'beam:%d' % settings['beamWidth']))
+    else:
+        stages.append(('translate', 'greedy'))
+    stages.append(('posTagTranslations', ''))
+    if settings['englishRules']:
+        stages.append(('englishRules', ','.join(settings['englishRules'])))
+    stages.append(('unPosTagTranslations', ''))
+    if settings['articles'] == 'threshold':
+        stages.append(('articleCorrection', 'threshold'))
+    elif settings['articles'] == 'viterbi':
+        # Like translator.py, only viterbi correction inserts articles
+        stages.append(('articleCorrection', 'viterbi:insert' if settings['insertArticles'] else 'viterbi'))
+    if settings['capitalize']:
+        stages.append(('capitalizeFirstWord', ''))
+    return stages
+
+# Every pre- and post-processing rule, by name
+RULES = dict((rule.name, rule) for rule in translator.spanishRules + translator.englishRules)
+
+
+class StageNode:
+    """One stage run on the output of its parent, shared by every variant
+       whose stages begin with the same path from the root. key hashes the
+       key of the parent with the stage name and config, so it identifies
+       the stage's output by everything that went into it."""
+
+    def __init__(self, name, config, parent=None, key=None):
+        self.name = name
+        self.config = config
+        self.parent = parent
+        self.children = {}
+        self.variants = []
+        if key is None:
+            key = hashlib.sha1('%s\0%s\0%s' % (parent.key, name, config)).hexdigest()[:16]
+        self.key = key
+
+    def child(self, name, config):
+        if (name, config) not in self.children:
+            self.children[(name, config)] = StageNode(name, config, self)
+        return self.children[(name, config)]
+
+    def task(self):
+        return (self.key, self.parent.key if self.parent else None, self.name, self.config)
+
+
+# Returns the key of the sweep's input: the corpus, every model input
+# (see modelCache.modelVersion) and the source code all go into it, so
+# changing any of them starts the cache afresh
+def rootKey(dictFile, corpusFile):
+    codeDir = os.path.dirname(os.path.abspath(__file__))
+    sources = sorted(glob.glob(os.path.join(codeDir, '*.py')))
+    return hashFiles([corpusFile] + sources, '%s;%s;%s' % (CACHE_FORMAT, translator.tokenizerMethod,
+        modelVersion(dictFile)))
+
+# Builds the prefix trie of the variants' stages. Returns the root node,
+# which parses the corpus, and a dict of variant name : leaf node.
+def buildTrie(variants, key):
+    root = StageNode('parseTrainFile', translator.tokenizerMethod, key=key)
+    leaves = {}
+    for variant in variants:
+        node = root
+        node.variants.append(variant['name'])
+        for name, config in variantStages(variant):
+            node = node.child(name, config)
+            node.variants.append(variant['name'])
+        leaves[variant['name']] = node
+    return (root, leaves)
+
+# Returns the keys of every node of the trie
+def trieKeys(root):
+    keys = set()
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        keys.add(node.key)
+        nodes.extend(node.children.itervalues())
+    return keys
+
+def stagePath(key):
+    return os.path.join(STAGE_CACHE_DIR, key + '.marshal')
+
+def loadOutput(key):
+    f = open(stagePath(key), 'rb')
+    output = marshal.load(f)
+    f.close()
+    return output
+
+def saveOutput(key, output):
+    f = openForWrite(stagePath(key))
+    marshal.dump(output, f)
+    commitFile(f, stagePath(key))
+
+# Returns (modification time, size, key) of every cached stage output
+def cachedOutputs():
+    outputs = []
+    for path in glob.glob(os.path.join(STAGE_CACHE_DIR, '*.marshal')):
+        stat = os.stat(path)
+        outputs.append((stat.st_mtime, stat.st_size, os.path.basename(path)[:-len('.marshal')]))
+    return outputs
+
+# Removes every cached stage output
+def clearCache():
+    for mtime, size, key in cachedOutputs():
+        os.remove(stagePath(key))
+
+# Removes the least recently used stage outputs until the rest take up at
+# most maxBytes, never removing the outputs whose keys are in keep. runStage
+# touches the outputs it finds, so their modification time is their last
+# use. Returns the number of outputs removed.
+def pruneCache(maxBytes, keep=()):
+    outputs = sorted(cachedOutputs())
+    total = sum(size for mtime, size, key in outputs)
+    removed = 0
+    for mtime, size, key in outputs:
+        if total <= maxBytes:
+            break
+        if key not in keep:
+            os.remove(stagePath(key))
+            total -= size
+            removed += 1
+    return removed
+
+
+# Corpus and models used by runStage, loaded on first use in each process
+sweepCorpus = None
+sweepModels = None
+
+def initSweep(dictFile, corpusFile):
+    global sweepCorpus, sweepModels
+    sweepCorpus = (dictFile, corpusFile)
+    sweepModels = None
+
+def models():
+    global sweepModels
+    if sweepModels is None:
+        sweepModels = translator.loadModels(sweepCorpus[0])
+    return sweepModels
+
+# Returns the function running a stage with the given config
+def stageFunction(name, config):
+    dictionary, spanishTagger, englishModel = models()
+    if name == 'spellCorrection':
+        return translator.getSpellCorrector(dictionary, englishModel).correct
+    if name == 'spanishPosTag':
+        return lambda sentences: translator.spanishPosTag(spanishTagger, sentences)
+    if name in ('spanishRules', 'englishRules'):
+        return RuleEngine([RULES[rule] for rule in config.split(',')]).apply
+    if name == 'translate':
+        if config.startswith('beam:'):
+            return translator.getBeamDecoder(dictionary, englishModel, int(config.split(':')[1])).decode
+        if config == 'greedy':
+            return lambda sentences: translator.translate(sentences, dictionary)
+    if name == 'posTagTranslations':
+        return translator.posTagTranslations
+    if name == 'unPosTagTranslations':
+        return translator.unPosTagTranslations
+    if name == 'articleCorrection':
+        if config == 'threshold':
+            return lambda sentences: translator.articleCorrection(sentences, englishModel)
+        if config in ('viterbi', 'viterbi:insert'):
+            insert = config == 'viterbi:insert'
+            return lambda sentences: [translator.decodeArticles(sentence, englishModel, insert) for sentence in sentences]
+    if name == 'capitalizeFirstWord':
+        return translator.capitalizeFirstWord
+    raise ValueError('Unknown stage %s(%s)' % (name, config))
+
+# Runs one stage on the cached output of its parent and caches the
+# result, unless it is cached already. Returns (key, computed).
+def runStage(task):
+    key, parentKey, name, config = task
+    if os.path.exists(stagePath(key)):
+        os.utime(stagePath(key), None)
+        return (key, False)
+    if parentKey is None:
+        spanish, english, rawEnglish, rawSpanish = translator.parseTrainFile(sweepCorpus[1])
+        output = {'spanish': spanish, 'english': english}
+    else:
+        sentences = loadOutput(parentKey)
+        if isinstance(sentences, dict):
+            sentences = sentences['spanish']
+        output = stageFunction(name, config)(sentences)
+    saveOutput(key, output)
+    return (key, True)
+
+# Runs every node of the trie, a level at a time. The nodes of a level
+# only depend on nodes of earlier levels, so each level is spread over
+# the pool when one is given. Returns the number of stages computed and
+# the number found in the cache.
+def runTrie(root, pool=None):
+    computed = 0
+    cached = 0
+    level = [root]
+    while level:
+        tasks = [node.task() for node in level]
+        if pool is None:
+            results = map(runStage, tasks)
+        else:
+            results = pool.map(runStage, tasks, 1)
+        for key, wasComputed in results:
+            if wasComputed:
+                computed += 1
+            else:
+                cached += 1
+        level = [child for node in level for child in node.children.itervalues()]
+    return (computed, cached)
+
+
+# Scores every variant and writes its translations to outputDir.
+# Returns a list of per-variant result dicts.
+def collectResults(root, leaves, variants, outputDir, format):
+    corpus = loadOutput(root.key)
+    references = corpus['english']
+    scorer = BLEUScorer(references, translator.nGramForBLEU)
+    if outputDir and not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+
+    results = []
+    for variant in variants:
+        leaf = leaves[variant['name']]
+        translations = loadOutput(leaf.key)
+        scores = scorer.sentenceScores(translations)
+        stages = []
+        node = leaf
+        while node.parent is not None:
+            stages.append(node.name + ('(%s)' % node.config if node.config else ''))
+            node = node.parent
+        results.append({
+            'name': variant['name'],
+            'stages': list(reversed(stages)),
+            'corpusBleu': scorer.corpusScore(translations),
+            'meanSentenceBleu': sum(scores) / len(scores) if scores else 0.0,
+        })
+        if outputDir:
+            f = open(os.path.join(outputDir, variant['name'] + '.txt'), 'w')
+            writer = makeWriter(format, f, ['spanish', 'translation', 'reference', 'bleu'], n=translator.nGramForBLEU)
+            writer.writeAll({
+                'spanish': corpus['spanish'],
+                'translation': translations,
+                'reference': references,
+                'bleu': scores,
+            })
+            f.close()
+    return results
+
+def loadVariants(path):
+    f = open(path)
+    variants = json.load(f)
+    f.close()
+    names = set()
+    for i, variant in enumerate(variants):
+        variant.setdefault('name', 'variant%d' % i)
+        if variant['name'] in names:
+            raise ValueError('Duplicate variant name ' + variant['name'])
+        names.add(variant['name'])
+        # JSON strings load as unicode, the pipeline works on byte strings
+        for field in ('spanishRules', 'englishRules'):
+            if field in variant:
+                variant[field] = [str(rule) for rule in variant[field]]
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python sweep.py [dictFile] [translateFile] [variantsFile]',
+        description='Runs several pipeline variants over a corpus, computing stages shared by '
+            'several variants only once and caching every stage output on disk.')
+    parser.add_argument('dictFile')
+    parser.add_argument('translateFile')
+    parser.add_argument('variantsFile', help='JSON list of variants, see DEFAULT_VARIANT in sweep.py')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--output-dir', help='write the translations of each variant here')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='debug', help='output format of the translations')
+    parser.add_argument('--tokenizer', choices=['nltk', 'regex'], default='nltk', help='how lines are split into words')
+    parser.add_argument('--clear-cache', action='store_true', help='remove every cached stage output first')
+    parser.add_argument('--cache-limit', type=float, default=1024,
+        help='MB the cached stage outputs may take up; the least recently used are removed after the sweep')
+    args = parser.parse_args()
+
+    translator.tokenizerMethod = args.tokenizer
+    variants = loadVariants(args.variantsFile)
+    root, leaves = buildTrie(variants, rootKey(args.dictFile, args.translateFile))
+    if args.clear_cache:
+        clearCache()
+
+    initSweep(args.dictFile, args.translateFile)
+    pool = None
+    if args.workers > 1:
+        pool = multiprocessing.Pool(args.workers, initSweep, (args.dictFile, args.translateFile))
+    try:
+        computed, cached = runTrie(root, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    results = collectResults(root, leaves, variants, args.output_dir, args.format)
+    print >> sys.stderr, "Ran", computed, "stages,", cached, "from the cache, for", len(variants), "variants"
+    removed = pruneCache(int(args.cache_limit * (1 << 20)), trieKeys(root))
+    if removed:
+        print >> sys.stderr, "Removed", removed, "least recently used stage outputs from the cache"
+    for result in results:
+        print "%-20s corpus BLEU-%d %.4f  mean sentence BLEU %.4f  %s" % (result['name'],
+            translator.nGramForBLEU, result['corpusBleu'], result['meanSentenceBleu'], ' > '.join(result['stages']))
+
+
+if __name__ == '__main__':
+    main()
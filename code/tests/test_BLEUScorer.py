@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import BLEUScorer
+from BLEUScorer import BLEUScorer as Scorer
+
+numpy = pytest.importorskip('numpy')
+
+WORDS = ['the', 'a', 'cat', 'dog', 'sat', 'on', 'mat', 'to the', 'ran', '.']
+
+
+def randomSentence(rng, maxLength=8):
+    return [rng.choice(WORDS) for i in xrange(rng.randint(0, maxLength))]
+
+
+def randomCorpus(seed, size):
+    rng = random.Random(seed)
+    references = []
+    for i in xrange(size):
+        if rng.random() < 0.3:
+            references.append([randomSentence(rng) for k in xrange(rng.randint(1, 3))])
+        else:
+            references.append(randomSentence(rng))
+    hypotheses = [randomSentence(rng) for i in xrange(size)]
+    return (references, hypotheses)
+
+
+@pytest.mark.parametrize('n', [1, 2, 4])
+def test_batch_scores_match_sentence_scores(monkeypatch, n):
+    monkeypatch.setattr(BLEUScorer, 'NUMPY_MIN_BATCH', 0)
+    references, hypotheses = randomCorpus(n, 500)
+    scorer = Scorer(references, n)
+    assert scorer.sentenceScores(hypotheses) == [scorer.sentenceScore(h, i) for i, h in enumerate(hypotheses)]
+
+
+def test_batch_stats_match_stats():
+    references, hypotheses = randomCorpus(7, 300)
+    scorer = Scorer(references, 3)
+    matches, totals, lengths, referenceLengths = scorer.batchStats(hypotheses)
+    for i, hypothesis in enumerate(hypotheses):
+        m, t, l, r = scorer.stats(hypothesis, i)
+        assert list(matches[i]) == m and list(totals[i]) == t
+        assert (lengths[i], referenceLengths[i]) == (l, r)
+
+
+def test_fewer_hypotheses_than_references(monkeypatch):
+    monkeypatch.setattr(BLEUScorer, 'NUMPY_MIN_BATCH', 0)
+    references, hypotheses = randomCorpus(3, 50)
+    scorer = Scorer(references, 2)
+    assert scorer.sentenceScores(hypotheses[:20]) == [scorer.sentenceScore(h, i) for i, h in enumerate(hypotheses[:20])]
+
+
+def test_corpus_score_is_the_same_either_way(monkeypatch):
+    references, hypotheses = randomCorpus(11, 400)
+    scorer = Scorer(references, 2)
+    slow = scorer.corpusScore(hypotheses)
+    monkeypatch.setattr(BLEUScorer, 'NUMPY_MIN_BATCH', 0)
+    assert scorer.corpusScore(hypotheses) == slow
+
+
+def test_clipping():
+    scorer = Scorer([['the', 'cat', 'the']], 1)
+    assert scorer.batchStats([['the', 'the', 'the', 'cat']])[0].tolist() == [[3.0]]
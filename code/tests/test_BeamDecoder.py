@@ -0,0 +1,45 @@
+import math
+
+from BeamDecoder import BeamDecoder, SingleSenseDictionary
+import translator
+
+
+class FlatModel:
+    """Scores every word alike, so the decoder keeps the input order and
+       the first sense of every word."""
+
+    def tokenScore(self, lastWord, token):
+        words = token.lower().split()
+        return (math.log(0.5) * len(words), words[-1])
+
+    def bigramScore(self, previousWord, word):
+        return 0.5
+
+
+DICTIONARY = {'veo': 'see', 'casa': 'house', 'la': 'the', 'es': 'is', 'gente': 'people', 'dice': 'says'}
+
+SENTENCES = [
+    [('lo', 'da0'), ('que', 'pr'), ('veo', 'vmip'), ('es', 'vsip'), ('casa', 'ncfs')],
+    [('la', 'da0'), ('veo', 'vmip'), ('la', 'o'), ('casa', 'ncfs')],
+    [('gente', 'ncfs'), ('que', 'pr'), ('dice', 'vmip')],
+    [('dice', 'vmip'), ('que', 'cs'), ('Casa', 'ncfs')],
+]
+
+
+def test_beam_follows_the_same_rules_as_translate():
+    decoder = BeamDecoder(DICTIONARY, FlatModel(), rules=translator.ruleTranslation, distortionPenalty=100.0)
+    assert decoder.decode(SENTENCES) == translator.translate(SENTENCES, DICTIONARY)
+
+
+def test_plain_dictionaries_get_a_single_sense():
+    decoder = BeamDecoder(DICTIONARY, FlatModel())
+    assert isinstance(decoder.dictionary, SingleSenseDictionary)
+    assert decoder.dictionary.senses('Casa') == ['house']
+    assert decoder.dictionary.senses('perro') == []
+
+
+def test_decoders_are_reused():
+    model = FlatModel()
+    decoder = translator.getBeamDecoder(DICTIONARY, model, 4)
+    assert translator.getBeamDecoder(DICTIONARY, model, 4) is decoder
+    assert decoder.rules is translator.ruleTranslation
@@ -0,0 +1,46 @@
+import random
+
+from Datum import dameraulevenshtein, withinOneEdit, boundedDameraulevenshtein, batchDameraulevenshtein
+from DeletionIndex import DeletionIndex, deletions
+
+
+# Random short words over a small alphabet, so that many pairs are close
+def randomWords(count, seed):
+    rng = random.Random(seed)
+    return [''.join(rng.choice('abcd') for _ in xrange(rng.randint(0, 6))) for _ in xrange(count)]
+
+
+def test_deletions():
+    assert deletions('abc', 1) == set(['abc', 'bc', 'ac', 'ab'])
+    assert deletions('abc', 2) == set(['abc', 'bc', 'ac', 'ab', 'a', 'b', 'c'])
+
+
+def test_bounded_distance_matches_reference():
+    words = randomWords(120, 1)
+    for first in words:
+        for second in words:
+            distance = dameraulevenshtein(first, second)
+            assert withinOneEdit(first, second) == (distance <= 1)
+            for maxDistance in (1, 2, 3):
+                assert boundedDameraulevenshtein(first, second, maxDistance) == min(distance, maxDistance + 1)
+
+
+def test_batch_distance_matches_reference():
+    words = randomWords(60, 2)
+    candidates = [word for word in words if word]
+    for word in words:
+        assert batchDameraulevenshtein(word, candidates) == [dameraulevenshtein(word, c) for c in candidates]
+
+
+def test_index_finds_every_close_word():
+    vocabulary = sorted(set(randomWords(300, 3)))
+    queries = randomWords(100, 4)
+    for maxDistance in (1, 2):
+        index = DeletionIndex(vocabulary, maxDistance)
+        for query in queries:
+            expected = {}
+            for word in vocabulary:
+                distance = dameraulevenshtein(query, word)
+                if distance <= maxDistance:
+                    expected[word] = distance
+            assert index.candidates(query) == expected
@@ -0,0 +1,39 @@
+import json
+
+import translator
+from EnglishTagger import EnglishTagger
+from Profiler import Profiler
+
+
+class StubTagger:
+    def __init__(self):
+        self.calls = 0
+
+    def tag(self, sentence):
+        self.calls += 1
+        return [(word, 'NN') for word in sentence]
+
+
+def test_batches_are_timed_and_cached():
+    tagger = EnglishTagger(batchSize=2)
+    tagger.tagger = StubTagger()
+    sentences = [['the', 'cat'], ['a', 'dog'], ['the', 'cat'], ['it']]
+    assert tagger.tagSents(sentences)[2] == [('the', 'NN'), ('cat', 'NN')]
+    assert tagger.tagger.calls == 3
+
+    report = tagger.report()
+    assert report['batches'] == 2 and report['sentences'] == 4
+    assert len(report['recentBatchSeconds']) == 2
+    assert report['cache']['hits'] == 1
+
+
+def test_profile_report_includes_tagger_batches(tmpdir, monkeypatch):
+    tagger = EnglishTagger()
+    tagger.tagger = StubTagger()
+    tagger.tagSents([['the', 'cat']])
+    monkeypatch.setattr(translator, 'englishTagger', tagger)
+    path = str(tmpdir.join('profile.json'))
+    Profiler().write(path, translator.cacheStats(None), translator.taggerStats())
+    report = json.load(open(path))
+    assert report['taggers']['englishTagger']['batches'] == 1
+    assert report['taggers']['englishTagger']['sentences'] == 1
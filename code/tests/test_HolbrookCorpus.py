@@ -0,0 +1,77 @@
+import os
+import re
+
+import pytest
+
+from HolbrookCorpus import HolbrookCorpus
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data')
+DATA_FILES = [os.path.join(DATA_DIR, name) for name in ('holbrook-tagged-dev.dat', 'holbrook-tagged-train.dat')]
+
+# <err> annotations whose target is several words, which the original
+# parser cut short
+MULTIWORD_TARGET = re.compile(r'<err\s+targ=[^>]*\s[^>]*>', re.IGNORECASE)
+
+
+# The token-by-token parser HolbrookCorpus.processLine replaced, returning
+# (word, error) pairs
+def originalProcessLine(line):
+    line = line.strip().lower()
+    for c in '",.!\':;':
+        line = line.replace(c, '')
+    if line == '':
+        return None
+    processed = [('<s>', '')]
+    tokens = line.split()
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '<err':
+            correct_token = tokens[i+1].split('=')[1][:-1]
+            correct_token_splits = correct_token.split()
+            if len(correct_token_splits) > 2:
+                for correct_word in correct_token_splits:
+                    processed.append((correct_word, ''))
+            elif tokens[i+3] != '</err>':
+                processed.append((correct_token, ''))
+            else:
+                processed.append((correct_token, tokens[i+2]))
+            i += tokens[i:].index('</err>') + 1
+        else:
+            processed.append((token, ''))
+            i += 1
+    processed.append(('</s>', ''))
+    return processed
+
+
+def pairs(sentence):
+    return [(datum.word, datum.error) for datum in sentence.data]
+
+
+@pytest.mark.parametrize('filename', DATA_FILES)
+def test_parse_matches_the_original_parser(filename):
+    corpus = HolbrookCorpus()
+    compared = 0
+    for line in open(filename):
+        if MULTIWORD_TARGET.search(line):
+            continue
+        sentence = corpus.processLine(line)
+        expected = originalProcessLine(line)
+        assert (pairs(sentence) if sentence else None) == expected, line
+        compared += 1
+    assert compared > 100
+
+
+def test_multiword_targets_keep_every_word():
+    sentence = HolbrookCorpus().processLine('It was <ERR targ=half past> haf parst </ERR> two.')
+    assert pairs(sentence) == [('<s>', ''), ('it', ''), ('was', ''), ('half', ''), ('past', ''),
+        ('two', ''), ('</s>', '')]
+
+
+def test_cache_round_trip(tmpdir):
+    corpus = HolbrookCorpus(DATA_FILES[0])
+    path = str(tmpdir.join('dev.corpus'))
+    corpus.save(path)
+    loaded = HolbrookCorpus()
+    loaded.load(path)
+    assert [pairs(s) for s in loaded.corpus] == [pairs(s) for s in corpus.corpus]
@@ -0,0 +1,61 @@
+import mmap
+import struct
+
+import pytest
+
+from ArticleTester import ArticleTester
+from ModelStore import ModelStore, MappedArray, buildStore, arrayBytes
+from spanishTagger import SpanishTagger
+
+
+def englishModel():
+    model = ArticleTester()
+    for word in ['<s>', 'the', 'cat', '</s>']:
+        model.vocabulary.intern(word)
+    model.freeze({0: 2, 1: 2, 2: 1, 3: 2}, {(0, 1): 2, (1, 2): 1, (2, 3): 1})
+    return model
+
+
+@pytest.fixture
+def store(tmpdir):
+    path = str(tmpdir.join('models.store'))
+    taggerTable = {'gato': 'ncms000', 'el': 'da0ms0', '.': None}
+    buildStore(path, 'v1', {'gato': 'cat', 'el': 'the'}, taggerTable, englishModel())
+    store = ModelStore(path)
+    yield store
+    store.close()
+
+
+def test_none_tags_behave_like_the_dict(store):
+    table = store.taggerTable()
+    assert '.' in table and table['.'] is None and table.get('.', 'missing') is None
+    assert table.get('perro', 'missing') == 'missing'
+
+    mapped = SpanishTagger(table=table)
+    plain = SpanishTagger(table={'gato': 'ncms000', 'el': 'da0ms0', '.': None})
+    sentence = ['el', 'gato', '.', 'perro']
+    assert mapped.tagSentence(sentence) == plain.tagSentence(sentence)
+    assert mapped.cacheStats() == plain.cacheStats()
+
+
+def test_model_matches_the_original(store):
+    original = englishModel()
+    mapped = store.englishModel()
+    for first in ['<s>', 'the', 'cat', 'dog']:
+        for second in ['the', 'cat', '</s>', 'dog']:
+            assert mapped.bigramScore(first, second) == original.bigramScore(first, second)
+    assert store.dictionary()['gato'] == 'cat'
+
+
+@pytest.mark.parametrize('values', [[], [0, 5, 7], [-3, 4], [1 << 40, 2], [-(1 << 40)]])
+def test_arrays_keep_their_values(values):
+    data = arrayBytes(values)
+    mm = mmap.mmap(-1, len(data))
+    mm.write(data)
+    array = MappedArray(mm, 0)
+    assert [array[i] for i in xrange(len(array))] == values
+
+
+def test_arrays_out_of_range_are_rejected():
+    with pytest.raises(ValueError):
+        arrayBytes([1 << 64])
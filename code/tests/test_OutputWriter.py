@@ -0,0 +1,73 @@
+import json
+import StringIO
+
+from OutputWriter import DebugWriter, JsonLinesWriter, TsvWriter, TextWriter
+
+nGramForBLEU = 2
+
+
+# printTranslations as translator.py printed it before DebugWriter
+def originalPrintTranslations(spanishSentences, englishTranslations, englishSentences, directEnglishTranslations, rawEnglishTranslations, rawSpanishSentences, bScores, directTranslationBScores, taggedEnglishTranslations):
+    print "\n\n"
+    print "================ TRANSLATIONS =================="
+    print "\n\n"
+    for i, sentence in enumerate(englishTranslations):
+        print
+        print "============= New Translation: {0} =============".format(i + 1)
+        print "Translation of: ", " ".join(spanishSentences[i])
+        print "Translation: ", " ".join(sentence)
+        print "Correct Translation: ", " ".join(englishSentences[i])
+        print "Raw Spanish Sentence: ", rawSpanishSentences[i]
+        print "Raw Correct Translation: ", rawEnglishTranslations[i]
+        print "Direct Translation: ", " ".join(directEnglishTranslations[i])
+        print "Direct Translation BLEU-", nGramForBLEU," Score: ", directTranslationBScores[i]
+        print "Final BLEU-", nGramForBLEU," Score: ", bScores[i]
+        print "Tagged Translation: ", taggedEnglishTranslations[i]
+    print "Summary: "
+    for i in range(len(englishTranslations)):
+        print "Sentence: ", i+1, " Direct Translation Score: ", directTranslationBScores[i], " vs. Final Score: ", bScores[i]
+
+
+COLUMNS = {
+    'spanish': [['el', 'gato'], ['la', 'casa', 'es', 'roja']],
+    'translation': [['the', 'cat'], ['the', 'house', 'is', 'red']],
+    'reference': [['the', 'cat'], ['the', 'red', 'house']],
+    'rawSpanish': ['El gato.\n', 'La casa es roja.\n'],
+    'rawReference': ['The cat.\n', 'The house is red.\n'],
+    'direct': [['the', 'cat'], ['the', 'house', 'is', 'red']],
+    'directBleu': [1.0, 0.4472135954999579],
+    'bleu': [1.0, 0.5],
+    'tagged': [[('the', 'DT'), ('cat', 'NN')], [('the', 'DT'), ('house', 'NN'), ('is', 'VBZ'), ('red', 'JJ')]],
+}
+
+
+def test_debug_matches_original_format(capsys):
+    originalPrintTranslations(COLUMNS['spanish'], COLUMNS['translation'], COLUMNS['reference'],
+        COLUMNS['direct'], COLUMNS['rawReference'], COLUMNS['rawSpanish'], COLUMNS['bleu'],
+        COLUMNS['directBleu'], COLUMNS['tagged'])
+    expected = capsys.readouterr()[0]
+    stream = StringIO.StringIO()
+    DebugWriter(stream, n=nGramForBLEU).writeAll(COLUMNS)
+    assert stream.getvalue() == expected
+
+
+def test_buffering_does_not_change_output():
+    outputs = []
+    for lineBuffered, bufferSize in ((False, 1 << 16), (False, 1), (True, 1 << 16)):
+        stream = StringIO.StringIO()
+        writer = JsonLinesWriter(stream, lineBuffered=lineBuffered)
+        writer.bufferSize = bufferSize
+        writer.writeAll(COLUMNS)
+        outputs.append(stream.getvalue())
+    assert outputs[0] == outputs[1] == outputs[2]
+    assert json.loads(outputs[0].split('\n')[1]) == {'id': 2, 'spanish': 'la casa es roja',
+        'translation': 'the house is red', 'reference': 'the red house', 'bleu': 0.5}
+
+
+def test_tsv_and_text():
+    stream = StringIO.StringIO()
+    TsvWriter(stream, ['translation', 'rawSpanish']).writeAll(COLUMNS)
+    assert stream.getvalue() == 'id\ttranslation\trawSpanish\n1\tthe cat\tEl gato.\n2\tthe house is red\tLa casa es roja.\n'
+    stream = StringIO.StringIO()
+    TextWriter(stream).writeAll(COLUMNS)
+    assert stream.getvalue() == 'the cat\nthe house is red\n'
@@ -0,0 +1,50 @@
+import os
+
+import modelCache
+from ParallelCorpusReader import ParallelCorpusReader
+
+CORPUS = '''# a comment
+El gato.
+The cat.
+
+La casa es roja.
+The house is red.
+Hola.
+
+Hello.
+'''
+
+
+def writeCorpus(tmpdir):
+    path = tmpdir.join('corpus.txt')
+    path.write(CORPUS)
+    return str(path)
+
+
+def test_pairs_from_any_index(tmpdir):
+    reader = ParallelCorpusReader(writeCorpus(tmpdir))
+    assert len(reader) == 3
+    assert [pair.rawSpanish for pair in reader.pairs(1)] == ['La casa es roja.\n', 'Hola.\n']
+    assert reader[2].english == ['Hello', '.']
+
+
+def test_sides_are_tokenized_when_used(tmpdir):
+    tokenized = []
+    def tokenize(line):
+        tokenized.append(line)
+        return line.split()
+    for pair in ParallelCorpusReader(writeCorpus(tmpdir), tokenize):
+        pair.spanish
+    assert tokenized == ['El gato.\n', 'La casa es roja.\n', 'Hola.\n']
+
+
+def test_index_is_cached(tmpdir, monkeypatch):
+    monkeypatch.setattr(modelCache, 'CACHE_DIR', str(tmpdir.join('cache')))
+    path = writeCorpus(tmpdir)
+    offsets = ParallelCorpusReader(path, useCache=True).buildIndex()
+    assert len(os.listdir(str(tmpdir.join('cache')))) == 1
+
+    reader = ParallelCorpusReader(path, useCache=True)
+    reader.scanIndex = None # must not be needed
+    assert reader.buildIndex() == offsets
+    assert reader[1].rawEnglish == 'The house is red.\n'
@@ -0,0 +1,32 @@
+import pytest
+
+from Datum import Datum
+from Sentence import Sentence
+from HolbrookCorpus import HolbrookCorpus
+
+
+def test_data_is_read_only():
+    sentence = Sentence([Datum('<s>'), Datum('their', 'there'), Datum('</s>')])
+    datum = sentence.data[1]
+    with pytest.raises(AttributeError):
+        datum.word = 'they'
+    assert sentence.getCorrectSentence() == ['<s>', 'their', '</s>']
+
+
+def test_put_changes_the_sentence():
+    sentence = Sentence([Datum('<s>'), Datum('their', 'there'), Datum('</s>')])
+    copy = Sentence(sentence)
+    sentence.put(1, Datum('they'))
+    assert sentence.getCorrectSentence() == ['<s>', 'they', '</s>']
+    assert sentence.getErrorSentence() == ['<s>', 'they', '</s>']
+    assert copy.getErrorSentence() == ['<s>', 'there', '</s>']
+
+
+def test_corpora_do_not_share_words():
+    first = HolbrookCorpus()
+    second = HolbrookCorpus()
+    first.processLine('a <ERR targ=cat> kat </ERR> sat')
+    second.processLine('the dog')
+    assert 'cat' in first.words.words
+    assert 'cat' not in second.words.words
+    assert 'kat' not in Sentence().vocabulary.words
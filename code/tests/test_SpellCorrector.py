@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import math
+
+from SpellCorrector import SpellCorrector, editFor
+
+
+def test_edit_notation():
+    assert editFor('sin', 'sen') == 'e|i'
+    assert editFor('piso', 'pieso') == 'ie|i'
+    assert editFor('pieso', 'piso') == 'i|ie'
+    assert editFor('tiene', 'teine') == 'ei|ie'
+    assert editFor('casa', 'xcasa') == '<x|<'
+    assert editFor('casa', 'asa') == '<|<c'
+
+
+def test_channel_score_uses_typed_first_counts():
+    corrector = SpellCorrector({}, None)
+    # count_1edit.txt has 'ie|i' 101 and 'i|ie' 87, 'e|i' 917 and 'i|e' 771
+    assert corrector.channelScore(u'piso', u'pieso') == math.log(102 / corrector.totalEdits)
+    assert corrector.channelScore(u'pieso', u'piso') == math.log(88 / corrector.totalEdits)
+    assert corrector.channelScore(u'sin', u'sen') == math.log(918 / corrector.totalEdits)
+    assert corrector.channelScore(u'sen', u'sin') == math.log(772 / corrector.totalEdits)
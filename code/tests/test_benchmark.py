@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from benchmark import runIsolated
+
+
+def add(a, b):
+    return a + b
+
+def fail():
+    raise ValueError('no corpus')
+
+def die():
+    os._exit(3)
+
+
+def test_result_comes_back():
+    assert runIsolated(add, 2, 3) == 5
+
+
+def test_child_exception_is_raised():
+    with pytest.raises(RuntimeError) as info:
+        runIsolated(fail)
+    assert 'ValueError: no corpus' in str(info.value)
+
+
+def test_child_death_is_raised():
+    with pytest.raises(RuntimeError) as info:
+        runIsolated(die)
+    assert 'exit code 3' in str(info.value)
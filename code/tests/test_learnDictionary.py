@@ -0,0 +1,72 @@
+import pytest
+
+import translator
+import learnDictionary
+
+CORPUS = '''El gato come.
+The cat eats.
+
+El perro come.
+The dog eats.
+
+Ana tiene un gato, un perro.
+Ana has a cat, a dog.
+
+Un perro.
+A dog.
+
+El gato duerme.
+The cat sleeps.
+
+Ana duerme.
+Ana sleeps.
+'''
+
+
+@pytest.fixture
+def trained(tmpdir, monkeypatch):
+    path = tmpdir.join('corpus.txt')
+    path.write(CORPUS)
+    monkeypatch.setattr(translator, 'tokenizerMethod', 'regex')
+    monkeypatch.setattr(learnDictionary, 'maxLength', 40)
+    text, skipped = learnDictionary.readCorpora([str(path)], 40)
+    monkeypatch.setattr(learnDictionary, 'text', text)
+    learnDictionary.train(5, 3, 1, 1 << 22)
+
+
+def test_senses_are_words(trained):
+    entries = dict(learnDictionary.rankedSenses(3, 0.1, 1))
+    assert ',' not in entries and '.' not in entries
+    assert all(learnDictionary.isWord(sense) for senses in entries.itervalues() for sense in senses)
+    assert entries['gato'][0] == 'cat'
+    assert entries['perro'][0] == 'dog'
+    # Spelled the same, so first however EM splits the probability
+    assert entries['ana'][0] == 'ana'
+
+
+def test_min_prob_applies_to_renormalized_senses(trained):
+    loose = dict(learnDictionary.rankedSenses(10, 0.0, 1))
+    strict = dict(learnDictionary.rankedSenses(10, 0.5, 1))
+    for word, senses in strict.iteritems():
+        assert len(senses) == 1 and senses[0] == loose[word][0]
+    assert len(dict(learnDictionary.rankedSenses(10, 0.0, 1, 0.2))['el']) < len(loose['el'])
+
+
+def test_malformed_base_lines_are_reported(tmpdir, capsys):
+    base = tmpdir.join('base.txt')
+    base.write('gato:cat\nno colon here\n\nperro:dog\n')
+    output = tmpdir.join('out.txt')
+    learnDictionary.writeDictionary([('gato', ['cat', 'tomcat']), ('come', ['eats'])], str(output), str(base))
+    assert output.read() == 'gato:cat\nperro:dog\ngato:tomcat\ncome:eats\n'
+    assert ':2:' in capsys.readouterr()[1]
+
+
+def test_alignments_cover_only_corpus_lengths(trained):
+    text = learnDictionary.text
+    probs = learnDictionary.alignmentProbs
+    lengths = set(zip(text.englishLengths, text.spanishLengths))
+    assert len(probs) == sum(l * m for l, m in lengths)
+    assert (learnDictionary.alignmentStarts >= 0).sum() == len(lengths)
+    sums = [probs[learnDictionary.alignmentKey(l, m, j, 0):learnDictionary.alignmentKey(l, m, j, m)].sum()
+            for l, m in lengths for j in range(l)]
+    assert sums == pytest.approx([1.0] * len(sums))
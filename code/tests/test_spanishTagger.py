@@ -0,0 +1,44 @@
+import os
+import sys
+import types
+
+import spanishTagger
+from modelCache import hashFileStats
+
+
+def fakeCess(monkeypatch, paths):
+    corpus = types.ModuleType('nltk.corpus')
+    corpus.cess_esp = types.ModuleType('nltk.corpus.cess_esp')
+    corpus.cess_esp.abspaths = lambda: paths
+    nltk = types.ModuleType('nltk')
+    nltk.corpus = corpus
+    monkeypatch.setitem(sys.modules, 'nltk', nltk)
+    monkeypatch.setitem(sys.modules, 'nltk.corpus', corpus)
+    monkeypatch.setattr(spanishTagger, 'cachedModelVersion', None)
+
+
+def test_hashFileStats_follows_size_and_mtime(tmpdir):
+    path = str(tmpdir.join('a.txt'))
+    open(path, 'w').write('abc')
+    before = hashFileStats([path])
+    assert hashFileStats([path]) == before
+    open(path, 'w').write('abcd')
+    assert hashFileStats([path]) != before
+
+
+def test_modelVersion_is_computed_once(tmpdir, monkeypatch):
+    path = str(tmpdir.join('cess.txt'))
+    open(path, 'w').write('corpus')
+    fakeCess(monkeypatch, [path])
+    version = spanishTagger.modelVersion()
+    # Removing the corpus shows the memoized version never touches it again
+    os.remove(path)
+    assert spanishTagger.modelVersion() == version
+
+
+def test_tagWord_reads_the_table_and_counts_lookups():
+    tagger = spanishTagger.SpanishTagger(table={'casa': 'ncfs000', 'y': None})
+    assert tagger.tagSents([['casa', 'y', 'perro'], ['casa']]) == \
+        [[('casa', 'ncfs000'), ('y', None), ('perro', None)], [('casa', 'ncfs000')]]
+    stats = tagger.cacheStats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 2)
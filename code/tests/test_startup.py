@@ -0,0 +1,17 @@
+import translator
+from benchmark import measureStartup
+
+# The default budget of benchmark.py startup
+BUDGET_SECONDS = 0.1
+
+
+def test_import_loads_no_heavy_modules():
+    seconds, heavy = measureStartup(1)
+    assert heavy == []
+    assert 'nltk' in translator.HEAVY_MODULES and 'numpy' in translator.HEAVY_MODULES
+
+
+def test_import_is_within_budget():
+    # The fastest of a few runs, so a busy machine does not fail the test
+    seconds, heavy = measureStartup(3)
+    assert seconds < BUDGET_SECONDS
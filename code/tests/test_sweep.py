@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import sweep
+
+
+def test_articles_none_skips_article_correction():
+    for articles in ('none', None):
+        stages = [name for name, config in sweep.variantStages({'name': 'a', 'articles': articles})]
+        assert 'articleCorrection' not in stages
+    assert ('articleCorrection', 'viterbi:insert') in sweep.variantStages(
+        {'name': 'a', 'articles': 'viterbi', 'insertArticles': True})
+    assert ('articleCorrection', 'threshold') in sweep.variantStages({'name': 'a', 'insertArticles': True})
+
+
+@pytest.mark.parametrize('variant', [
+    {'name': 'a', 'decoder': 'bean'},
+    {'name': 'a', 'articles': 'vitterbi'},
+    {'name': 'a', 'articles': False},
+    {'name': 'a', 'beamWidth': 0},
+    {'name': 'a', 'capitalize': 'yes'},
+    {'name': 'a', 'englishRules': ['noSuchRule']},
+    {'name': 'a', 'decodr': 'beam'},
+])
+def test_bad_variants_are_rejected(variant):
+    with pytest.raises(ValueError):
+        sweep.variantStages(variant)
+
+
+def test_unknown_stage_config_is_rejected(monkeypatch):
+    monkeypatch.setattr(sweep, 'sweepModels', (None, None, None))
+    with pytest.raises(ValueError):
+        sweep.stageFunction('translate', 'bean:4')
+    with pytest.raises(ValueError):
+        sweep.stageFunction('articleCorrection', 'none')
+
+
+def test_prune_removes_least_recently_used(tmpdir, monkeypatch):
+    monkeypatch.setattr(sweep, 'STAGE_CACHE_DIR', str(tmpdir))
+    for i, key in enumerate(['old', 'kept', 'new']):
+        sweep.saveOutput(key, 'x' * 1000)
+        os.utime(sweep.stagePath(key), (i, i))
+    assert sweep.pruneCache(1500, keep=['kept']) == 2
+    assert sorted(os.listdir(str(tmpdir))) == ['kept.marshal']
+    sweep.clearCache()
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_root_key_covers_every_model_input(tmpdir, monkeypatch):
+    import modelCache
+    import spanishTagger
+    monkeypatch.setattr(spanishTagger, 'modelVersion', lambda: 'tagger1')
+    files = {}
+    for name in ('corpus', 'dict', 'train', 'edits'):
+        files[name] = tmpdir.join(name + '.txt')
+        files[name].write(name)
+    monkeypatch.setattr(modelCache, 'TRAIN_PATH', str(files['train']))
+    monkeypatch.setattr(modelCache, 'EDIT_COUNTS_PATH', str(files['edits']))
+
+    key = lambda: sweep.rootKey(str(files['dict']), str(files['corpus']))
+    previous = key()
+    for name in ('corpus', 'dict', 'train', 'edits'):
+        files[name].write(name + ' changed')
+        assert key() != previous
+        previous = key()
+    monkeypatch.setattr(spanishTagger, 'modelVersion', lambda: 'tagger2')
+    assert key() != previous
@@ -0,0 +1,104 @@
+import json
+import time
+import httplib
+import threading
+
+import pytest
+
+import translationServer
+from translationServer import BatchTranslator, TCPTranslationServer, TranslationHandler
+
+
+# Stands in for translator.translateSentences, recording each batch
+def stubTranslate(batches):
+    def translate(sentences, *models):
+        batches.append(list(sentences))
+        if any(sentence == ['falla'] for sentence in sentences):
+            raise RuntimeError('translation failed')
+        return ([[word.upper() for word in sentence] for sentence in sentences], None)
+    return translate
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    batches = []
+    monkeypatch.setattr(translationServer, 'translateSentences', stubTranslate(batches))
+    monkeypatch.setattr(translationServer, 'tokenizeLine', lambda line: line.split())
+    return batches
+
+
+@pytest.fixture
+def server(batches):
+    server = TCPTranslationServer(('127.0.0.1', 0), TranslationHandler)
+    server.translator = BatchTranslator((), 64, 0.001)
+    server.slots = threading.BoundedSemaphore(4)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body, path='/translate'):
+    connection = httplib.HTTPConnection('127.0.0.1', server.server_address[1])
+    connection.request('POST', path, body if isinstance(body, str) else json.dumps(body))
+    response = connection.getresponse()
+    result = (response.status, json.loads(response.read()))
+    connection.close()
+    return result
+
+
+def test_translates_one_or_many(server):
+    assert post(server, {'sentence': 'el gato'}) == (200, {'translation': 'EL GATO'})
+    assert post(server, {'sentences': ['el gato', 'un perro']}) == (200, {'translations': ['EL GATO', 'UN PERRO']})
+
+
+@pytest.mark.parametrize('body', [
+    'not json',
+    '"sentences"',
+    {'sentences': 'abc'},
+    {'sentences': [1]},
+    {'sentences': ['ok', None]},
+    {'sentence': ['abc']},
+    {'text': 'abc'},
+])
+def test_bad_requests_get_400(server, batches, body):
+    status, response = post(server, body)
+    assert status == 400 and 'error' in response
+    assert batches == []
+
+
+def test_errors(server):
+    assert post(server, {'sentence': 'falla'})[0] == 500
+    assert post(server, {'sentence': 'x'}, '/other')[0] == 404
+    server.slots = threading.BoundedSemaphore(1)
+    server.slots.acquire()
+    assert post(server, {'sentence': 'x'})[0] == 503
+
+
+def test_batches_keep_request_order(batches):
+    batcher = BatchTranslator((), maxBatchSize=64, maxDelay=0.2)
+    results = {}
+    def submit(i):
+        results[i] = batcher.submit([['w%d' % i], ['v%d' % i]])
+    threads = [threading.Thread(target=submit, args=(i,)) for i in xrange(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i in xrange(8):
+        assert results[i] == ['W%d' % i, 'V%d' % i]
+    # Requests arriving within maxDelay share batches
+    assert len(batches) < 8
+    assert sum(len(batch) for batch in batches) == 16
+
+
+def test_batches_are_capped(batches):
+    batcher = BatchTranslator((), maxBatchSize=2, maxDelay=0.2)
+    threads = [threading.Thread(target=batcher.submit, args=([['w']],)) for i in xrange(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(len(batch) for batch in batches) <= 2
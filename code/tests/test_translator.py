@@ -0,0 +1,54 @@
+import sys
+
+import pytest
+
+import translator
+
+
+def runMain(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['translator.py', 'dict.txt', 'corpus.txt'] + list(args))
+    translator.main()
+
+
+@pytest.mark.parametrize('args', [
+    ['--stream', '--workers', '2'],
+    ['--stream', '--memory', 'memory.db'],
+])
+def test_stream_rejects_batch_only_flags(monkeypatch, capsys, args):
+    with pytest.raises(SystemExit) as info:
+        runMain(monkeypatch, *args)
+    assert info.value.code == 2
+    assert '--stream' in capsys.readouterr()[1]
+
+
+def test_memory_version_covers_every_model_input(tmpdir, monkeypatch):
+    import modelCache
+    import spanishTagger
+    monkeypatch.setattr(spanishTagger, 'modelVersion', lambda: 'tagger1')
+    files = {}
+    for name in ('dict', 'train', 'edits'):
+        files[name] = tmpdir.join(name + '.txt')
+        files[name].write(name)
+    monkeypatch.setattr(modelCache, 'TRAIN_PATH', str(files['train']))
+    monkeypatch.setattr(modelCache, 'EDIT_COUNTS_PATH', str(files['edits']))
+
+    version = translator.memoryVersion(str(files['dict']))
+    for name in ('dict', 'train', 'edits'):
+        files[name].write(name + ' changed')
+        assert translator.memoryVersion(str(files['dict'])) != version
+        version = translator.memoryVersion(str(files['dict']))
+    monkeypatch.setattr(spanishTagger, 'modelVersion', lambda: 'tagger2')
+    assert translator.memoryVersion(str(files['dict'])) != version
+
+
+def test_workers_load_the_profiler_only_when_profiling(monkeypatch):
+    monkeypatch.setattr(translator, 'workerModels', ('dictionary', 'tagger', 'model'))
+    monkeypatch.setattr(translator, 'translateSentences',
+        lambda sentences, *models, **options: (sentences, sentences))
+    # Importing Profiler now fails
+    monkeypatch.setitem(sys.modules, 'Profiler', None)
+    monkeypatch.setattr(translator, 'workerProfiling', False)
+    assert translator.translateShard([['hola']]) == ([['hola']], [['hola']], None)
+    monkeypatch.setattr(translator, 'workerProfiling', True)
+    with pytest.raises(ImportError):
+        translator.translateShard([['hola']])
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+import os
+import time
+import json
+import argparse
+import threading
+import Queue
+import SocketServer
+import BaseHTTPServer
+
+from translator import loadModels, tokenizeLine, translateSentences
+
+# Resident translation server. Loads the dictionary, taggers and English
+# model once, then serves translate requests over local HTTP (TCP or a
+# Unix socket):
+#
+#   POST /translate  {"sentence": "..."}  ->  {"translation": "..."}
+#   POST /translate  {"sentences": [...]} ->  {"translations": [...]}
+#   GET  /health                          ->  {"status": "ok"}
+#
+# Requests arriving close together are merged into a single batch before
+# running the pipeline, and the number of in-flight requests is capped.
+
+
+class PendingRequest:
+
+    def __init__(self, sentences):
+        self.sentences = sentences
+        self.translations = None
+        self.error = None
+        self.done = threading.Event()
+
+
+# Collects sentences from concurrent requests into batches and runs them
+# through the pipeline on a single background thread.
+class BatchTranslator:
+
+    def __init__(self, models, maxBatchSize=64, maxDelay=0.005):
+        self.models = models
+        self.maxBatchSize = maxBatchSize
+        self.maxDelay = maxDelay
+        self.queue = Queue.Queue()
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    # Takes a list of tokenized Spanish sentences and blocks until their
+    # English translations are ready.
+    def submit(self, sentences):
+        request = PendingRequest(sentences)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.translations
+
+    def nextBatch(self):
+        batch = [self.queue.get()]
+        count = len(batch[0].sentences)
+        deadline = time.time() + self.maxDelay
+        while count < self.maxBatchSize:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=remaining)
+            except Queue.Empty:
+                break
+            batch.append(request)
+            count += len(request.sentences)
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.nextBatch()
+            sentences = []
+            for request in batch:
+                sentences.extend(request.sentences)
+            try:
+                translations, _ = translateSentences(sentences, *self.models)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+
+            start = 0
+            for request in batch:
+                end = start + len(request.sentences)
+                request.translations = [' '.join(t) for t in translations[start:end]]
+                request.done.set()
+                start = end
+
+
+# Returns the Spanish lines of a decoded request body, which must be an
+# object with either a "sentence" string or a "sentences" list of strings.
+# Raises ValueError for any other body.
+def requestLines(request):
+    if not isinstance(request, dict):
+        raise ValueError('request is not an object')
+    if 'sentences' in request:
+        lines = request['sentences']
+        if not isinstance(lines, list):
+            raise ValueError('sentences is not a list')
+    elif 'sentence' in request:
+        lines = [request['sentence']]
+    else:
+        raise ValueError('no sentence or sentences')
+    for line in lines:
+        if not isinstance(line, basestring):
+            raise ValueError('sentence is not a string')
+    return lines
+
+
+class TranslationHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.sendJSON(404, {'error': 'not found'})
+            return
+        self.sendJSON(200, {'status': 'ok'})
+
+    def do_POST(self):
+        if self.path != '/translate':
+            self.sendJSON(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+            request = json.loads(self.rfile.read(length))
+            lines = requestLines(request)
+        except ValueError:
+            self.sendJSON(400, {'error': 'expected {"sentence": "..."} or {"sentences": ["...", ...]}'})
+            return
+
+        # Reject rather than queue unboundedly once the server is saturated
+        if not self.server.slots.acquire(False):
+            self.sendJSON(503, {'error': 'too many concurrent requests'})
+            return
+        try:
+            sentences = [tokenizeLine(line.encode('utf-8')) for line in lines]
+            translations = self.server.translator.submit(sentences)
+        except Exception as e:
+            self.sendJSON(500, {'error': str(e)})
+            return
+        finally:
+            self.server.slots.release()
+
+        if 'sentences' in request:
+            self.sendJSON(200, {'translations': translations})
+        else:
+            self.sendJSON(200, {'translation': translations[0]})
+
+    def sendJSON(self, status, obj):
+        body = json.dumps(obj)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Unix socket peers have no address
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+
+class TCPTranslationServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class UnixTranslationServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    # HTTPServer.server_bind expects a (host, port) address
+    def server_bind(self):
+        SocketServer.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve translations from resident models.')
+    parser.add_argument('dictFile')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--socket', help='listen on this Unix socket path instead of TCP')
+    parser.add_argument('--max-batch-size', type=int, default=64, help='sentences per pipeline batch')
+    parser.add_argument('--max-delay', type=float, default=5.0, help='milliseconds to wait while filling a batch')
+    parser.add_argument('--max-concurrent', type=int, default=32, help='in-flight requests before returning 503')
+    args = parser.parse_args()
+
+    models = loadModels(args.dictFile)
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixTranslationServer(args.socket, TranslationHandler)
+        address = args.socket
+    else:
+        server = TCPTranslationServer((args.host, args.port), TranslationHandler)
+        address = '%s:%d' % (args.host, args.port)
+
+    server.translator = BatchTranslator(models, args.max_batch_size, args.max_delay / 1000.0)
+    server.slots = threading.BoundedSemaphore(args.max_concurrent)
+
+    print "Serving translations on", address
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,71 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import time
+importStartTime = time.time()
+
 import sys
 import os
+import json
 import collections
+import contextlib
+import math
+import itertools
+import argparse
 import operator
-import sets
-import re
-import string
-import nltk
 
+# Only modules that import quickly are imported here. nltk, numpy,
+# sqlite3, multiprocessing and the models are loaded by the stages that
+# use them, so short runs never pay for what they do not use.
 from spanishTagger import SpanishTagger
-from HolbrookCorpus import HolbrookCorpus
-from StupidBackoffLanguageModel import StupidBackoffLanguageModel
-from LaplaceBigramLanguageModel import LaplaceBigramLanguageModel
-from UnigramLanguageModel import UnigramLanguageModel
-from ArticleTester import ArticleTester
+from modelCache import hashFiles, cachePath, modelVersion, LazyModel, TRAIN_PATH
+from BLEUScorer import BLEUScorer
+from EnglishTagger import EnglishTagger
+from ParallelCorpusReader import ParallelCorpusReader, regexTokenize
+from TranslationMemory import translateWithMemory
+from OutputWriter import DebugWriter, makeWriter, WRITERS, FIELDS
+from RuleEngine import RuleEngine, Rule, Token
+from CompiledDictionary import CompiledDictionary, isCompiled
 
 # Set system for utf-8 endocding
 reload(sys)
 sys.setdefaultencoding("utf-8")
 
+# Seconds spent importing this module and loading each model, in the
+# order they were loaded, for --startup-report
+startupTimes = collections.OrderedDict()
+startupTimes['importTranslator'] = time.time() - importStartTime
+
+# Returns the result of calling load, recording how long it took
+def timedLoad(name, load):
+    startTime = time.time()
+    value = load()
+    startupTimes[name] = startupTimes.get(name, 0.0) + time.time() - startTime
+    return value
+
 # Variable gives the n-gram used in computation of the BLEU score for
 # each translation.
 nGramForBLEU = 2
 
+# How the post-processing decides which articles to keep: 'threshold'
+# scores each 'the' on its own (articleCorrection), 'viterbi' finds the
+# best configuration for the whole sentence (articleDecoding), and
+# articleInsertion lets it add articles as well.
+articleMethod = 'threshold'
+articleInsertion = False
+
+# How Spanish words are translated: 'greedy' takes the first sense of
+# each word (translate), 'beam' searches over every sense and local
+# reorderings with the English model (BeamDecoder), keeping the best
+# beamWidth hypotheses at each step.
+decoderMethod = 'greedy'
+beamWidth = 8
+
+# Whether misspelled Spanish words are corrected before translating
+spellCorrection = False
+
+# Holbrook corpus used to train the English model for article correction.
+trainPath = TRAIN_PATH
+
 #================== Helper Methods ===================#
 # Returns true if character c is a vowel, false if not
 def isVowel(c):
@@ -32,53 +74,76 @@ def isVowel(c):
 
 
 # Parses the dictionary passed in.
-# Format is 'EnglishWord:SpanishWord', all lowercase
-# Returns a dict of 'Spanish Word' : 'English Word'
+# Format is 'SpanishWord:EnglishWord', all lowercase
+# Returns a dict of 'Spanish Word' : 'English Word'. When a Spanish
+# word is listed more than once, its first sense is used.
 def parseDict(filename):
     dictionary = {}
     f = open(filename)
     for line in f:
         line = line.strip('\n')
-        spanishWord, englishWord = line.split(':')
-        dictionary[spanishWord] = englishWord
+        spanishWord, englishWord = line.split(':', 1)
+        dictionary.setdefault(spanishWord, englishWord)
     return dictionary
 
+# Loads either a compiled dictionary (see CompiledDictionary.py) or a
+# plain text one in the format parseDict expects.
+def loadDictionary(filename):
+    if isCompiled(filename):
+        return CompiledDictionary(filename)
+    return parseDict(filename)
+
 
 # Parses the training file passed in. Returns a list of sentences,
 # where each sentence is given as a list of the words in that sentence.
-# Uses NLTK word tokenizer to parse the file.
-def parseTrainFile(filename):
+# Only sentence pairs start .. stop - 1 are read when given.
+def parseTrainFile(filename, start=0, stop=None):
     spanishSentences = []
     englishSentences = []
     rawEnglishSentences = []
     rawSpanishSentences = []
-    prevLine = 'English'
 
-    f = open(filename)
-    for line in f:
-        # Ignore comments
-        if line[0] is '#':
-            continue
-
-        # Pre-processing strategy #1: Throw out Spanish punctuation
-        raw_line = line
-        line = line.strip('¡¿')
-
-        # Tokenize word using NLTK and ignore empty lines
-        sentence = nltk.word_tokenize(line)
-        if not sentence:
-            continue
-
-        if prevLine is 'English':
-            rawSpanishSentences.append(raw_line)
-            spanishSentences.append(sentence)
-            prevLine = 'Spanish'
-        elif prevLine is 'Spanish':
-            rawEnglishSentences.append(raw_line)
-            englishSentences.append(sentence)
-            prevLine = 'English'
+    for pair in iterTrainFile(filename, start, stop):
+        spanishSentences.append(pair.spanish)
+        englishSentences.append(pair.english)
+        rawEnglishSentences.append(pair.rawEnglish)
+        rawSpanishSentences.append(pair.rawSpanish)
     return (spanishSentences, englishSentences, rawEnglishSentences, rawSpanishSentences)
 
+# Lazily reads the training file passed in, yielding a SentencePair per
+# sentence pair as soon as both of its lines have been read. A side is
+# only tokenized once its words (pair.spanish, pair.english) are used.
+# Only sentence pairs start .. stop - 1 are read when given; the pair
+# offsets that needs are indexed once per file and kept in the cache.
+def iterTrainFile(filename, start=0, stop=None):
+    reader = ParallelCorpusReader(filename, tokenizeLine, useCache=True)
+    for pair in reader.pairs(start, stop):
+        yield pair
+    reader.close()
+
+# How lines are split into words: 'nltk' uses the NLTK word tokenizer,
+# 'regex' the much faster ParallelCorpusReader.regexTokenize.
+tokenizerMethod = 'nltk'
+
+# The NLTK tokenizer, imported on first use since importing nltk takes
+# most of a second
+wordTokenize = None
+
+def importWordTokenize():
+    from nltk import word_tokenize
+    return word_tokenize
+
+# Tokenizes a single line of input. Returns an empty list for empty lines.
+def tokenizeLine(line):
+    global wordTokenize
+    # Pre-processing strategy #1: Throw out Spanish punctuation
+    line = line.strip('¡¿')
+    if tokenizerMethod == 'regex':
+        return regexTokenize(line)
+    if wordTokenize is None:
+        wordTokenize = timedLoad('nltk', importWordTokenize)
+    return wordTokenize(line)
+
 # Method is a baseline direct translate, simply swaps each word for the first available word
 # in the dictionary
 
@@ -100,36 +165,34 @@ def directTranslate(spanishSentences, dictionary):
 
 # Returns a list of lists with a direct translation from Spanish to English
 # i.e. returns a sentence for which each Spanish word is replaced with its
-# English translation
+# English translation. When the dictionary is compiled, multiword Spanish
+# phrases are matched longest first as the sentence is scanned.
 def translate(spanishSentences, dictionary):
     translations = []
+    matchPhrases = hasattr(dictionary, 'longestMatch')
 
     for sentence in spanishSentences:
         translatedSentence = []
+        words = [tup[0] for tup in sentence] if matchPhrases else None
+        skip = 0
 
         for i, tup in enumerate(sentence):
+            # Skip the rest of a phrase that was already translated
+            if skip:
+                skip -= 1
+                continue
+
             word = tup[0]
             lower_word = tup[0].lower()
-            tag = tup[1]
-
-            if lower_word == 'lo':
-                # lo que -> what, so disregard 'lo'
-                if len(sentence) > i+1 and sentence[i+1][0] == 'que':
-                    continue
-
-            elif lower_word == 'que':
-                if i == 0 or sentence[i-1][0] == 'lo':
-                    translatedSentence.append('what')
-                # Is there any way we can tell this based on the tag (gender perhaps) instead of by  the specific word?
-                # This is just a very specific rule that I'm worried won't generalize well to the test set
-                elif sentence[i-1][0] == 'persona' or sentence[i-1][0] == 'personas' or sentence[i-1][0] == 'gente' or (sentence[i-1][1] and sentence[i-1][1][0:2] == 'np'):
-                    translatedSentence.append('who')
-                elif sentence[i-1][1] and sentence[i-1][1][0] == 'v':
-                    translatedSentence.append('to')
-                else:
-                    translatedSentence.append('that')
-            elif i > 0 and isDirectObject(word) and sentence[i][1] and sentence[i][1] == 'o' and sentence[i-1][1] and sentence[i-1][1][0] == 'v':
-                translatedSentence.append(wordForDirectObject(word))
+            fixed = ruleTranslation(sentence, i)
+            phraseLength, phraseSenses = dictionary.longestMatch(words, i) \
+                if matchPhrases and fixed is None else (0, None)
+
+            if fixed is not None:
+                translatedSentence.extend(fixed)
+            elif phraseLength > 1:
+                translatedSentence.append(phraseSenses[0])
+                skip = phraseLength - 1
             elif word in dictionary:
                 translatedSentence.append(dictionary[word])
             elif lower_word in dictionary:
@@ -142,39 +205,41 @@ def translate(spanishSentences, dictionary):
     return translations
 
 
+# Returns the translation of word i of a tagged Spanish sentence when a
+# rule decides it rather than the dictionary: a list of English words,
+# empty when the word is left out, or None when no rule applies. Both
+# translate and the beam decoder follow these rules.
+def ruleTranslation(sentence, i):
+    word = sentence[i][0]
+    lower_word = word.lower()
+    if lower_word == 'lo':
+        # lo que -> what, so disregard 'lo'. Any other 'lo' is left out
+        # as well.
+        return []
+    elif lower_word == 'que':
+        if i == 0 or sentence[i-1][0] == 'lo':
+            return ['what']
+        # Is there any way we can tell this based on the tag (gender perhaps) instead of by  the specific word?
+        # This is just a very specific rule that I'm worried won't generalize well to the test set
+        elif sentence[i-1][0] == 'persona' or sentence[i-1][0] == 'personas' or sentence[i-1][0] == 'gente' or (sentence[i-1][1] and sentence[i-1][1][0:2] == 'np'):
+            return ['who']
+        elif sentence[i-1][1] and sentence[i-1][1][0] == 'v':
+            return ['to']
+        else:
+            return ['that']
+    elif i > 0 and isDirectObject(word) and sentence[i][1] and sentence[i][1] == 'o' and sentence[i-1][1] and sentence[i-1][1][0] == 'v':
+        return [wordForDirectObject(word)]
+    return None
+
+
 # Method computes the BLEU score for all Translations given
 # in the list englishTranslations when compared against the
 # correct translation given by englishSentences. Returns a list
 # of BLEU scores corresponding to the translations given in
-# englishTranslations.
+# englishTranslations. Each entry of englishSentences may also be
+# a list of alternative correct translations.
 def computeBLEU(englishTranslations, englishSentences):
-    bScores = []
-    for i, sentence in enumerate(englishTranslations):
-        score = min(1.0, float(len(sentence)) / float(len(englishSentences[i])))
-
-        for j in range(1, nGramForBLEU + 1):
-            translation = englishTranslations[i]
-            correctTranslation = englishSentences[i]
-            n_gram_count = len(translation) + 1 - j
-            ref_count = 0.0
-            matches = {}
-
-            for pos in range(n_gram_count):
-                substr = ' '.join(translation[pos: pos+j])
-
-                if substr in matches:
-                    matches[substr] += 1
-                    if ' '.join(correctTranslation).count(substr) >= matches[substr]:
-                        ref_count += 1.0
-                elif substr in ' '.join(correctTranslation):
-                    ref_count += 1.0
-                    matches[substr] = 1
-
-            score *= ref_count / n_gram_count
-
-        bScores.append(score)
-
-    return bScores
+    return BLEUScorer(englishSentences, nGramForBLEU).sentenceScores(englishTranslations)
 
 
 # ============= Pre-Processing Methods ============== #
@@ -186,36 +251,18 @@ def computeBLEU(englishTranslations, englishSentences):
 # is the one case where we actually don't want to swap them.
 
 def spanishNounAdjectiveSwap(taggedSpanishSentences):
-    updatedSentences = []
-
-    for sentence in taggedSpanishSentences:
-        prev = False
+    return RuleEngine([nounAdjectiveRule]).apply(taggedSpanishSentences)
 
-        for i in xrange(1, len(sentence)):
-            # Check if previous word was swapped, i.e. the word
-            # I'm looking at was just swapped into this position
-            if prev:
-                prev = False
-                continue
+# Noun (n) followed by an adjective (a), not preceded by a verb (v)
+nounAdjectiveRule = Rule('spanishNounAdjectiveSwap',
+    [Token(tagPrefix='n'), Token(tagPrefix='a')],
+    lambda window: [window[1], window[0]],
+    notAfter=Token(tagPrefix='v'))
 
-            # Check if Adjective (JJ) is following a noun (NN)
-            if sentence[i-1][1] and sentence[i][1] and sentence[i - 1][1][0] == 'n' and sentence[i][1][0] == 'a':
-                # If it's following a verb, don't swap
-                if sentence[i - 2] and sentence[i-2][1] and sentence[i - 2][1][0] == 'v':
-                    continue
-
-                # Otherwise, swap the two words
-                swapWord = sentence[i - 1]
-                sentence[i - 1] = sentence[i]
-                sentence[i] = swapWord
-                prev = True
-
-        updatedSentences.append(sentence)
-
-    return updatedSentences
+directObjects = ['me', 'te', 'lo', 'la', 'nos', 'os', 'los', 'las']
 
 def isDirectObject(word):
-    return word == 'me' or word == 'te' or word == 'lo' or word == 'la' or word == 'nos' or word == 'os' or word == 'los' or word == 'las'
+    return word in directObjects
 
 def wordForDirectObject(word):
     if word == 'me':
@@ -233,24 +280,18 @@ def wordForDirectObject(word):
     else:
         return word
 
+# Spanish places direct object pronouns before the verb ('lo disfrutan'),
+# English after it ('enjoy it'). The moved pronoun is tagged 'o' so
+# translate() knows to use its object form.
 def spanishVerbObjectSwap(taggedSpanishSentences):
-    updatedSentences = []
+    return RuleEngine([verbObjectRule]).apply(taggedSpanishSentences)
 
-    for sentence in taggedSpanishSentences:
-        prev = False
+verbObjectRule = Rule('spanishVerbObjectSwap',
+    [Token(words=directObjects), Token(tagPrefix='v')],
+    lambda window: [window[1], (window[0][0], 'o')])
 
-        for i in xrange(1, len(sentence)):
-            if prev:
-                prev = False
-                continue
-
-            if isDirectObject(sentence[i-1][0]) and sentence[i][1] and sentence[i][1][0] == 'v':
-                swapWord = sentence[i-1][0]
-                sentence[i-1] = sentence[i]
-                sentence[i] = (swapWord, 'o')
-                prev = True
-        updatedSentences.append(sentence)
-    return updatedSentences
+# Every Spanish pre-processing rule, fused into a single pass
+spanishRules = [nounAdjectiveRule, verbObjectRule]
 
 
 # =================================================== #
@@ -300,64 +341,72 @@ def nounAdjectiveSwap(taggedEnglishTranslations):
 # Spanish uses the negation (e.g. the word 'no') before the verb whereas
 # it is used following the verb in English (e.g. 'is not')
 def verbNegation(taggedEnglishTranslations):
-    updatedTranslations = []
-
-    for sentence in taggedEnglishTranslations:
-        prev = False
-
-        for i in range(1, len(sentence)):
-            # Check if previous word was swapped, i.e. the word
-            # I'm looking at was just swapped into this position
-            if prev:
-                prev = False
-                continue
-
-            # Check if 'no' is following a verb
-            if 'no' == sentence[i - 1][0] and \
-                ('VB' in sentence[i][1] or 'MD' in sentence[i][1]):
-                    swap = sentence[i - 1]
-                    sentence[i - 1] = sentence[i]
-                    sentence[i] = ('not', swap[1])
-                    prev = True
+    return RuleEngine([verbNegationRule]).apply(taggedEnglishTranslations)
 
-        updatedTranslations.append(sentence)
-
-    return updatedTranslations
+# 'no' followed by a verb (VB) or modal (MD)
+verbNegationRule = Rule('verbNegation',
+    [Token(word='no'), Token(tagContains=('VB', 'MD'))],
+    lambda window: [window[1], ('not', window[0][1])])
 
 # Post-Process #3:
 
 # Multiple words in Spanish ("un", "una") translate into "a" in english. However,
 # in english, "a" should become "an" if it is followed by a word beginning with a vowel
 def aConsonantCorrection(taggedEnglishTranslations):
-    updatedTranslations = []
-
-    for sentence in taggedEnglishTranslations:
-        for i in range(0, len(sentence) - 1):
-            word = sentence[i][0]
-            nextWord = sentence[i + 1][0]
-
-            # if word is a, check next word to see if it begins with a vowel
-            if word == 'a' and isVowel(nextWord[0]):
-                sentence[i] = ('an', sentence[i][1])
-
-        updatedTranslations.append(sentence)
-
-    return updatedTranslations
-
-# Recursive method to generate all permutations of a sentence toggling each instance
-# of 'the'
-
-def generateThePermutations(sentence, index):
-    if index == len(sentence): return []
-    if  sentence[index] == 'the':
-        permutations = generateThePermutations(sentence, index+1)
-        permutations.append(sentence)
-        sentence = sentence[0:index] + sentence[index+1:len(sentence)]
-        permutations.append(sentence)
-        permutations += generateThePermutations(sentence, index)
-        return permutations
-    else:
-        return generateThePermutations(sentence, index+1)
+    return RuleEngine([aConsonantRule]).apply(taggedEnglishTranslations)
+
+# Only 'a' is rewritten, so the next word is left to be matched again
+aConsonantRule = Rule('aConsonantCorrection',
+    [Token(word='a'), Token(test=lambda word, tag: word and isVowel(word[0]))],
+    lambda window: [('an', window[0][1]), window[1]],
+    consume=1)
+
+# Every English post-processing rule, fused into a single pass
+englishRules = [verbNegationRule, aConsonantRule]
+
+# Finds the highest scoring choice of keeping or dropping each 'the' in
+# the sentence (and, if insert is true, of adding a 'the' before each
+# other word) under the English bigram model. The dynamic program only
+# tracks the last word emitted, which is either the previous word or
+# 'the', so it runs in time linear in the sentence length instead of
+# enumerating every subset of articles.
+def decodeArticles(sentence, englishModel, insert=False):
+    # Last word emitted -> (score, emitted words as a linked list)
+    states = {'<s>': (0.0, None)}
+
+    for token in sentence:
+        newStates = {}
+
+        def relax(lastWord, score, node):
+            if lastWord not in newStates or score > newStates[lastWord][0]:
+                newStates[lastWord] = (score, node)
+
+        for lastWord, (score, node) in states.iteritems():
+            keepScore, newLast = englishModel.tokenScore(lastWord, token)
+            relax(newLast, score + keepScore, (token, node))
+
+            if token.lower() == 'the':
+                # Drop it and stay where we were
+                relax(lastWord, score, node)
+            elif insert:
+                theScore, _ = englishModel.tokenScore(lastWord, 'the')
+                wordScore, newLast = englishModel.tokenScore('the', token)
+                relax(newLast, score + theScore + wordScore, (token, ('the', node)))
+        states = newStates
+
+    best = None
+    for lastWord, (score, node) in states.iteritems():
+        score += math.log(englishModel.bigramScore(lastWord, '</s>'))
+        if best is None or score > best[0]:
+            best = (score, node)
+
+    words = []
+    node = best[1]
+    while node is not None:
+        words.append(node[0])
+        node = node[1]
+    words.reverse()
+    return words
 
 # Post-Process #5 look for 'the' in the sentence and use a Bigram Model
 # to determine if the sentence is more or less fluent without the 'the'
@@ -376,6 +425,14 @@ def articleCorrection(englishTranslations, englishModel):
         updatedSentences.append(new_sentence)
     return updatedSentences
 
+# Alternative to articleCorrection that picks the article configuration
+# of each sentence with decodeArticles
+def articleDecoding(englishTranslations, englishModel):
+    updatedSentences = []
+    for sentence in englishTranslations:
+        updatedSentences.append(decodeArticles(sentence, englishModel, articleInsertion))
+    return updatedSentences
+
 
 # Post-Process #4
 
@@ -395,31 +452,18 @@ def capitalizeFirstWord(englishTranslations):
 
 
 def spanishPosTag(spanishTagger, spanishSentences):
-    posTaggedSentences = []
-    for sentence in spanishSentences:
-        posTaggedSentences.append(spanishTagger.tagSentence(sentence))
-    return posTaggedSentences
+    return spanishTagger.tagSents(spanishSentences)
 
-def spanishUnPosTag(spanishTagSentences):
-    spanishSentences = []
-    for tagged_sentence in spanishTagSentences:
-        sentence = []
-        for word, tag in tagged_sentence:
-            sentence.append(word)
-        spanishSentences.append(sentence)
-    return spanishSentences
 
 
+# Shared English tagger, so the tagger model is loaded only once and
+# repeated sentences are tagged only once
+englishTagger = EnglishTagger()
 
 # Method takes a list of English Translation sentences and
 # returns a POS tagged sentence.
-def posTagTranslations(englishTranslations):
-    pos_tagged_translations = []
-
-    for sentence in englishTranslations:
-        pos_tagged_translations.append(nltk.pos_tag(sentence))
-
-    return pos_tagged_translations
+def posTagTranslations(englishTranslations, tagger=None):
+    return (tagger or englishTagger).tagSents(englishTranslations)
 
 
 # Method takes a list of POS tagged sentences and returns a
@@ -438,72 +482,457 @@ def unPosTagTranslations(taggedEnglishTranslations):
 # sentence, the machine translation and the correct translation
 # as well as the BLEU score of the translation.
 def printTranslations(spanishSentences, englishTranslations, englishSentences, directEnglishTranslations, rawEnglishTranslations, rawSpanishSentences, bScores, directTranslationBScores, taggedEnglishTranslations):
-    print "\n\n"
-    print "================ TRANSLATIONS =================="
-    print "\n\n"
-    for i, sentence in enumerate(englishTranslations):
-        print
-        print "============= New Translation: {0} =============".format(i + 1)
-        print "Translation of: ", " ".join(spanishSentences[i])
-        print "Translation: ", " ".join(sentence)
-        print "Correct Translation: ", " ".join(englishSentences[i])
-        print "Raw Spanish Sentence: ", rawSpanishSentences[i]
-        print "Raw Correct Translation: ", rawEnglishTranslations[i]
-        print "Direct Translation: ", " ".join(directEnglishTranslations[i])
-        print "Direct Translation BLEU-", nGramForBLEU," Score: ", directTranslationBScores[i]
-        print "Final BLEU-", nGramForBLEU," Score: ", bScores[i]
-        print "Tagged Translation: ", taggedEnglishTranslations[i]
-    print "Summary: "
-    for i in range(len(englishTranslations)):
-        print "Sentence: ", i+1, " Direct Translation Score: ", directTranslationBScores[i], " vs. Final Score: ", bScores[i]
-
-def main():
-    if len(sys.argv) != 3:
-        print "Usage: python translator.py [dictFile] [translateFile]"
-        sys.exit(1)
-
-    dictFile = sys.argv[1]
-    translateFile = sys.argv[2]
+    DebugWriter(sys.stdout, n=nGramForBLEU).writeAll({
+        'spanish': spanishSentences,
+        'translation': englishTranslations,
+        'reference': englishSentences,
+        'rawSpanish': rawSpanishSentences,
+        'rawReference': rawEnglishTranslations,
+        'direct': directEnglishTranslations,
+        'directBleu': directTranslationBScores,
+        'bleu': bScores,
+        'tagged': taggedEnglishTranslations,
+    })
+
+# Loads the English language model trained on the Holbrook corpus at
+# trainPath, training and saving it on first use.
+def loadEnglishModel(trainPath):
+    from ArticleTester import ArticleTester
+    path = cachePath('english-bigram-%s.lm' % hashFiles([trainPath], 'format=1'))
+    if os.path.exists(path):
+        return ArticleTester.load(path)
+    from HolbrookCorpus import HolbrookCorpus
+    englishModel = ArticleTester(HolbrookCorpus(trainPath, useCache=True))
+    englishModel.save(path)
+    return englishModel
+
+# Returns a hash identifying everything a translation depends on: every
+# model input (see modelCache.modelVersion) and the pipeline settings.
+# Stored translations made under another version are discarded.
+def memoryVersion(dictFile):
+    config = repr((decoderMethod, beamWidth, articleMethod, articleInsertion, spellCorrection))
+    return modelVersion(dictFile, config)
+
+# Path of the ModelStore (see ModelStore.py) to map the models from
+# instead of loading them, and the store once this process opened it
+modelStorePath = None
+modelStore = None
+
+def openModelStore():
+    global modelStore
+    if modelStore is None:
+        from ModelStore import ModelStore
+        modelStore = timedLoad('modelStore', lambda: ModelStore(modelStorePath))
+    return modelStore
+
+# Returns a hash identifying everything a model store is built from
+def modelStoreVersion(dictFile):
+    from spanishTagger import modelVersion as spanishModelVersion
+    from ModelStore import FORMAT
+    return hashFiles([dictFile, trainPath], FORMAT + ';' + spanishModelVersion())
+
+# Writes the models built from dictFile and the training data to a model
+# store at path, unless the store there is already up to date
+def ensureModelStore(path, dictFile):
+    from ModelStore import ModelStore, buildStore
+    version = modelStoreVersion(dictFile)
+    if os.path.exists(path):
+        store = ModelStore(path)
+        upToDate = store.version() == version
+        store.close()
+        if upToDate:
+            return
+    buildStore(path, version, loadDictionary(dictFile), SpanishTagger().load(), loadEnglishModel(trainPath))
+    print >> sys.stderr, "Wrote model store", path
+
+# Loads every model the pipeline needs. Returns a tuple of
+# (dictionary, spanishTagger, englishModel) that can be reused across
+# any number of calls to translateSentences. The Spanish tagger and the
+# English model are only loaded once a stage first uses them. With a
+# model store, all three are mapped from it and nothing is loaded.
+def loadModels(dictFile):
+    if modelStorePath is not None:
+        store = openModelStore()
+        return (store.dictionary(), SpanishTagger(table=store.taggerTable()), store.englishModel())
 
     spanishTagger = SpanishTagger()
 
-    trainPath = '../data/holbrook-tagged-train.dat'
-    trainingCorpus = HolbrookCorpus(trainPath)
-    englishModel = ArticleTester(trainingCorpus)
-
-    dictionary = parseDict(dictFile)
-    spanishSentences, englishSentences, rawEnglishSentences, rawSpanishSentences = parseTrainFile(translateFile)
-
-    # Pre-processing methods
-    taggedSpanishSentences = spanishPosTag(spanishTagger, spanishSentences)
+    englishModel = LazyModel(lambda: timedLoad('englishModel', lambda: loadEnglishModel(trainPath)))
+
+    dictionary = timedLoad('dictionary', lambda: loadDictionary(dictFile))
+    return (dictionary, spanishTagger, englishModel)
+
+
+# Pre- and post-processing rules compiled once. Each engine applies all
+# of its rules in a single pass over every sentence.
+spanishRuleEngine = RuleEngine(spanishRules)
+englishRuleEngine = RuleEngine(englishRules)
+
+# Spell correctors built so far, keyed by the models they use, since
+# indexing the dictionary is too slow to repeat for every batch
+spellCorrectors = {}
+
+def getSpellCorrector(dictionary, englishModel):
+    key = (id(dictionary), id(englishModel))
+    if key not in spellCorrectors:
+        from SpellCorrector import SpellCorrector
+        spellCorrectors[key] = timedLoad('spellCorrector', lambda: SpellCorrector(dictionary, englishModel))
+    return spellCorrectors[key]
+
+# Returns the ordered (name, stage) passes that make up the translation
+# pipeline. Each stage takes a list of sentences and returns the updated
+# list, so they can be run over a whole corpus or one sentence at a time.
+def pipelineStages(dictionary, spanishTagger, englishModel):
+    stages = [
+        # Pre-processing methods
+        ('spanishPosTag', lambda sentences: spanishPosTag(spanishTagger, sentences)),
+        ('spanishRules', spanishRuleEngine.apply),
+        ('translate', lambda sentences: getBeamDecoder(dictionary, englishModel, beamWidth).decode(sentences)
+            if decoderMethod == 'beam' else translate(sentences, dictionary)),
+
+        # Post-processing methods
+        ('posTagTranslations', posTagTranslations),
+        ('englishRules', englishRuleEngine.apply),
+        ('unPosTagTranslations', unPosTagTranslations),
+        ('articleCorrection', lambda sentences: articleDecoding(sentences, englishModel)
+            if articleMethod == 'viterbi' else articleCorrection(sentences, englishModel)),
+        ('capitalizeFirstWord', capitalizeFirstWord),
+    ]
+    if articleMethod == 'none':
+        stages = [stage for stage in stages if stage[0] != 'articleCorrection']
+    if spellCorrection:
+        corrector = getSpellCorrector(dictionary, englishModel)
+        stages.insert(0, ('spellCorrection', corrector.correct))
+    return stages
+
+# Beam decoders built so far, keyed by their models and width, so that
+# streaming one sentence at a time does not build one per sentence
+beamDecoders = {}
+
+def getBeamDecoder(dictionary, englishModel, width):
+    key = (id(dictionary), id(englishModel), width)
+    if key not in beamDecoders:
+        from BeamDecoder import BeamDecoder
+        beamDecoders[key] = BeamDecoder(dictionary, englishModel, width, rules=ruleTranslation)
+    return beamDecoders[key]
+
+# Returns the pipeline stages, each measured by profiler if one is given
+def profiledStages(dictionary, spanishTagger, englishModel, profiler=None):
+    stages = pipelineStages(dictionary, spanishTagger, englishModel)
+    if profiler is None:
+        return stages
+    return [(name, profiler.wrap(name, stage)) for name, stage in stages]
+
+
+# Runs the pre-processing, translation and post-processing passes over
+# a list of tokenized Spanish sentences. Returns the final English
+# translations and the POS tagged translations they were built from.
+# Each stage is timed by profiler, if one is given.
+def translateSentences(spanishSentences, dictionary, spanishTagger, englishModel, profiler=None):
+    sentences = spanishSentences
+    taggedEnglishTranslations = None
+    for name, stage in profiledStages(dictionary, spanishTagger, englishModel, profiler):
+        if name == 'unPosTagTranslations':
+            taggedEnglishTranslations = sentences
+        sentences = stage(sentences)
+
+    return (sentences, taggedEnglishTranslations)
+
+
+# Wraps a list-based stage so it consumes and produces sentences one
+# at a time.
+def streamStage(stage, sentences):
+    for sentence in sentences:
+        yield stage([sentence])[0]
+
+# Chains every pipeline stage as a generator over an iterable of
+# tokenized Spanish sentences. Each English translation is yielded as
+# soon as its sentence has passed through all stages, so memory use does
+# not grow with the size of the input.
+def streamTranslations(spanishSentences, dictionary, spanishTagger, englishModel, profiler=None):
+    sentences = iter(spanishSentences)
+    for name, stage in profiledStages(dictionary, spanishTagger, englishModel, profiler):
+        sentences = streamStage(stage, sentences)
+    return sentences
+
+
+# Models loaded once per worker process by initWorker, and whether
+# workers time their stages
+workerModels = None
+workerProfiling = False
+
+def initWorker(dictFile, profiling=False):
+    global workerModels, workerProfiling
+    workerModels = loadModels(dictFile)
+    workerProfiling = profiling
+
+# Returns the translations and tagged translations of the shard, and
+# the timings of its stages when profiling
+def translateShard(spanishSentences):
+    profiler = None
+    if workerProfiling:
+        # Imported only when profiling, since it loads cProfile
+        from Profiler import Profiler
+        profiler = Profiler()
+    translations, tagged = translateSentences(spanishSentences, *workerModels, profiler=profiler)
+    return (translations, tagged, profiler.stageReports() if profiler else None)
+
+# Shards the sentences into contiguous chunks and translates them on a
+# pool of worker processes, each of which loads the models once. Shards
+# are reassembled in input order, so the result is identical to calling
+# translateSentences in a single process. Stage timings from the
+# workers are added up in profiler, if one is given.
+def parallelTranslateSentences(spanishSentences, dictFile, workers, shardSize=None, profiler=None):
+    if shardSize is None:
+        # A few shards per worker keeps the pool busy when shards are uneven
+        shardSize = max(1, -(-len(spanishSentences) // (workers * 4)))
+    shards = [spanishSentences[i:i + shardSize] for i in xrange(0, len(spanishSentences), shardSize)]
+
+    import multiprocessing
+    pool = multiprocessing.Pool(workers, initWorker, (dictFile, profiler is not None))
+    try:
+        results = pool.map(translateShard, shards)
+    finally:
+        pool.close()
+        pool.join()
 
-    taggedSpanishSentences = spanishNounAdjectiveSwap(taggedSpanishSentences)
-
-    taggedSpanishSentences = spanishVerbObjectSwap(taggedSpanishSentences)
-
-    modifiedSpanishSentences = spanishUnPosTag(taggedSpanishSentences)
-
-    # Direct Translation
-    directEnglishTranslations = directTranslate(spanishSentences, dictionary)
-    directTranslationBScores = computeBLEU(directEnglishTranslations, englishSentences)
-
-    englishTranslations = translate(taggedSpanishSentences, dictionary)
-
-
-    # Post-processing methods
-    taggedEnglishTranslations = posTagTranslations(englishTranslations)
-
-    taggedEnglishTranslations = verbNegation(taggedEnglishTranslations)
-    taggedEnglishTranslations = aConsonantCorrection(taggedEnglishTranslations)
+    englishTranslations = []
+    taggedEnglishTranslations = []
+    for translations, tagged, stageReports in results:
+        englishTranslations.extend(translations)
+        taggedEnglishTranslations.extend(tagged)
+        if profiler is not None:
+            profiler.merge(stageReports)
+    return (englishTranslations, taggedEnglishTranslations)
+
+
+# Translates the file one sentence pair at a time, writing each
+# translation and its BLEU score as soon as it is available. Only
+# sentence pairs start .. stop - 1 are translated when given. With
+# direct, only the direct translation is run, and the taggers and
+# English model are not used.
+def streamFile(translateFile, dictionary, spanishTagger, englishModel, profiler=None, writer=None, start=0, stop=None, direct=False):
+    if writer is None:
+        writer = DebugWriter(sys.stdout, ['spanish', 'translation', 'reference', 'bleu'], True, nGramForBLEU)
+    pairs = iterTrainFile(translateFile, start, stop)
+    spanishPairs, scoringPairs = itertools.tee(pairs)
+    spanishSentences = itertools.imap(operator.attrgetter('spanish'), spanishPairs)
+    if direct:
+        stage = lambda sentences: directTranslate(sentences, dictionary)
+        if profiler is not None:
+            stage = profiler.wrap('directTranslate', stage)
+        translations = streamStage(stage, spanishSentences)
+    else:
+        translations = streamTranslations(spanishSentences, dictionary, spanishTagger, englishModel, profiler)
+
+    writer.begin()
+    for i, (translation, pair) in enumerate(itertools.izip(translations, scoringPairs), start):
+        values = {
+            'spanish': pair.spanish,
+            'translation': translation,
+            'rawSpanish': pair.rawSpanish,
+            'rawReference': pair.rawEnglish,
+        }
+        # The reference is only tokenized when it is written or scored
+        if writer.needs('reference'):
+            values['reference'] = pair.english
+        if writer.needs('bleu'):
+            if profiler is None:
+                values['bleu'] = computeBLEU([translation], [pair.english])[0]
+            else:
+                with profiler.measure('computeBLEU', [translation]):
+                    values['bleu'] = computeBLEU([translation], [pair.english])[0]
+        writer.add(i, dict((field, values[field]) for field in writer.fields if field in values))
+    writer.end()
+
+
+class NullStats:
+    def count(self, sentences):
+        pass
+
+# Stands in for Profiler.measure when not profiling
+@contextlib.contextmanager
+def nullMeasure(name, sentences=None):
+    yield NullStats()
+
+# Returns the hit rates of the caches used in this process. With
+# several workers the caches live in the worker processes instead.
+def cacheStats(spanishTagger):
+    caches = {'englishTagger': englishTagger.cache.stats()}
+    if spanishTagger is not None:
+        caches['spanishTagger'] = spanishTagger.cacheStats()
+    for corrector in spellCorrectors.itervalues():
+        caches['spellCorrector'] = corrector.cache.stats()
+    return caches
+
+# Returns the time the English tagger spent on each batch it tagged in
+# this process, for the --profile report
+def taggerStats():
+    return {'englishTagger': englishTagger.report()}
+
+# Modules that take long enough to import that only the stages needing
+# them should import them
+HEAVY_MODULES = ['nltk', 'numpy', 'multiprocessing', 'sqlite3', 'cProfile']
+
+# Prints how long importing this module and loading each model took,
+# and which of HEAVY_MODULES ended up imported, as JSON to stderr
+def printStartupReport(spanishTagger):
+    times = collections.OrderedDict(startupTimes)
+    if spanishTagger is not None and spanishTagger.loadSeconds is not None:
+        times['spanishTagger'] = spanishTagger.loadSeconds
+    report = collections.OrderedDict([
+        ('seconds', times),
+        ('heavyModulesImported', [name for name in HEAVY_MODULES if name in sys.modules]),
+    ])
+    print >> sys.stderr, json.dumps(report, indent=2)
 
-    englishTranslations = unPosTagTranslations(taggedEnglishTranslations)
 
-    englishTranslations = articleCorrection(englishTranslations, englishModel)
-    englishTranslations = capitalizeFirstWord(englishTranslations)
+def main():
+    parser = argparse.ArgumentParser(usage='python translator.py [dictFile] [translateFile]')
+    parser.add_argument('dictFile')
+    parser.add_argument('translateFile')
+    parser.add_argument('--stream', action='store_true', help='translate and print one sentence at a time')
+    parser.add_argument('--decoder', choices=['greedy', 'beam'], default='greedy',
+        help='translate with the first sense of each word, or beam search over all senses')
+    parser.add_argument('--beam-width', type=int, default=8, help='hypotheses kept per step by the beam decoder')
+    parser.add_argument('--articles', choices=['threshold', 'viterbi', 'none'], default='threshold',
+        help='how article correction decides which articles to keep, or none to skip it')
+    parser.add_argument('--insert-articles', action='store_true', help='let viterbi article correction add articles')
+    parser.add_argument('--spellcheck', action='store_true', help='correct misspelled Spanish words before translating')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes to translate with, not with --stream')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='debug',
+        help='debug prints every diagnostic field, text just the translations')
+    parser.add_argument('--fields', help='comma separated fields to write in jsonl or tsv format, from: ' + ','.join(FIELDS))
+    parser.add_argument('--output', help='write translations to this file instead of standard output')
+    parser.add_argument('--tokenizer', choices=['nltk', 'regex'], default='nltk', help='how lines are split into words')
+    parser.add_argument('--pairs', metavar='START:STOP', help='only translate sentence pairs START to STOP - 1 (counting from 0)')
+    parser.add_argument('--memory', metavar='PATH', help='reuse translations stored in this database, and add new ones; not with --stream')
+    parser.add_argument('--memory-size', type=int, default=1000000, help='translations kept in the --memory database')
+    parser.add_argument('--model-store', metavar='PATH',
+        help='map the models from this file, writing it first if it is missing or stale, so worker processes share them')
+    parser.add_argument('--direct', action='store_true',
+        help='only run the direct word for word translation, without loading the taggers or English model')
+    parser.add_argument('--startup-report', action='store_true',
+        help='print the time spent importing modules and loading each model to standard error')
+    parser.add_argument('--profile', metavar='REPORT', help='write per-stage timings as JSON to REPORT')
+    parser.add_argument('--profile-dir', metavar='DIR', help='with --profile, also dump cProfile output of each stage to DIR')
+    args = parser.parse_args()
+    if args.stream and args.workers > 1:
+        parser.error('--workers cannot be used with --stream, which translates one sentence at a time')
+    if args.stream and args.memory:
+        parser.error('--memory cannot be used with --stream, translations are only stored for whole batches')
+
+    dictFile = args.dictFile
+    translateFile = args.translateFile
+
+    global decoderMethod, beamWidth, articleMethod, articleInsertion, spellCorrection, tokenizerMethod, modelStorePath
+    tokenizerMethod = args.tokenizer
+    spellCorrection = args.spellcheck
+    decoderMethod = args.decoder
+    beamWidth = args.beam_width
+    articleMethod = args.articles
+    articleInsertion = args.insert_articles
+
+    if args.model_store:
+        ensureModelStore(args.model_store, dictFile)
+        modelStorePath = args.model_store
+
+    profiler = None
+    if args.profile:
+        from Profiler import Profiler
+        profiler = Profiler(args.profile_dir)
+    measure = profiler.measure if profiler else nullMeasure
+
+    fields = args.fields.split(',') if args.fields else None
+    if args.stream and fields is None and args.format == 'debug':
+        # Streaming has no direct translation to compare against
+        fields = ['spanish', 'translation', 'reference', 'bleu']
+    output = open(args.output, 'w') if args.output else sys.stdout
+    writer = makeWriter(args.format, output, fields, args.stream, nGramForBLEU)
+
+    start, stop = 0, None
+    if args.pairs:
+        start, stop = args.pairs.split(':')
+        start, stop = int(start or 0), int(stop) if stop else None
+
+    if args.stream:
+        spanishTagger = englishModel = None
+        with measure('loadModels'):
+            if args.direct:
+                dictionary = openModelStore().dictionary() if modelStorePath else loadDictionary(dictFile)
+            else:
+                dictionary, spanishTagger, englishModel = loadModels(dictFile)
+        streamFile(translateFile, dictionary, spanishTagger, englishModel, profiler, writer, start, stop, args.direct)
+        if output is not sys.stdout:
+            output.close()
+        if profiler:
+            profiler.write(args.profile, cacheStats(spanishTagger), taggerStats())
+        if args.startup_report:
+            printStartupReport(spanishTagger)
+        return
+
+    spanishTagger = None
+    with measure('loadModels'):
+        if args.workers > 1 or args.direct:
+            # Workers load their own models, the dictionary is all we need here
+            dictionary = openModelStore().dictionary() if modelStorePath else loadDictionary(dictFile)
+        else:
+            dictionary, spanishTagger, englishModel = loadModels(dictFile)
+    with measure('parseTrainFile') as stage:
+        spanishSentences, englishSentences, rawEnglishSentences, rawSpanishSentences = parseTrainFile(translateFile, start, stop)
+        stage.count(spanishSentences)
+
+    # Direct Translation, only computed when it is written out
+    columns = {
+        'spanish': spanishSentences,
+        'reference': englishSentences,
+        'rawSpanish': rawSpanishSentences,
+        'rawReference': rawEnglishSentences,
+    }
+    if writer.needs('direct') or writer.needs('directBleu') or args.direct:
+        with measure('directTranslate', spanishSentences):
+            columns['direct'] = directTranslate(spanishSentences, dictionary)
+    if writer.needs('directBleu') or writer.needs('bleu'):
+        scorer = BLEUScorer(englishSentences, nGramForBLEU)
+    if writer.needs('directBleu'):
+        with measure('computeBLEU', columns['direct']):
+            columns['directBleu'] = scorer.sentenceScores(columns['direct'])
+
+    memory = None
+    if args.direct:
+        englishTranslations = columns['direct']
+        taggedEnglishTranslations = [None] * len(englishTranslations)
+    else:
+        if args.workers > 1:
+            translateBatch = lambda sentences: parallelTranslateSentences(sentences, dictFile, args.workers, profiler=profiler)
+        else:
+            translateBatch = lambda sentences: translateSentences(sentences, dictionary, spanishTagger, englishModel, profiler)
+        if args.memory:
+            from TranslationMemory import TranslationMemory
+            memory = TranslationMemory(args.memory, memoryVersion(dictFile), args.memory_size)
+        englishTranslations, taggedEnglishTranslations = translateWithMemory(spanishSentences, translateBatch, memory)
+
+    columns['translation'] = englishTranslations
+    columns['tagged'] = taggedEnglishTranslations
 
     # Scoring
-    bScores = computeBLEU(englishTranslations, englishSentences)
-    printTranslations(spanishSentences, englishTranslations, englishSentences, directEnglishTranslations, rawEnglishSentences, rawSpanishSentences, bScores, directTranslationBScores, taggedEnglishTranslations)
+    if writer.needs('bleu'):
+        with measure('computeBLEU', englishTranslations):
+            columns['bleu'] = scorer.sentenceScores(englishTranslations)
+    with measure('writeOutput', englishTranslations):
+        writer.writeAll(columns, start)
+    if output is not sys.stdout:
+        output.close()
+
+    if profiler:
+        caches = cacheStats(spanishTagger)
+        if memory is not None:
+            caches['translationMemory'] = memory.stats()
+        profiler.write(args.profile, caches, taggerStats())
+    if memory is not None:
+        memory.close()
+    if args.startup_report:
+        printStartupReport(spanishTagger)
 
 
 if __name__ == '__main__':